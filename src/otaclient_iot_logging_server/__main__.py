@@ -15,20 +15,50 @@
 
 from __future__ import annotations
 
-from queue import Queue
-
 from otaclient_iot_logging_server import __version__
 from otaclient_iot_logging_server._common import LogsQueue
 from otaclient_iot_logging_server._log_setting import config_logging
-from otaclient_iot_logging_server.aws_iot_logger import start_aws_iot_logger_thread
+from otaclient_iot_logging_server.aws_iot_logger import (
+    create_aws_iot_logger,
+    start_aws_iot_logger_thread,
+)
 from otaclient_iot_logging_server.config_file_monitor import config_file_monitor_thread
 from otaclient_iot_logging_server.configs import server_cfg
+from otaclient_iot_logging_server.ingestion_workers import (
+    create_ipc_queue,
+    launch_ingestion_workers,
+    wait_for_ingestion_workers,
+)
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
 from otaclient_iot_logging_server.log_proxy_server import launch_server
+from otaclient_iot_logging_server.log_spool import LogsSpool
+from otaclient_iot_logging_server.shm_ring_queue import ShmRingQueue
 
 
 def main() -> None:
+    workers_mode = server_cfg.INGESTION_WORKERS > 1
     # server scope log entries pipe
-    queue: LogsQueue = Queue(maxsize=server_cfg.MAX_LOGS_BACKLOG)
+    if server_cfg.SPOOL_DIR and not workers_mode:
+        queue: LogsQueue = LogsSpool(
+            server_cfg.SPOOL_DIR,
+            max_bytes=server_cfg.SPOOL_MAX_BYTES,
+            segment_size=server_cfg.SPOOL_SEGMENT_SIZE,
+            fsync_batch=server_cfg.SPOOL_FSYNC_BATCH,
+            fsync_interval=server_cfg.SPOOL_FSYNC_INTERVAL,
+        )
+    elif server_cfg.USE_SHM_RING_QUEUE:
+        queue = ShmRingQueue(  # type: ignore
+            server_cfg.MAX_LOGS_BACKLOG_BYTES, maxsize=server_cfg.MAX_LOGS_BACKLOG
+        )
+    elif workers_mode:
+        queue = create_ipc_queue(maxsize=server_cfg.MAX_LOGS_BACKLOG)
+    else:
+        queue = LogsBacklog(
+            maxsize=server_cfg.MAX_LOGS_BACKLOG,
+            max_bytes=server_cfg.MAX_LOGS_BACKLOG_BYTES,
+            drop_policy=server_cfg.LOGS_DROP_POLICY,
+            sampling_rate=server_cfg.LOGS_DROP_SAMPLING_RATE,
+        )
     # ------ configure local logging ------ #
     root_logger = config_logging(
         queue,
@@ -45,13 +75,24 @@ def main() -> None:
         f"launching gRPC iot_logging_server({__version__}) at http://{server_cfg.LISTEN_ADDRESS}:{server_cfg.LISTEN_PORT_GRPC}"
     )
     root_logger.info(f"iot_logging_server config: \n{server_cfg}")
+    # ------ launch ingestion workers ------ #
+    # NOTE: workers MUST be forked before any threads are started
+    if workers_mode:
+        workers = launch_ingestion_workers(queue, server_cfg.INGESTION_WORKERS)
     # ------ launch aws cloudwatch client ------ #
-    start_aws_iot_logger_thread(queue)
+    # NOTE: in ingestion workers mode, the main process runs no event loop
+    uploader = None
+    if server_cfg.ASYNC_PIPELINE and not workers_mode:
+        uploader = create_aws_iot_logger(queue).async_main
+    else:
+        start_aws_iot_logger_thread(queue)
     # ------ launch config file monitor ------ #
     if server_cfg.EXIT_ON_CONFIG_FILE_CHANGED:
         config_file_monitor_thread()
     # ------ start server ------ #
-    launch_server(queue=queue)  # NoReturn
+    if workers_mode:
+        wait_for_ingestion_workers(workers)  # NoReturn
+    launch_server(queue=queue, uploader=uploader)  # NoReturn
 
 
 if __name__ == "__main__":
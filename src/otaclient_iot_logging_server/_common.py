@@ -21,8 +21,8 @@ from typing import Literal, TypeAlias, TypedDict
 
 from typing_extensions import NotRequired
 
-# LogQueue is a queue of LogGroupType, ecu_id, and LogMessage
-LogsQueue: TypeAlias = "Queue[tuple[LogGroupType, str, LogMessage]]"
+# LogQueue is a queue of LogGroupType, ecu_id, and LogRecord
+LogsQueue: TypeAlias = "Queue[tuple[LogGroupType, str, LogRecord]]"
 
 
 class LogGroupType(Enum):
@@ -35,6 +35,27 @@ class LogMessage(TypedDict):
     message: str
 
 
+class LogRecord:
+    """Compact pending log entry, converted to LogMessage on uploading."""
+
+    __slots__ = ("timestamp", "message")
+
+    def __init__(self, timestamp: int, message: str) -> None:
+        self.timestamp = timestamp  # in milliseconds
+        self.message = message
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, LogRecord):
+            return NotImplemented
+        return self.timestamp == other.timestamp and self.message == other.message
+
+    def __repr__(self) -> str:
+        return f"LogRecord(timestamp={self.timestamp}, message={self.message!r})"
+
+    def to_log_message(self) -> LogMessage:
+        return LogMessage(timestamp=self.timestamp, message=self.message)
+
+
 class LogEvent(TypedDict):
     logGroupName: str
     logStreamName: str
@@ -17,37 +17,95 @@ from __future__ import annotations
 
 import contextlib
 import logging
+import os
+import threading
 import time
 
 from otaclient_iot_logging_server import package_name as root_package_name
-from otaclient_iot_logging_server._common import LogGroupType, LogMessage, LogsQueue
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord, LogsQueue
+from otaclient_iot_logging_server._utils import put_many
 from otaclient_iot_logging_server.configs import server_cfg
 
 
 class _LogTeeHandler(logging.Handler):
-    """Implementation of uploading local server loggings to cloudwatch."""
+    """Implementation of uploading local server loggings to cloudwatch.
+
+    Records are buffered and put into the queue in bulk, when <flush_size>
+        records are buffered, or by the flush thread every <flush_interval>
+        seconds.
+
+    NOTE: the flush thread is started on the first emit of each process, as
+          the ingestion workers MUST be forked before any threads start.
+    """
 
     def __init__(
         self,
         queue: LogsQueue,
         logstream_suffix: str,
+        *,
+        flush_size: int = 128,
+        flush_interval: float = 1,
     ) -> None:
         super().__init__()
         self._queue = queue
         self._logstream_suffix = logstream_suffix
+        self._flush_size = flush_size
+        self._flush_interval = flush_interval
+        # NOTE: protected by self.lock
+        self._buffer: list[tuple[LogGroupType, str, LogRecord]] = []
+        self._flush_thread_pid: int | None = None
+
+        self._stopped = threading.Event()
+
+    def _flush_thread(self) -> None:
+        while not self._stopped.wait(self._flush_interval):
+            self.flush()
+
+    def _ensure_flush_thread(self) -> None:
+        """Start the flush thread for this process, called with self.lock held."""
+        if self._flush_thread_pid == (_pid := os.getpid()):
+            return
+        if self._flush_thread_pid is not None:
+            # NOTE: records inherited from the parent are flushed by the parent,
+            #       and the handler lock is re-initialized after fork by logging.
+            self._buffer = []
+        self._flush_thread_pid = _pid
+        threading.Thread(
+            target=self._flush_thread, daemon=True, name="log_tee_flush"
+        ).start()
 
     def emit(self, record: logging.LogRecord) -> None:
+        # NOTE: emit is called with self.lock held
+        self._ensure_flush_thread()
         with contextlib.suppress(Exception):
-            self._queue.put_nowait(
+            self._buffer.append(
                 (
                     LogGroupType.LOG,  # always put local log into log group
                     self._logstream_suffix,
-                    LogMessage(
+                    LogRecord(
                         timestamp=int(time.time()) * 1000,  # milliseconds
                         message=self.format(record),
                     ),
                 )
             )
+            if len(self._buffer) >= self._flush_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Put the buffered records into queue, drop them if queue is full."""
+        with self.lock:  # type: ignore[union-attr]
+            if self._flush_thread_pid not in (None, os.getpid()):
+                return  # only the inherited records, flushed by the parent
+            if not (_buffer := self._buffer):
+                return
+            self._buffer = []
+            with contextlib.suppress(Exception):
+                put_many(self._queue, _buffer)
+
+    def close(self) -> None:
+        self._stopped.set()
+        self.flush()
+        super().close()
 
 
 def config_logging(
@@ -16,8 +16,18 @@
 from __future__ import annotations
 
 import time
+from datetime import datetime, timezone
 from functools import partial, wraps
-from typing import Any, Callable, ParamSpec, TypeAlias, TypeVar, overload
+from queue import Full, Queue
+from typing import (
+    Any,
+    Callable,
+    ParamSpec,
+    Sequence,
+    TypeAlias,
+    TypeVar,
+    overload,
+)
 
 from pydantic import BaseModel, ConfigDict
 
@@ -129,6 +139,49 @@ def retry(
     return _inner
 
 
+def format_timestamp(timestamp: int) -> str:
+    """Format unix timestamp in milliseconds into ISO 8601 string in UTC."""
+    return datetime.fromtimestamp(timestamp / 1000, timezone.utc).isoformat(
+        timespec="milliseconds"
+    )
+
+
+def put_many(queue: Any, items: Sequence[Any]) -> int:
+    """Put <items> into <queue> in order until the queue is full.
+
+    The queue's own put_many is used if it has one, which might admit items
+        by its own policy, i.e., LogsBacklog. For queue.Queue, the items are
+        put within one lock acquisition, other queues fall back to put_nowait
+        one by one.
+
+    Returns:
+        The number of the accepted items.
+    """
+    if _put_many := getattr(queue, "put_many", None):
+        return _put_many(items)
+
+    _accepted = 0
+    if isinstance(queue, Queue):
+        with queue.mutex:
+            for _item in items:
+                if 0 < queue.maxsize <= queue._qsize():
+                    break
+                queue._put(_item)
+                _accepted += 1
+            if _accepted:
+                queue.unfinished_tasks += _accepted
+                queue.not_empty.notify(_accepted)
+        return _accepted
+
+    for _item in items:
+        try:
+            queue.put_nowait(_item)
+        except Full:
+            break
+        _accepted += 1
+    return _accepted
+
+
 def parse_pkcs11_uri(_pkcs11_uri: str) -> PKCS11URI:
     _, pkcs11_opts_str = _pkcs11_uri.split(":", maxsplit=1)
     pkcs11_opts_dict: dict[str, Any] = {}
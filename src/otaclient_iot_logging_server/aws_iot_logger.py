@@ -15,30 +15,43 @@
 
 from __future__ import annotations
 
+import asyncio
 import contextlib
 import logging
+import random
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from operator import attrgetter
 from queue import Empty
 from threading import Thread
+from typing import Iterable
 
 import awscrt.exceptions
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from typing_extensions import NoReturn
 
 from otaclient_iot_logging_server._common import (
     LogEvent,
     LogGroupType,
     LogMessage,
+    LogRecord,
     LogsQueue,
 )
-from otaclient_iot_logging_server._utils import retry
+from otaclient_iot_logging_server.backpressure import (
+    DrainRateMeter,
+    drain_rate_meter,
+)
 from otaclient_iot_logging_server.boto3_session import get_session
 from otaclient_iot_logging_server.configs import server_cfg
 from otaclient_iot_logging_server.greengrass_config import (
     IoTSessionConfig,
     parse_config,
 )
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
+from otaclient_iot_logging_server.log_spool import LogsSpool
 
 logger = logging.getLogger(__name__)
 
@@ -52,23 +65,152 @@ def get_log_stream_name(thing_name: str, log_stream_sufix: str) -> str:
     return f"{fmt}/{thing_name}/{log_stream_sufix}"
 
 
+MAX_POOL_CONNECTIONS = 10
+"""The default max_pool_connections of botocore client."""
+
+# PutLogEvents limits, check the boto3 doc of put_log_events for more details.
+MAX_LOGS_PER_PUT = 10_000
+MAX_BYTES_PER_PUT = 1_048_576
+"""Max size of a request, sum of the utf-8 encoded messages plus EVENT_OVERHEAD."""
+EVENT_OVERHEAD = 26  # in bytes
+MAX_EVENT_SIZE = 256 * 1024  # in bytes, including EVENT_OVERHEAD
+MAX_SPAN_PER_PUT = 24 * 60 * 60 * 1000  # in milliseconds
+
+RETRY_BACKOFF_FACTOR = 2  # in seconds
+RETRY_BACKOFF_MAX = 32  # in seconds
+RETRYABLE_ERROR_CODES = frozenset(
+    {"ThrottlingException", "ServiceUnavailableException", "InternalFailure"}
+)
+MAX_RETRY_BYTES = 8 * MAX_BYTES_PER_PUT
+"""Max size of the entries pending for retrying of a log stream, the oldest are dropped."""
+
+
+def _get_event_size(message: str) -> int:
+    return (len(message) if message.isascii() else len(message.encode())) + (
+        EVENT_OVERHEAD
+    )
+
+
+def _truncate_message(message: str) -> str:
+    _max_message_size = MAX_EVENT_SIZE - EVENT_OVERHEAD
+    return message.encode()[:_max_message_size].decode(errors="ignore")
+
+
+def build_log_batches(logs: list[LogRecord]) -> list[list[LogMessage]]:
+    """Pack the entries of one log stream into PutLogEvents batches.
+
+    Entries are sorted in chronological order(in place), then packed greedily,
+        a new batch is started when the next entry would exceed any of
+        MAX_LOGS_PER_PUT, MAX_BYTES_PER_PUT or MAX_SPAN_PER_PUT of the current
+        batch. Messages larger than MAX_EVENT_SIZE are truncated.
+    """
+    logs.sort(key=attrgetter("timestamp"))
+
+    res: list[list[LogMessage]] = []
+    _batch: list[LogMessage] = []
+    _batch_bytes, _batch_start = 0, 0
+    for _log in logs:
+        _message = _log.message
+        if (_event_size := _get_event_size(_message)) > MAX_EVENT_SIZE:
+            _message = _truncate_message(_message)
+            _event_size = _get_event_size(_message)
+
+        if _batch and (
+            len(_batch) >= MAX_LOGS_PER_PUT
+            or _batch_bytes + _event_size > MAX_BYTES_PER_PUT
+            or _log.timestamp - _batch_start >= MAX_SPAN_PER_PUT
+        ):
+            res.append(_batch)
+            _batch = []
+        if not _batch:
+            _batch_bytes, _batch_start = 0, _log.timestamp
+
+        _batch.append(LogMessage(timestamp=_log.timestamp, message=_message))
+        _batch_bytes += _event_size
+    if _batch:
+        res.append(_batch)
+    return res
+
+
+def _is_retryable(e: Exception) -> bool:
+    """Connection issues, throttling and 5xx server errors are worth retrying."""
+    if isinstance(e, ClientError):
+        return (
+            e.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+            or e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) >= 500
+        )
+    return isinstance(e, (BotoCoreError, OSError))
+
+
+class _RetryQueue:
+    """Entries of a failed log stream, retried after a jittered backoff.
+
+    Entries are re-packed into batches on retrying, so the queue is bounded
+        by the size of the entries instead of the number of the failed rounds.
+    """
+
+    def __init__(self) -> None:
+        self.logs: deque[LogRecord] = deque()
+        self.nbytes = 0
+        self.retry_count = 0
+        self.retry_at = 0.0
+        # with spool, the read count of the spool before the oldest queued entry
+        self.spool_seq: int | None = None
+
+    def extend(self, logs: Iterable[LogRecord]) -> None:
+        """Queue <logs> behind the pending ones."""
+        for _log in logs:
+            self.logs.append(_log)
+            self.nbytes += _get_event_size(_log.message)
+
+    def trim(self) -> int:
+        """Drop the oldest entries beyond MAX_RETRY_BYTES, return the dropped num."""
+        _dropped = 0
+        while self.nbytes > MAX_RETRY_BYTES:
+            self.nbytes -= _get_event_size(self.logs.popleft().message)
+            _dropped += 1
+        return _dropped
+
+    def take(self) -> list[LogRecord]:
+        _logs = list(self.logs)
+        self.logs.clear()
+        self.nbytes, self.spool_seq = 0, None
+        return _logs
+
+    def backoff(self, now: float) -> float:
+        """Schedule the next retry, return the backoff in seconds."""
+        # NOTE: with jitter, streams failed together are not retried together
+        _backoff = min(RETRY_BACKOFF_FACTOR * 2**self.retry_count, RETRY_BACKOFF_MAX)
+        _backoff *= random.uniform(0.5, 1)
+        self.retry_at = now + _backoff
+        self.retry_count += 1
+        return _backoff
+
+
 class AWSIoTLogger:
     """
     Ref: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/logs.html
     """
 
-    # this upper bound is defined by boto3, check doc for more details.
-    MAX_LOGS_PER_PUT = 10_000
-
     def __init__(
         self,
         session_config: IoTSessionConfig,
         queue: LogsQueue,
         max_logs_per_merge: int,
         interval: int,
+        drain_rate_meter: DrainRateMeter | None = None,
+        max_latency: float = 0,
+        upload_concurrency: int = 1,
     ):
         _boto3_session = get_session(session_config)
-        self._client = client = _boto3_session.client(service_name="logs")
+        # NOTE: the client(and its connection pool) is shared by the upload
+        #       workers, botocore client is thread-safe.
+        self._client = client = _boto3_session.client(
+            service_name="logs",
+            config=Config(
+                max_pool_connections=max(upload_concurrency, MAX_POOL_CONNECTIONS)
+            ),
+        )
         self._exc_types = client.exceptions
 
         self._session_config = session_config
@@ -80,11 +222,37 @@ class AWSIoTLogger:
         )
         self._interval = interval
         self._queue: LogsQueue = queue
-        # NOTE: add this limitation to ensure all of the log_streams in a merge
-        #       will definitely have entries less than MAX_LOGS_PER_PUT
-        self._max_logs_per_merge = min(max_logs_per_merge, self.MAX_LOGS_PER_PUT)
+        # NOTE: a stream with more entries than the PutLogEvents limits in
+        #       a merge is uploaded with multiple requests.
+        self._max_logs_per_merge = max_logs_per_merge
+        self._drain_rate_meter = drain_rate_meter
+        # NOTE: entries read from the spool MUST be committed after uploaded
+        self._spool = queue if isinstance(queue, LogsSpool) else None
+        # NOTE: failed batches are retried by stream later, while the other
+        #       streams keep being uploaded.
+        self._retry_queues: dict[tuple[LogGroupType, str], _RetryQueue] = {}
+        # NOTE: with spool, the entries in the retry queues are not committed,
+        #       the spool is committed up to the oldest of them.
+        self._spool_read, self._spool_committed = 0, 0
+
+        # NOTE: streams of a round are uploaded concurrently, while the
+        #       batches of a stream are uploaded in order by one worker.
+        self._upload_executor = None
+        if upload_concurrency > 1:
+            self._upload_executor = ThreadPoolExecutor(
+                max_workers=upload_concurrency, thread_name_prefix="iot_logger_upload"
+            )
+
+        # NOTE: only the LogsBacklog tracks the pending entries by stream,
+        #       which is required by the adaptive flush.
+        self._max_latency = max_latency
+        self._adaptive_flush = max_latency > 0 and isinstance(queue, LogsBacklog)
+        if max_latency > 0 and not self._adaptive_flush:
+            logger.warning(
+                f"adaptive flush is not supported with {type(queue).__name__}, "
+                f"upload every {interval=}s"
+            )
 
-    @retry(max_retry=16, backoff_factor=2, backoff_max=32)
     def _create_log_stream(self, log_group_name: str, log_stream_name: str):
         client = self._client
         exc_types = self._exc_types
@@ -110,10 +278,9 @@ class AWSIoTLogger:
             logger.error(f"failed to create {log_stream_name=}@{log_group_name}: {e!r}")
             raise
 
-    @retry(backoff_factor=2)
     def put_log_events(
         self, log_group_name: str, log_stream_name: str, message_list: list[LogMessage]
-    ):
+    ) -> bool:
         """
         Ref:
         https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/logs/client/put_log_events.html
@@ -122,6 +289,11 @@ class AWSIoTLogger:
         NOTE: The sequenceToken parameter is now ignored in PutLogEvents actions. PutLogEvents actions are now accepted
             and never return InvalidSequenceTokenException or DataAlreadyAcceptedException even if the sequence token is not valid.
             See the documentation for more details.
+
+        Returns:
+            False if the upload failed with connection issues, throttling or
+                server errors, or the log stream failed to be created, and worth
+                retrying later, True otherwise(including the logs being rejected by cloudwatch).
         """
         request = LogEvent(
             logGroupName=log_group_name,
@@ -130,71 +302,307 @@ class AWSIoTLogger:
         )
 
         exc_types, client = self._exc_types, self._client
-        try:
-            client.put_log_events(**request)
-            # logger.debug(f"successfully uploaded: {response}")
-        except exc_types.ResourceNotFoundException as e:
-            logger.debug(f"{log_stream_name=} not found: {e!r}")
-            self._create_log_stream(log_group_name, log_stream_name)
-            raise
-        except Exception as e:
-            # NOTE: for unhandled exception, we just log it and ignore,
-            #       leave for the developer to properly handle it
-            #       in the future!
-            logger.error(
-                f"put_log_events failure: {e!r}\n"
-                f"log_group_name={log_group_name}, \n"
-                f"log_stream_name={log_stream_name}"
+        for _ in range(2):
+            try:
+                client.put_log_events(**request)
+                # logger.debug(f"successfully uploaded: {response}")
+                return True
+            except exc_types.ResourceNotFoundException as e:
+                logger.debug(f"{log_stream_name=} not found: {e!r}")
+                # NOTE: upload again right after the log stream is created,
+                #       the failures are retried later by the retry queue.
+                try:
+                    self._create_log_stream(log_group_name, log_stream_name)
+                except Exception:
+                    return False
+            except Exception as e:
+                # NOTE: for unhandled exception, we just log it and ignore,
+                #       leave for the developer to properly handle it
+                #       in the future!
+                logger.error(
+                    f"put_log_events failure: {e!r}\n"
+                    f"log_group_name={log_group_name}, \n"
+                    f"log_stream_name={log_stream_name}"
+                )
+                return not _is_retryable(e)
+        return False
+
+    def _merge_logs(
+        self,
+    ) -> tuple[dict[tuple[LogGroupType, str], list[LogRecord]], int]:
+        """Take at most <max_logs_per_merge> entries from the queue, grouped by
+        log_group_type and log_stream_suffix.
+
+        With adaptive flush, only the streams that are full or pending for
+            <max_latency> are taken, block until any stream is due, at most
+            <interval> seconds.
+
+        Returns:
+            A tuple of the grouped entries and the number of taken entries.
+        """
+        _queue = self._queue
+        if self._adaptive_flush:
+            message_dict = _queue.get_due_streams(  # type: ignore[attr-defined]
+                self._max_logs_per_merge,
+                max_latency=self._max_latency,
+                flush_count=min(self._max_logs_per_merge, MAX_LOGS_PER_PUT),
+                flush_bytes=MAX_BYTES_PER_PUT,
+                timeout=self._interval,
             )
+            return message_dict, sum(map(len, message_dict.values()))
 
-    def thread_main(self) -> NoReturn:
-        """Main entry for running this iot_logger in a thread."""
-        while True:
-            # merge LogMessages into the same source, identified by
-            # log_group_type and log_stream_suffix.
-            message_dict: dict[tuple[LogGroupType, str], list[LogMessage]] = (
-                defaultdict(list)
+        if isinstance(_queue, LogsBacklog):
+            # entries are already grouped by stream on enqueue
+            message_dict = _queue.get_streams(self._max_logs_per_merge)
+            return message_dict, sum(map(len, message_dict.values()))
+
+        # merge LogRecords into the same source, identified by
+        # log_group_type and log_stream_suffix.
+        message_dict = defaultdict(list)
+        _merge_count = 0
+        while _merge_count < self._max_logs_per_merge:
+            try:
+                log_group_type, log_stream_suffix, message = _queue.get_nowait()
+                _merge_count += 1
+                message_dict[(log_group_type, log_stream_suffix)].append(message)
+            except Empty:
+                break
+        return message_dict, _merge_count
+
+    def _upload_stream(
+        self, stream: tuple[LogGroupType, str], logs: list[LogRecord], now: float
+    ) -> tuple[bool, list[LogRecord]]:
+        """Upload the entries of one stream in order.
+
+        The entries of the failed batch and the following ones are queued in
+            the retry queue of the stream, and retried after a jittered backoff.
+            New entries of a stream pending for retrying are queued behind until
+            the retry is due.
+        With spool, the entries failed on retrying, or beyond MAX_RETRY_BYTES,
+            are returned to be put back into the spool instead of being dropped.
+
+        Returns:
+            A tuple of whether all the entries are uploaded, and the entries
+                to be put back into the spool.
+        """
+        log_group_type, log_stream_suffix = stream
+        # get the log_group_name based on the log_group_type
+        log_group_name = (
+            self._otaclient_logs_metrics_group
+            if log_group_type == LogGroupType.METRICS
+            else self._otaclient_logs_log_group
+        )
+        log_stream_name = get_log_stream_name(
+            self._session_config.thing_name, log_stream_suffix
+        )
+
+        if _retry_queue := self._retry_queues.get(stream):
+            if now < _retry_queue.retry_at:
+                # NOTE: new entries are queued behind the failed ones, so that
+                #       the entries of a stream are still uploaded in order.
+                _retry_queue.extend(logs)
+                if self._spool and _retry_queue.nbytes > MAX_RETRY_BYTES:
+                    return False, _retry_queue.take()
+                self._trim_retry_queue(log_stream_name, _retry_queue)
+                return False, []
+            logs = [*_retry_queue.take(), *logs]
+
+        _uploaded_num = 0
+        for _batch in build_log_batches(logs):
+            _uploaded = False
+            with contextlib.suppress(Exception):
+                _uploaded = self.put_log_events(log_group_name, log_stream_name, _batch)
+                # don't let the exception breaks the main loop
+            if _uploaded:
+                _uploaded_num += len(_batch)
+                continue
+
+            _retry_queue = self._retry_queues.setdefault(stream, _RetryQueue())
+            _backoff = _retry_queue.backoff(now)
+            logger.warning(f"{log_stream_name=}: retry in {_backoff:.1f}s")
+            # NOTE: <logs> are sorted in place by build_log_batches
+            if self._spool:
+                return False, logs[_uploaded_num:]
+            _retry_queue.extend(logs[_uploaded_num:])
+            self._trim_retry_queue(log_stream_name, _retry_queue)
+            return False, []
+
+        self._retry_queues.pop(stream, None)
+        return True, []
+
+    def _trim_retry_queue(self, log_stream_name: str, retry_queue: _RetryQueue) -> None:
+        if _dropped := retry_queue.trim():
+            logger.warning(
+                f"{log_stream_name=}: drop {_dropped} entries pending for retrying"
             )
 
-            _merge_count = 0
-            while _merge_count < self._max_logs_per_merge:
-                _queue = self._queue
-                try:
-                    log_group_type, log_stream_suffix, message = _queue.get_nowait()
-                    _merge_count += 1
-                    message_dict[(log_group_type, log_stream_suffix)].append(message)
-                except Empty:
-                    break
-
-            for (log_group_type, log_stream_suffix), logs in message_dict.items():
-                # get the log_group_name based on the log_group_type
-                log_group_name = (
-                    self._otaclient_logs_metrics_group
-                    if log_group_type == LogGroupType.METRICS
-                    else self._otaclient_logs_log_group
+    def _upload(
+        self,
+        message_dict: dict[tuple[LogGroupType, str], list[LogRecord]],
+        merge_count: int,
+    ) -> bool:
+        """Upload the merged entries of one round, and commit them to the spool.
+
+        NOTE: LogRecords are packed into the LogMessage batches required by
+              boto3 here, right before uploading, see build_log_batches.
+        Streams are uploaded concurrently by the upload workers if
+            <upload_concurrency> > 1, this method returns after all the streams
+            are uploaded, so the entries of a stream are always uploaded in order.
+        The streams pending for retrying are also uploaded once the retry is due,
+            see _upload_stream.
+
+        With spool, the spool is committed up to the oldest entry pending in the
+            retry queues, the entries failed on retrying are put back to the end
+            of the spool. If no stream is uploaded, the round is rolled back
+            instead, to not rewrite the spool when the remote is unreachable.
+
+        Returns:
+            False if no stream is uploaded while some stream failed or deferred,
+                i.e., the remote is unreachable, True otherwise.
+        """
+        _now = time.monotonic()
+        _round_start = self._spool_read
+        self._spool_read += merge_count
+
+        _streams = dict(message_dict)
+        for _stream, _retry_queue in self._retry_queues.items():
+            if (
+                _retry_queue.logs
+                and _stream not in _streams
+                and _retry_queue.retry_at <= _now
+            ):
+                _streams[_stream] = []
+
+        if self._upload_executor and len(_streams) > 1:
+            _futs = [
+                self._upload_executor.submit(self._upload_stream, _key, _logs, _now)
+                for _key, _logs in _streams.items()
+            ]
+            _results = [_fut.result() for _fut in _futs]
+        else:
+            _results = [
+                self._upload_stream(_key, _logs, _now)
+                for _key, _logs in _streams.items()
+            ]
+        _progressed = not _results or any(_uploaded for _uploaded, _ in _results)
+
+        if self._spool:
+            if not _progressed:
+                # NOTE: the entries read since the last commit are read again
+                self._spool.rollback()
+                self._spool_read = self._spool_committed
+                for _retry_queue in self._retry_queues.values():
+                    _retry_queue.take()
+                return False
+
+            if _put_back := [
+                (_log_group_type, _log_stream_suffix, _log)
+                for (_log_group_type, _log_stream_suffix), (_, _logs) in zip(
+                    _streams, _results, strict=True
+                )
+                for _log in _logs
+            ]:
+                self._spool.put_back(_put_back)
+
+            _commit_to = self._spool_read
+            for _retry_queue in self._retry_queues.values():
+                if not _retry_queue.logs:
+                    continue
+                if _retry_queue.spool_seq is None:
+                    _retry_queue.spool_seq = _round_start
+                _commit_to = min(_commit_to, _retry_queue.spool_seq)
+            if _commit_to > self._spool_committed:
+                self._spool.commit(_commit_to - self._spool_committed)
+                self._spool_committed = _commit_to
+        return _progressed
+
+    def thread_main(self) -> NoReturn:
+        """Main entry for running this iot_logger in a thread.
+
+        Rounds are run back-to-back while there is a backlog, i.e., the last
+            round took <max_logs_per_merge> entries. The uploader only idles
+            for <interval> when the queue is drained, or the upload failed, see
+            _upload for more details.
+
+        With adaptive flush(<max_latency> > 0), a stream is uploaded as soon as
+            it has a full batch, or its oldest pending entry has been pending
+            for <max_latency>. So a single log waits at most <max_latency>,
+            while during bursts the streams are uploaded in full batches.
+        """
+        _last_round_start, _last_round_saturated = time.monotonic(), False
+        while True:
+            # NOTE: only record the drain rate of the saturated rounds, which
+            #       reflects the upload capacity instead of the incoming rate.
+            _round_start = time.monotonic()
+            if _last_round_saturated and self._drain_rate_meter:
+                self._drain_rate_meter.record(
+                    self._max_logs_per_merge, _round_start - _last_round_start
                 )
+            _last_round_start = _round_start
+
+            message_dict, _merge_count = self._merge_logs()
+            _last_round_saturated = _merge_count >= self._max_logs_per_merge
 
-                with contextlib.suppress(Exception):
-                    self.put_log_events(
-                        log_group_name,
-                        get_log_stream_name(
-                            self._session_config.thing_name,
-                            log_stream_suffix,
-                        ),
-                        logs,
+            _uploaded = self._upload(message_dict, _merge_count)
+            if not _uploaded or not (self._adaptive_flush or _last_round_saturated):
+                time.sleep(self._interval)
+
+    async def async_main(self) -> NoReturn:
+        """Main entry for running this iot_logger in the server's event loop.
+
+        Entries are merged into batches on the event loop, and the batches are
+            uploaded in a dedicated thread, so that the event loop is not
+            blocked by the network calls. With adaptive flush or spool, the
+            entries are also merged in the dedicated thread, as merging blocks.
+            Rounds are scheduled as thread_main.
+        """
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="iot_logger")
+        _last_round_start, _last_round_saturated = time.monotonic(), False
+        try:
+            while True:
+                _round_start = time.monotonic()
+                if _last_round_saturated and self._drain_rate_meter:
+                    self._drain_rate_meter.record(
+                        self._max_logs_per_merge, _round_start - _last_round_start
                     )
-                    # don't let the exception breaks the main loop
-            time.sleep(self._interval)
+                _last_round_start = _round_start
 
+                if self._adaptive_flush or self._spool:
+                    # NOTE: waiting for the due streams, or reading the spool
+                    #       segment files blocks.
+                    message_dict, _merge_count = await loop.run_in_executor(
+                        executor, self._merge_logs
+                    )
+                else:
+                    message_dict, _merge_count = self._merge_logs()
+                _last_round_saturated = _merge_count >= self._max_logs_per_merge
+                _uploaded = True
+                if _merge_count or self._retry_queues:
+                    _uploaded = await loop.run_in_executor(
+                        executor, self._upload, message_dict, _merge_count
+                    )
+                if not _uploaded or not (self._adaptive_flush or _last_round_saturated):
+                    await asyncio.sleep(self._interval)
+        finally:
+            executor.shutdown(wait=False)
 
-def start_aws_iot_logger_thread(queue: LogsQueue) -> Thread:
-    iot_logger = AWSIoTLogger(
+
+def create_aws_iot_logger(queue: LogsQueue) -> AWSIoTLogger:
+    return AWSIoTLogger(
         session_config=parse_config(),
         queue=queue,
         max_logs_per_merge=server_cfg.MAX_LOGS_PER_MERGE,
         interval=server_cfg.UPLOAD_INTERVAL,
+        drain_rate_meter=drain_rate_meter,
+        max_latency=server_cfg.UPLOAD_MAX_LATENCY,
+        upload_concurrency=server_cfg.UPLOAD_CONCURRENCY,
     )
 
+
+def start_aws_iot_logger_thread(queue: LogsQueue) -> Thread:
+    iot_logger = create_aws_iot_logger(queue)
+
     _thread = Thread(target=iot_logger.thread_main, daemon=True)
     _thread.start()
     logger.debug("iot logger thread started")
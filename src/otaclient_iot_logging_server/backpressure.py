@@ -0,0 +1,78 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Backpressure hints for the log producers.
+
+The uploader records its drain rate of the logs backlog, and the servicer
+reports the backlog fill ratio and a suggested retry-after delay estimated
+from the backlog size and the drain rate to the producers.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+
+from otaclient_iot_logging_server.configs import server_cfg
+
+MIN_RETRY_AFTER = 0.1  # seconds
+MAX_RETRY_AFTER = 60  # seconds
+
+RESUME_FILL_RATIO = 0.5
+"""Producers are suggested to retry after the backlog drains to this ratio."""
+
+
+class DrainRateMeter:
+    """Exponentially smoothed drain rate(logs per second) of the logs backlog.
+
+    NOTE: the rate is kept in shared memory, so that the rate recorded by
+          the uploader in the main process can be read by the forked
+          ingestion workers.
+    """
+
+    SMOOTHING_FACTOR = 0.3
+
+    def __init__(self, initial_rate: float) -> None:
+        self._rate = mp.RawValue("d", initial_rate)
+
+    @property
+    def rate(self) -> float:
+        return self._rate.value
+
+    def record(self, drained: int, elapsed: float) -> None:
+        """Record <drained> logs being drained from backlog in <elapsed> seconds.
+
+        NOTE: only the rounds that the uploader is saturated should be recorded,
+              otherwise the drain rate is limited by the incoming rate.
+        """
+        if drained <= 0 or elapsed <= 0:
+            return
+        _alpha = self.SMOOTHING_FACTOR
+        self._rate.value = _alpha * drained / elapsed + (1 - _alpha) * self._rate.value
+
+
+def estimate_retry_after(backlog: int, fill_ratio: float, drain_rate: float) -> float:
+    """Estimate the seconds needed for the backlog to drain to RESUME_FILL_RATIO.
+
+    The entries are assumed to contribute to the <fill_ratio> evenly.
+    """
+    if fill_ratio <= RESUME_FILL_RATIO:
+        return MIN_RETRY_AFTER
+    if drain_rate <= 0:
+        return MAX_RETRY_AFTER
+    _to_drain = backlog * (1 - RESUME_FILL_RATIO / fill_ratio)
+    return min(max(_to_drain / drain_rate, MIN_RETRY_AFTER), MAX_RETRY_AFTER)
+
+
+drain_rate_meter = DrainRateMeter(
+    initial_rate=server_cfg.MAX_LOGS_PER_MERGE / max(server_cfg.UPLOAD_INTERVAL, 1)
+)
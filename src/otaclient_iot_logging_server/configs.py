@@ -25,6 +25,24 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 from otaclient_iot_logging_server.config_file_monitor import monitored_config_files
 
 _LoggingLevelName = Literal["INFO", "DEBUG", "CRITICAL", "ERROR", "WARNING"]
+_DropPolicy = Literal["drop_newest", "drop_oldest", "sampling"]
+
+
+def _parse_file_mode(_in: int | str) -> int:
+    """Parse file mode in octal string(like 0660) from env var."""
+    if isinstance(_in, str):
+        return int(_in, 8)
+    return _in
+
+
+_FileMode = Annotated[int, BeforeValidator(_parse_file_mode)]
+
+
+class ECURateLimit(BaseModel):
+    model_config = SettingsConfigDict(frozen=True)
+    rate: float = Field(ge=0)
+    """Logs per second, 0 means unlimited."""
+    burst: int = Field(ge=1)
 
 
 class ConfigurableLoggingServerConfig(BaseSettings):
@@ -40,6 +58,23 @@ class ConfigurableLoggingServerConfig(BaseSettings):
     LISTEN_ADDRESS: str = "127.0.0.1"
     LISTEN_PORT: int = 8083
     LISTEN_PORT_GRPC: int = 8084
+    ENABLE_TCP_LISTENER: bool = True
+    """Whether to listen on <LISTEN_ADDRESS> with TCP."""
+    LISTEN_UNIX_SOCKET: str = ""
+    """The unix domain socket path HTTP server listens on, empty to disable."""
+    LISTEN_UNIX_SOCKET_GRPC: str = ""
+    """The unix domain socket path gRPC server listens on, empty to disable."""
+    LISTEN_UNIX_SOCKET_MODE: _FileMode = 0o660
+    GRPC_FAST_PATH: bool = True
+    """Handle gRPC PutLog requests without wrapper conversion."""
+    GRPC_COMPRESSION: Literal["none", "deflate", "gzip"] = "none"
+    """Compression for gRPC responses, compressed requests are always accepted."""
+    HTTP_MAX_BODY_SIZE: int = 1024**2  # in bytes
+    """Max (decoded) body size of the single log HTTP request."""
+    HTTP_BULK_MAX_BODY_SIZE: int = 64 * 1024**2  # in bytes
+    """Max (decoded) body size of the bulk logs HTTP request."""
+    USE_UVLOOP: bool = False
+    """Run the servers on uvloop if it is installed, fallback to asyncio if not."""
     UPLOAD_LOGGING_SERVER_LOGS: bool = False
     SERVER_LOGSTREAM_SUFFIX: str = "iot_logging_server"
     SERVER_LOGGING_LEVEL: _LoggingLevelName = "INFO"
@@ -47,9 +82,53 @@ class ConfigurableLoggingServerConfig(BaseSettings):
         "[%(asctime)s][%(levelname)s]-%(name)s:%(funcName)s:%(lineno)d,%(message)s"
     )
 
-    MAX_LOGS_BACKLOG: int = 4096
+    INGESTION_WORKERS: int = 1
+    """Fork <INGESTION_WORKERS> ingestion processes if larger than 1."""
+
+    MAX_LOGS_BACKLOG: int = 65536
+    """Max pending log entries."""
+    MAX_LOGS_BACKLOG_BYTES: int = 16 * 1024**2  # in bytes
+    """Memory budget of the pending log entries."""
+    LOGS_DROP_POLICY: _DropPolicy = "drop_newest"
+    """How to drop the log entries when the backlog is full."""
+    LOGS_DROP_SAMPLING_RATE: int = Field(default=10, ge=1)
+    """With sampling drop policy, admit 1 of every <N> logs of an ECU on backlog full."""
+    USE_SHM_RING_QUEUE: bool = False
+    """Use the shared memory ring buffer of <MAX_LOGS_BACKLOG_BYTES> as the logs queue."""
+
+    SPOOL_DIR: str = ""
+    """Persist the pending log entries under <SPOOL_DIR>, empty to disable."""
+    SPOOL_MAX_BYTES: int = 256 * 1024**2  # in bytes
+    """Disk quota of the spool."""
+    SPOOL_SEGMENT_SIZE: int = 8 * 1024**2  # in bytes
+    SPOOL_FSYNC_BATCH: int = 1024
+    """Fsync the spool every <SPOOL_FSYNC_BATCH> entries."""
+    SPOOL_FSYNC_INTERVAL: float = 1  # in seconds
+    """Fsync the spool at least every <SPOOL_FSYNC_INTERVAL> seconds."""
     MAX_LOGS_PER_MERGE: int = 512
+    ASYNC_PIPELINE: bool = False
+    """Run the uploader in the server's event loop instead of a separate thread."""
     UPLOAD_INTERVAL: int = 3  # in seconds
+    UPLOAD_CONCURRENCY: int = Field(default=4, ge=1)
+    """Max number of log streams being uploaded concurrently."""
+    UPLOAD_MAX_LATENCY: float = Field(default=0, ge=0)  # in seconds
+    """Upload a log stream once it has a full batch, or its oldest pending log
+    has been pending for <UPLOAD_MAX_LATENCY>, 0 to upload every <UPLOAD_INTERVAL>."""
+
+    STREAM_LOGS_ACK_LOGS_NUM: int = 1024
+    """Ack the StreamLogs producer every <STREAM_LOGS_ACK_LOGS_NUM> logs."""
+    STREAM_LOGS_ACK_INTERVAL: float = 1  # in seconds
+    """Ack the StreamLogs producer at least every <STREAM_LOGS_ACK_INTERVAL> seconds."""
+
+    ECU_RATE_LIMIT: float = Field(default=0, ge=0)  # logs per second
+    """Default per-ECU rate limit, 0 to disable."""
+    ECU_RATE_LIMIT_BURST: int = Field(default=1024, ge=1)
+    """Default per-ECU burst size."""
+    ECU_RATE_LIMIT_OVERRIDES: dict[str, ECURateLimit] = {}
+    """Per-ECU rate limits by ECU id, override the default."""
+
+    COALESCE_WINDOW: float = Field(default=0, ge=0)  # in seconds
+    """Coalesce the consecutive identical logs of a stream within the window, 0 to disable."""
 
     ECU_INFO_YAML: str = "/boot/ota/ecu_info.yaml"
 
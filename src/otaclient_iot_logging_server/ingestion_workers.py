@@ -0,0 +1,106 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Multi-process ingestion workers.
+
+In workers mode, <INGESTION_WORKERS> ingestion processes are forked from the
+main process. Each worker runs its own HTTP and gRPC servers bound to the same
+TCP addresses with SO_REUSEPORT, and the kernel balances the connections among
+the workers. All the workers feed log entries into one multiprocessing queue,
+which is consumed by the only AWSIoTLogger in the main process.
+
+NOTE: unix socket listeners cannot be shared with SO_REUSEPORT, they are only
+      served by the first worker.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+import multiprocessing.connection
+import sys
+from multiprocessing.context import ForkProcess
+
+from typing_extensions import NoReturn
+
+from otaclient_iot_logging_server._common import LogsQueue
+from otaclient_iot_logging_server._sd_notify import (
+    READY_MSG,
+    sd_notify,
+    sd_notify_enabled,
+)
+from otaclient_iot_logging_server.log_proxy_server import (
+    WAIT_BEFORE_SEND_READY_MSG,
+    launch_server,
+)
+
+logger = logging.getLogger(__name__)
+
+# NOTE: always use fork to start the workers, the workers should be forked
+#       before any threads are started in the main process.
+_mp_ctx = mp.get_context("fork")
+
+
+def create_ipc_queue(maxsize: int) -> LogsQueue:
+    """Create the queue shared between the workers and the main process."""
+    return _mp_ctx.Queue(maxsize=maxsize)  # type: ignore
+
+
+def _worker_main(queue: LogsQueue, worker_idx: int) -> None:
+    logger.info(f"ingestion worker#{worker_idx} started")
+    launch_server(
+        queue,
+        reuse_port=True,
+        serve_unix_socket=worker_idx == 0,
+        # NOTE: systemd only accepts notify from the main process by default
+        notify_ready=False,
+    )
+
+
+def launch_ingestion_workers(queue: LogsQueue, workers_num: int) -> list[ForkProcess]:
+    workers: list[ForkProcess] = []
+    for _idx in range(workers_num):
+        _worker = _mp_ctx.Process(
+            target=_worker_main,
+            args=(queue, _idx),
+            name=f"iot_logging_server_worker_{_idx}",
+            # daemonic workers are terminated on the main process exits
+            daemon=True,
+        )
+        _worker.start()
+        workers.append(_worker)
+    logger.info(f"{workers_num} ingestion workers launched")
+    return workers
+
+
+def wait_for_ingestion_workers(workers: list[ForkProcess]) -> NoReturn:
+    """Supervise the workers, exit the main process when any worker exits."""
+    _sentinels = [_worker.sentinel for _worker in workers]
+
+    if sd_notify_enabled():
+        logger.info(
+            "otaclient-logger service is configured to send ready msg to systemd, "
+            f"wait for {WAIT_BEFORE_SEND_READY_MSG} seconds for the workers starting up ..."
+        )
+        if not multiprocessing.connection.wait(
+            _sentinels, timeout=WAIT_BEFORE_SEND_READY_MSG
+        ):
+            sd_notify(READY_MSG)
+
+    multiprocessing.connection.wait(_sentinels)
+    for _worker in workers:
+        if not _worker.is_alive():
+            logger.error(f"{_worker.name} exited with {_worker.exitcode}, abort")
+    # NOTE: the remaining daemonic workers are terminated on exiting
+    sys.exit(1)
@@ -0,0 +1,497 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Logs backlog bounded by memory budget."""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import insort
+from collections import defaultdict
+from operator import attrgetter
+from queue import Full, Queue
+from typing import Container, Sequence
+
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+from otaclient_iot_logging_server._utils import format_timestamp
+from otaclient_iot_logging_server.v1._types import LogLevel
+
+ENTRY_OVERHEAD = 128  # in bytes
+"""Estimated memory cost of one entry besides the message payload."""
+
+PRIORITY_LANES = (
+    LogLevel.TRACE,
+    LogLevel.DEBUG,
+    LogLevel.INFO,
+    LogLevel.WARN,
+    LogLevel.ERROR,
+    LogLevel.FATAL,
+)
+"""Log levels of the priority lanes, from the lowest priority to the highest."""
+_LANE_OF_LEVEL = {_level: _lane for _lane, _level in enumerate(PRIORITY_LANES)}
+# NOTE: logs without level are treated as INFO
+DEFAULT_LANE = _LANE_OF_LEVEL[LogLevel.INFO]
+
+
+DROP_NEWEST = "drop_newest"
+"""Reject the incoming entry when the backlog is full."""
+DROP_OLDEST = "drop_oldest"
+"""Evict the oldest entries to make room for the incoming entry."""
+DROP_SAMPLING = "sampling"
+"""Admit one of every <sampling_rate> incoming entries of an ECU by evicting
+the oldest entries, reject the others."""
+
+
+def get_entry_size(entry: tuple[LogGroupType, str, LogRecord]) -> int:
+    return len(entry[2].message) + ENTRY_OVERHEAD
+
+
+def get_lane(level: int) -> int:
+    """Get the priority lane of <level>, higher lane has higher priority."""
+    return _LANE_OF_LEVEL.get(level, DEFAULT_LANE)
+
+
+def get_drop_summary(
+    ecu_id: str, count: int, first_timestamp: int, last_timestamp: int
+) -> LogRecord:
+    return LogRecord(
+        timestamp=last_timestamp,
+        message=(
+            f"{count} messages dropped from ECU {ecu_id} between "
+            f"{format_timestamp(first_timestamp)} and {format_timestamp(last_timestamp)}"
+        ),
+    )
+
+
+def _insert_drop_summaries(
+    streams: dict[tuple[LogGroupType, str], list[LogRecord]],
+    drops: dict[tuple[LogGroupType, str], tuple[int, int, int]],
+) -> dict[tuple[LogGroupType, str], list[LogRecord]]:
+    for _key, (_count, _first, _last) in drops.items():
+        insort(
+            streams.setdefault(_key, []),
+            get_drop_summary(_key[1], _count, _first, _last),
+            key=attrgetter("timestamp"),
+        )
+    return streams
+
+
+class LogsBacklog(Queue[tuple[LogGroupType, str, LogRecord]]):
+    """Logs queue bounded by the total size of the entries.
+
+    The size of an entry is estimated by its message payload length plus
+        ENTRY_OVERHEAD. An entry is rejected if it makes the total size exceed
+        <max_bytes>, or the entries count exceed <maxsize>(if <maxsize> > 0).
+
+    Entries are put into the priority lanes by their log level. When the
+        backlog is full, the oldest entries of the lower lanes are evicted to
+        make room for an entry of higher level, the entry is rejected only if
+        evicting all the lower lanes is not enough. Entries of the higher lanes
+        are taken first.
+    If there is still no room for the entry, it is handled by the
+        <drop_policy>, see DROP_NEWEST, DROP_OLDEST and DROP_SAMPLING.
+
+    Dropped entries, rejected or evicted, are counted by ECU. get_streams
+        injects one summary event of the drops since the last call into
+        each stream that has entries dropped.
+
+    Within a lane, entries are sharded into per-stream lists keyed by
+        (log_group_type, ecu_id) on enqueue, the uploader takes the whole
+        pending list of a stream with get_streams. Entries of the same stream
+        are kept in order, get pops from the stream that has pending entries
+        for the longest time.
+    get_due_streams only takes the streams that are full or have pending
+        entries for long enough, see AWSIoTLogger for the adaptive flush.
+
+    NOTE: get and eviction cost O(n) of the stream's pending entries, use
+          get_streams for draining the backlog.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        *,
+        max_bytes: int,
+        drop_policy: str = DROP_NEWEST,
+        sampling_rate: int = 10,
+    ) -> None:
+        super().__init__(maxsize)
+        self.max_bytes = max_bytes
+        self.drop_policy = drop_policy
+        self.sampling_rate = sampling_rate
+        self.evicted = 0
+        """Number of entries evicted for the incoming entries."""
+        self.dropped: defaultdict[str, int] = defaultdict(int)
+        """Number of dropped entries by ECU id."""
+
+        # NOTE: protected by self.mutex
+        self._sampling_counters: defaultdict[str, int] = defaultdict(int)
+        # drops not yet reported, (count, first timestamp, last timestamp)
+        self._drops: dict[tuple[LogGroupType, str], tuple[int, int, int]] = {}
+        # streams full thresholds, only set while waiting in get_due_streams
+        self._flush_count, self._flush_bytes = 0, 0
+        # notified on a new pending stream or a full stream while waiting
+        self._streams_updated = threading.Condition(self.mutex)
+
+    # ------ Queue internal API, called with mutex held ------ #
+
+    def _init(self, maxsize: int) -> None:
+        # NOTE: dict keeps insertion order, a drained stream is removed and
+        #       re-inserted at the end on its next entry.
+        self._lanes: list[dict[tuple[LogGroupType, str], list[LogRecord]]] = [
+            {} for _ in PRIORITY_LANES
+        ]
+        self._lanes_streams_nbytes: list[dict[tuple[LogGroupType, str], int]] = [
+            {} for _ in PRIORITY_LANES
+        ]
+        self._lanes_nbytes = [0] * len(PRIORITY_LANES)
+        self._lanes_count = [0] * len(PRIORITY_LANES)
+        self._nbytes = 0
+        self._count = 0
+        # pending [count, nbytes, monotonic time of the first pending entry]
+        #   of each stream across the lanes
+        self._streams_pending: dict[tuple[LogGroupType, str], list] = {}
+
+    def _qsize(self) -> int:
+        return self._count
+
+    def _put(
+        self, item: tuple[LogGroupType, str, LogRecord], lane: int = DEFAULT_LANE
+    ) -> None:
+        _log_group_type, _ecu_id, _log_msg = item
+        _key, _entry_size = (_log_group_type, _ecu_id), get_entry_size(item)
+        _streams, _streams_nbytes = self._lanes[lane], self._lanes_streams_nbytes[lane]
+        try:
+            _streams[_key].append(_log_msg)
+            _streams_nbytes[_key] += _entry_size
+        except KeyError:
+            _streams[_key] = [_log_msg]
+            _streams_nbytes[_key] = _entry_size
+
+        self._lanes_nbytes[lane] += _entry_size
+        self._lanes_count[lane] += 1
+        self._nbytes += _entry_size
+        self._count += 1
+
+        try:
+            _pending = self._streams_pending[_key]
+            _pending[0] += 1
+            _pending[1] += _entry_size
+            if self._flush_count and self._is_stream_full(_pending):
+                self._streams_updated.notify()
+        except KeyError:
+            self._streams_pending[_key] = [1, _entry_size, time.monotonic()]
+            if self._flush_count:
+                self._streams_updated.notify()
+
+    def _take_pending(
+        self, key: tuple[LogGroupType, str], count: int, nbytes: int
+    ) -> None:
+        _pending = self._streams_pending[key]
+        if _pending[0] <= count:
+            del self._streams_pending[key]
+        else:
+            _pending[0] -= count
+            _pending[1] -= nbytes
+
+    def _is_stream_full(self, pending: list) -> bool:
+        _count, _nbytes, _ = pending
+        return (
+            _count >= self._flush_count
+            or _nbytes - _count * ENTRY_OVERHEAD >= self._flush_bytes
+        )
+
+    def _take_streams(
+        self, max_entries: int, keys: Container[tuple[LogGroupType, str]] | None
+    ) -> dict[tuple[LogGroupType, str], list[LogRecord]]:
+        """Take at most <max_entries> pending entries of <keys>(or all) streams."""
+        res: dict[tuple[LogGroupType, str], list[LogRecord]] = {}
+        _merged_keys: set[tuple[LogGroupType, str]] = set()
+        _remaining = max_entries
+        for _lane in reversed(range(len(PRIORITY_LANES))):
+            _streams = self._lanes[_lane]
+            _streams_nbytes = self._lanes_streams_nbytes[_lane]
+            for _key in list(_streams):
+                if _remaining <= 0:
+                    break
+                if keys is not None and _key not in keys:
+                    continue
+
+                _logs = _streams[_key]
+                if len(_logs) <= _remaining:
+                    del _streams[_key]
+                    _taken_nbytes = _streams_nbytes.pop(_key)
+                else:
+                    _logs, _streams[_key] = _logs[:_remaining], _logs[_remaining:]
+                    _taken_nbytes = (
+                        sum(len(_log_msg.message) for _log_msg in _logs)
+                        + len(_logs) * ENTRY_OVERHEAD
+                    )
+                    _streams_nbytes[_key] -= _taken_nbytes
+
+                if _key in res:
+                    res[_key].extend(_logs)
+                    _merged_keys.add(_key)
+                else:
+                    res[_key] = _logs
+                _remaining -= len(_logs)
+                self._lanes_nbytes[_lane] -= _taken_nbytes
+                self._lanes_count[_lane] -= len(_logs)
+                self._nbytes -= _taken_nbytes
+                self._count -= len(_logs)
+                self._take_pending(_key, len(_logs), _taken_nbytes)
+
+        if res:
+            self.not_full.notify_all()
+        for _key in res:
+            # NOTE: the stream is partially taken as <max_entries> is reached,
+            #       the remaining entries are due immediately.
+            if _pending := self._streams_pending.get(_key):
+                _pending[2] = -math.inf
+        for _key in _merged_keys:
+            res[_key].sort(key=attrgetter("timestamp"))
+        return res
+
+    def _pop_oldest(self, lane: int) -> tuple[LogGroupType, str, LogRecord]:
+        """Pop the first entry of the oldest stream in <lane>."""
+        _streams = self._lanes[lane]
+        _key = next(iter(_streams))
+        _logs = _streams[_key]
+        _item = (*_key, _logs.pop(0))
+        _entry_size = get_entry_size(_item)  # type: ignore
+        if _logs:
+            self._lanes_streams_nbytes[lane][_key] -= _entry_size
+        else:
+            del _streams[_key], self._lanes_streams_nbytes[lane][_key]
+
+        self._lanes_nbytes[lane] -= _entry_size
+        self._lanes_count[lane] -= 1
+        self._nbytes -= _entry_size
+        self._count -= 1
+        self._take_pending(_key, 1, _entry_size)
+        return _item  # type: ignore
+
+    def _get(self) -> tuple[LogGroupType, str, LogRecord]:
+        for _lane in reversed(range(len(PRIORITY_LANES))):
+            if self._lanes[_lane]:
+                return self._pop_oldest(_lane)
+        raise IndexError("get from an empty backlog")
+
+    def _is_full(self, entry_size: int) -> bool:
+        return (0 < self.maxsize <= self._qsize()) or (
+            self._nbytes + entry_size > self.max_bytes
+        )
+
+    def _record_drop(self, item: tuple[LogGroupType, str, LogRecord]) -> None:
+        _log_group_type, _ecu_id, _log_msg = item
+        _key, _timestamp = (_log_group_type, _ecu_id), _log_msg.timestamp
+        self.dropped[_ecu_id] += 1
+        try:
+            _count, _first, _last = self._drops[_key]
+            self._drops[_key] = (
+                _count + 1,
+                min(_first, _timestamp),
+                max(_last, _timestamp),
+            )
+        except KeyError:
+            self._drops[_key] = (1, _timestamp, _timestamp)
+
+    def _evict(self, entry_size: int, lane: int) -> bool:
+        """Evict entries of the lanes lower than <lane> to make room.
+
+        Returns:
+            True if there is room for the entry now, False if evicting all
+                the lower lanes is still not enough, no entry is evicted then.
+        """
+        _lower_nbytes = sum(self._lanes_nbytes[:lane])
+        _lower_count = sum(self._lanes_count[:lane])
+        if (0 < self.maxsize <= self._count - _lower_count) or (
+            self._nbytes - _lower_nbytes + entry_size > self.max_bytes
+        ):
+            return False
+
+        for _lower_lane in range(lane):
+            while self._lanes[_lower_lane] and self._is_full(entry_size):
+                self._record_drop(self._pop_oldest(_lower_lane))
+                self.evicted += 1
+        return True
+
+    def _make_room(
+        self, item: tuple[LogGroupType, str, LogRecord], entry_size: int, lane: int
+    ) -> bool:
+        """Make room for <item> by the priority lanes and the drop policy."""
+        if self._evict(entry_size, lane):
+            return True
+        if self.drop_policy == DROP_SAMPLING:
+            _ecu_id = item[1]
+            self._sampling_counters[_ecu_id] += 1
+            if self._sampling_counters[_ecu_id] % self.sampling_rate:
+                return False
+        elif self.drop_policy != DROP_OLDEST:
+            return False
+        # also evict the entries in the same lane
+        return self._evict(entry_size, lane + 1)
+
+    # ------ public API ------ #
+
+    def put(
+        self,
+        item: tuple[LogGroupType, str, LogRecord],
+        block: bool = True,
+        timeout: float | None = None,
+        *,
+        level: int = LogLevel.UNSPECIFIC,
+    ) -> None:
+        _entry_size, _lane = get_entry_size(item), get_lane(level)
+        with self.not_full:
+            if self._is_full(_entry_size) and not self._make_room(
+                item, _entry_size, _lane
+            ):
+                # the entry can never fit into the backlog
+                if not block or _entry_size > self.max_bytes:
+                    self._record_drop(item)
+                    raise Full
+
+                _deadline = None if timeout is None else time.monotonic() + timeout
+                while self._is_full(_entry_size):
+                    if _deadline is None:
+                        self.not_full.wait()
+                        continue
+                    _remaining = _deadline - time.monotonic()
+                    if _remaining <= 0:
+                        self._record_drop(item)
+                        raise Full
+                    self.not_full.wait(_remaining)
+
+            self._put(item, _lane)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def put_nowait(
+        self,
+        item: tuple[LogGroupType, str, LogRecord],
+        *,
+        level: int = LogLevel.UNSPECIFIC,
+    ) -> None:
+        return self.put(item, block=False, level=level)
+
+    def put_many(
+        self,
+        items: Sequence[tuple[LogGroupType, str, LogRecord]],
+        *,
+        levels: Sequence[int] | None = None,
+        rejected: list[int] | None = None,
+    ) -> int:
+        """Put <items> into the backlog within one lock acquisition.
+
+        Each entry is admitted as put_nowait does by its level in <levels>,
+            the rejected entries are counted as dropped, and their indexes
+            are appended to <rejected> if provided.
+
+        Returns:
+            The number of the accepted entries.
+        """
+        _accepted = 0
+        with self.mutex:
+            for _idx, _item in enumerate(items):
+                _entry_size = get_entry_size(_item)
+                _lane = get_lane(levels[_idx]) if levels else DEFAULT_LANE
+                if self._is_full(_entry_size) and not self._make_room(
+                    _item, _entry_size, _lane
+                ):
+                    self._record_drop(_item)
+                    if rejected is not None:
+                        rejected.append(_idx)
+                    continue
+                self._put(_item, _lane)
+                _accepted += 1
+
+            if _accepted:
+                self.unfinished_tasks += _accepted
+                self.not_empty.notify(_accepted)
+        return _accepted
+
+    def get_streams(
+        self, max_entries: int
+    ) -> dict[tuple[LogGroupType, str], list[LogRecord]]:
+        """Take at most <max_entries> pending entries grouped by stream.
+
+        Lanes are taken from the highest priority, streams in a lane are taken
+            in the order of their oldest pending entry. The pending list of
+            a stream is taken as it without copying, unless only part of it can
+            be taken within <max_entries>, or the stream has entries in
+            multiple lanes, which are merged in timestamp order.
+        The drop summary events are inserted into the streams in timestamp
+            order, they are not counted in <max_entries>.
+        """
+        with self.mutex:
+            res = self._take_streams(max_entries, None)
+            _drops, self._drops = self._drops, {}
+        return _insert_drop_summaries(res, _drops)
+
+    def get_due_streams(
+        self,
+        max_entries: int,
+        *,
+        max_latency: float,
+        flush_count: int,
+        flush_bytes: int,
+        timeout: float,
+    ) -> dict[tuple[LogGroupType, str], list[LogRecord]]:
+        """Wait for the due streams, take at most <max_entries> pending entries of them.
+
+        A stream is due when it is full, i.e., it has <flush_count> pending
+            entries or <flush_bytes> of pending messages, or its first pending
+            entry has been pending for <max_latency> seconds.
+        If no stream is due, wait until one becomes due, at most <timeout>
+            seconds. The due streams are taken as get_streams.
+        """
+        _deadline = time.monotonic() + timeout
+        with self.mutex:
+            self._flush_count, self._flush_bytes = flush_count, flush_bytes
+            try:
+                while True:
+                    _now = time.monotonic()
+                    _due_keys: set[tuple[LogGroupType, str]] = set()
+                    _next_due = _deadline
+                    for _key, _pending in self._streams_pending.items():
+                        _due = _pending[2] + max_latency
+                        if _due <= _now or self._is_stream_full(_pending):
+                            _due_keys.add(_key)
+                        else:
+                            _next_due = min(_next_due, _due)
+                    if _due_keys or _now >= _deadline:
+                        break
+                    self._streams_updated.wait(_next_due - _now)
+            finally:
+                self._flush_count, self._flush_bytes = 0, 0
+
+            res = self._take_streams(max_entries, _due_keys)
+            _drops, self._drops = self._drops, {}
+        return _insert_drop_summaries(res, _drops)
+
+    @property
+    def nbytes(self) -> int:
+        """The estimated total size of the entries in the backlog."""
+        with self.mutex:
+            return self._nbytes
+
+    def fill_ratio(self) -> float:
+        """The fill ratio of the backlog, by the most filled of the two bounds."""
+        with self.mutex:
+            _ratio = self._nbytes / self.max_bytes
+            if self.maxsize > 0:
+                _ratio = max(_ratio, self._qsize() / self.maxsize)
+            return min(_ratio, 1)
@@ -0,0 +1,115 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Coalesce the consecutive identical logs of a stream.
+
+The first log of a run of identical logs is passed through, the following
+duplicates within the window are absorbed and counted. When the run ends,
+by a different log or the window expiring, one summary event of the
+duplicates is emitted with the repeat count, first and last timestamps.
+
+NOTE: in ingestion workers mode, each worker has its own coalescer.
+"""
+
+from __future__ import annotations
+
+import time
+
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+from otaclient_iot_logging_server._utils import format_timestamp
+from otaclient_iot_logging_server.configs import server_cfg
+
+
+class _Run:
+    __slots__ = ("message", "level", "started", "count", "first", "last")
+
+    def __init__(self, message: str, level: int, started: float) -> None:
+        self.message = message
+        self.level = level
+        self.started = started
+        self.count = 0
+        """Number of the absorbed duplicates."""
+        self.first = self.last = 0
+
+    def get_summary(self) -> LogRecord | None:
+        if not self.count:
+            return None
+        return LogRecord(
+            timestamp=self.last,
+            message=(
+                f"{self.message}\n[repeated {self.count} times between "
+                f"{format_timestamp(self.first)} and {format_timestamp(self.last)}]"
+            ),
+        )
+
+
+class LogCoalescer:
+    """Coalesce the consecutive identical logs by stream within <window> seconds."""
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self._runs: dict[tuple[LogGroupType, str], _Run] = {}
+        self.coalesced = 0
+        """Number of the absorbed duplicated logs."""
+
+    def coalesce(
+        self, key: tuple[LogGroupType, str], record: LogRecord, level: int = 0
+    ) -> tuple[tuple[LogRecord, int] | None, bool]:
+        """Feed <record> of stream <key> to the coalescer.
+
+        Returns:
+            A tuple of the (summary, log level) of the ended run to be put before
+                <record> if any, and whether <record> is absorbed as a duplicate.
+        """
+        _now = time.monotonic()
+        _run = self._runs.get(key)
+        if (
+            _run
+            and _run.message == record.message
+            and _now - _run.started < self.window
+        ):
+            if not _run.count:
+                _run.first = record.timestamp
+            _run.count += 1
+            _run.last = record.timestamp
+            self.coalesced += 1
+            return None, True
+
+        self._runs[key] = _Run(record.message, level, _now)
+        if _run and (_summary := _run.get_summary()):
+            return (_summary, _run.level), False
+        return None, False
+
+    def flush_expired(self) -> list[tuple[tuple[LogGroupType, str], LogRecord, int]]:
+        """Pop the runs older than the window.
+
+        Returns:
+            A list of (stream key, summary, log level) of the popped runs
+                that have duplicates absorbed.
+        """
+        _now = time.monotonic()
+        res = []
+        for _key, _run in list(self._runs.items()):
+            if _now - _run.started < self.window:
+                continue
+            del self._runs[_key]
+            if _summary := _run.get_summary():
+                res.append((_key, _summary, _run.level))
+        return res
+
+
+def create_log_coalescer() -> LogCoalescer | None:
+    """Create coalescer from server_cfg, return None if coalescing is not configured."""
+    if server_cfg.COALESCE_WINDOW <= 0:
+        return None
+    return LogCoalescer(server_cfg.COALESCE_WINDOW)
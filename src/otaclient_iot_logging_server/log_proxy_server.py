@@ -17,8 +17,12 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import os
 from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Coroutine
 
+import grpc
 import grpc.aio
 from aiohttp import web
 
@@ -28,56 +32,126 @@ from otaclient_iot_logging_server._sd_notify import (
     sd_notify,
     sd_notify_enabled,
 )
+from otaclient_iot_logging_server.backpressure import drain_rate_meter
 from otaclient_iot_logging_server.configs import server_cfg
 from otaclient_iot_logging_server.ecu_info import ecu_info
+from otaclient_iot_logging_server.log_coalescer import create_log_coalescer
+from otaclient_iot_logging_server.rate_limiter import create_ecu_rate_limiter
 from otaclient_iot_logging_server.servicer import OTAClientIoTLoggingServerServicer
 from otaclient_iot_logging_server.v1 import (
     otaclient_iot_logging_server_v1_pb2_grpc as v1_grpc,
 )
-from otaclient_iot_logging_server.v1.api_stub import OTAClientIoTLoggingServiceV1
+from otaclient_iot_logging_server.v1.api_stub import (
+    OTAClientIoTLoggingServiceV1,
+    OTAClientIoTLoggingServiceV1FastPath,
+)
 
 logger = logging.getLogger(__name__)
 
 
 WAIT_BEFORE_SEND_READY_MSG = 2  # seconds
 
+_GRPC_COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "deflate": grpc.Compression.Deflate,
+    "gzip": grpc.Compression.Gzip,
+}
 
-async def _start_http_server(handler: OTAClientIoTLoggingServerServicer):
-    app = web.Application()
-    app.add_routes([web.post(r"/{ecu_id}", handler.http_put_log)])
 
-    runner = web.AppRunner(app)
-    await runner.setup()
-    site = web.TCPSite(
-        runner, host=server_cfg.LISTEN_ADDRESS, port=server_cfg.LISTEN_PORT
-    )
+def _prepare_unix_socket_dir(socket_path: str) -> None:
+    Path(socket_path).parent.mkdir(parents=True, exist_ok=True)
+
+
+def _set_unix_socket_mode(socket_path: str) -> None:
     try:
-        await site.start()
-        logger.info(
-            f"HTTP server started at {server_cfg.LISTEN_ADDRESS}:{server_cfg.LISTEN_PORT}"
-        )
+        os.chmod(socket_path, server_cfg.LISTEN_UNIX_SOCKET_MODE)
     except Exception as e:
-        logger.error(f"Failed to start HTTP server: {e}")
+        logger.error(f"failed to set file mode for {socket_path}: {e!r}")
+
+
+async def _start_http_server(
+    handler: OTAClientIoTLoggingServerServicer,
+    *,
+    reuse_port: bool = False,
+    serve_unix_socket: bool = True,
+):
+    app = web.Application(client_max_size=server_cfg.HTTP_MAX_BODY_SIZE)
+    app.add_routes(
+        [
+            web.post(r"/{ecu_id}", handler.http_put_log),
+            web.post(r"/{ecu_id}/bulk", handler.http_put_logs_bulk),
+        ]
+    )
 
+    runner = web.AppRunner(app)
+    await runner.setup()
 
-async def _start_grpc_server(handler: OTAClientIoTLoggingServerServicer):
+    sites: list[web.BaseSite] = []
+    if server_cfg.ENABLE_TCP_LISTENER:
+        sites.append(
+            web.TCPSite(
+                runner,
+                host=server_cfg.LISTEN_ADDRESS,
+                port=server_cfg.LISTEN_PORT,
+                reuse_port=reuse_port or None,
+            )
+        )
+    _unix_socket = serve_unix_socket and server_cfg.LISTEN_UNIX_SOCKET
+    if _unix_socket:
+        _prepare_unix_socket_dir(_unix_socket)
+        sites.append(web.UnixSite(runner, path=_unix_socket))
+
+    for site in sites:
+        try:
+            await site.start()
+            logger.info(f"HTTP server started at {site.name}")
+        except Exception as e:
+            logger.error(f"Failed to start HTTP server at {site.name}: {e}")
+
+    if _unix_socket:
+        _set_unix_socket_mode(_unix_socket)
+
+
+async def _start_grpc_server(
+    handler: OTAClientIoTLoggingServerServicer,
+    *,
+    reuse_port: bool = False,
+    serve_unix_socket: bool = True,
+):
     thread_pool = ThreadPoolExecutor(
         thread_name_prefix="otaclient_iot_logging_server",
     )
-    otaclient_iot_logging_service_v1 = OTAClientIoTLoggingServiceV1(handler)
-
-    server = grpc.aio.server(migration_thread_pool=thread_pool)
+    if server_cfg.GRPC_FAST_PATH:
+        otaclient_iot_logging_service_v1 = OTAClientIoTLoggingServiceV1FastPath(handler)
+    else:
+        otaclient_iot_logging_service_v1 = OTAClientIoTLoggingServiceV1(handler)
+
+    # NOTE: compressed requests are decoded by grpc with the encoding negotiated
+    #       by the client, <compression> here only applies to the responses.
+    server = grpc.aio.server(
+        migration_thread_pool=thread_pool,
+        compression=_GRPC_COMPRESSION[server_cfg.GRPC_COMPRESSION],
+        options=[("grpc.so_reuseport", 1)] if reuse_port else None,
+    )
     v1_grpc.add_OTAClientIoTLoggingServiceServicer_to_server(
         server=server, servicer=otaclient_iot_logging_service_v1
     )
-    server.add_insecure_port(
-        f"{server_cfg.LISTEN_ADDRESS}:{server_cfg.LISTEN_PORT_GRPC}"
-    )
-    logger.info(
-        f"launch grpc server at {server_cfg.LISTEN_ADDRESS}:{server_cfg.LISTEN_PORT_GRPC}"
-    )
+    if server_cfg.ENABLE_TCP_LISTENER:
+        server.add_insecure_port(
+            f"{server_cfg.LISTEN_ADDRESS}:{server_cfg.LISTEN_PORT_GRPC}"
+        )
+        logger.info(
+            f"launch grpc server at {server_cfg.LISTEN_ADDRESS}:{server_cfg.LISTEN_PORT_GRPC}"
+        )
+    _unix_socket = serve_unix_socket and server_cfg.LISTEN_UNIX_SOCKET_GRPC
+    if _unix_socket:
+        _prepare_unix_socket_dir(_unix_socket)
+        server.add_insecure_port(f"unix:{_unix_socket}")
+        logger.info(f"launch grpc server at unix:{_unix_socket}")
 
     await server.start()
+    if _unix_socket:
+        _set_unix_socket_mode(_unix_socket)
     try:
         await server.wait_for_termination()
     finally:
@@ -85,18 +159,38 @@ async def _start_grpc_server(handler: OTAClientIoTLoggingServerServicer):
         thread_pool.shutdown(wait=True)
 
 
-async def _start_server(queue: LogsQueue):
-    handler = OTAClientIoTLoggingServerServicer(ecu_info=ecu_info, queue=queue)
+async def _start_server(
+    queue: LogsQueue,
+    *,
+    reuse_port: bool = False,
+    serve_unix_socket: bool = True,
+    uploader: Callable[[], Coroutine[Any, Any, Any]] | None = None,
+):
+    handler = OTAClientIoTLoggingServerServicer(
+        ecu_info=ecu_info,
+        queue=queue,
+        stream_ack_logs_num=server_cfg.STREAM_LOGS_ACK_LOGS_NUM,
+        stream_ack_interval=server_cfg.STREAM_LOGS_ACK_INTERVAL,
+        bulk_max_body_size=server_cfg.HTTP_BULK_MAX_BODY_SIZE,
+        max_backlog=server_cfg.MAX_LOGS_BACKLOG,
+        drain_rate_meter=drain_rate_meter,
+        rate_limiter=create_ecu_rate_limiter(ecu_info),
+        coalescer=create_log_coalescer(),
+    )
     await asyncio.gather(
-        _start_http_server(handler),
-        _start_grpc_server(handler),
+        _start_http_server(
+            handler, reuse_port=reuse_port, serve_unix_socket=serve_unix_socket
+        ),
+        _start_grpc_server(
+            handler, reuse_port=reuse_port, serve_unix_socket=serve_unix_socket
+        ),
+        handler.flush_coalesced_logs(),
+        *([uploader()] if uploader else []),
     )
 
 
-def launch_server(queue: LogsQueue) -> None:
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
+def _notify_ready_later(loop: asyncio.AbstractEventLoop) -> None:
+    """Send ready msg to systemd after the server starting up, if configured."""
     if sd_notify_enabled():
         logger.info(
             "otaclient-logger service is configured to send ready msg to systemd, "
@@ -109,4 +203,48 @@ def launch_server(queue: LogsQueue) -> None:
             READY_MSG,
         )
 
-    loop.run_until_complete(_start_server(queue))
+
+def _new_event_loop() -> asyncio.AbstractEventLoop:
+    if server_cfg.USE_UVLOOP:
+        try:
+            import uvloop
+
+            return uvloop.new_event_loop()
+        except ImportError:
+            logger.debug("uvloop is not installed, use the default event loop")
+    return asyncio.new_event_loop()
+
+
+def launch_server(
+    queue: LogsQueue,
+    *,
+    reuse_port: bool = False,
+    serve_unix_socket: bool = True,
+    notify_ready: bool = True,
+    uploader: Callable[[], Coroutine[Any, Any, Any]] | None = None,
+) -> None:
+    """Launch the HTTP and gRPC servers.
+
+    Args:
+        queue: the queue to put the received log entries into.
+        reuse_port: bind the TCP listeners with SO_REUSEPORT, for multiple
+            server processes listening on the same address.
+        serve_unix_socket: whether to listen on the configured unix sockets.
+        notify_ready: whether to send ready msg to systemd.
+        uploader: the uploader coroutine function to run in the server's
+            event loop, for the async pipeline mode.
+    """
+    loop = _new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    if notify_ready:
+        _notify_ready_later(loop)
+
+    loop.run_until_complete(
+        _start_server(
+            queue,
+            reuse_port=reuse_port,
+            serve_unix_socket=serve_unix_socket,
+            uploader=uploader,
+        )
+    )
@@ -0,0 +1,400 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Disk-backed write-ahead spool of the log entries.
+
+Log entries are appended to segment files(<seq>.seg) under the spool dir,
+one JSON record per line. The uploader reads the entries from the oldest
+segment, and commits the read entries after they are uploaded. The commit
+position is checkpointed to the checkpoint file, the segments before the
+checkpoint are removed.
+
+On startup, the entries after the checkpoint are replayed. The entries
+uploaded but not yet checkpointed before the restart will be uploaded again.
+
+NOTE: writes are fsync'ed in batches by a background thread, the entries
+      written within the last <fsync_interval> might get lost on power loss.
+      The fsync and checkpoint I/O is done outside the mutex, so that it
+      never blocks the putters.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import threading
+from collections import deque
+from io import BufferedReader, BufferedWriter
+from pathlib import Path
+from queue import Empty, Full, Queue
+from typing import Sequence
+
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".seg"
+CHECKPOINT_FNAME = "checkpoint.json"
+
+
+def _encode_entry(entry: tuple[LogGroupType, str, LogRecord]) -> bytes:
+    _log_group_type, _ecu_id, _log_msg = entry
+    _record = [
+        _log_group_type.value,
+        _ecu_id,
+        _log_msg.timestamp,
+        _log_msg.message,
+    ]
+    return json.dumps(_record, ensure_ascii=False).encode() + b"\n"
+
+
+def _decode_entry(line: bytes) -> tuple[LogGroupType, str, LogRecord]:
+    _log_group_type, _ecu_id, _timestamp, _message = json.loads(line)
+    return (
+        LogGroupType(_log_group_type),
+        _ecu_id,
+        LogRecord(timestamp=_timestamp, message=_message),
+    )
+
+
+class LogsSpool(Queue[tuple[LogGroupType, str, LogRecord]]):
+    """Logs queue persisted in append-only segment files.
+
+    The spool is bounded by <max_bytes> total size of the segment files,
+        new entries are rejected when the quota is used up.
+    The uploader MUST call commit after the read entries are uploaded, or
+        call rollback to read the uncommitted entries again later.
+    """
+
+    def __init__(
+        self,
+        spool_dir: Path | str,
+        *,
+        max_bytes: int,
+        segment_size: int = 8 * 1024**2,
+        fsync_batch: int = 1024,
+        fsync_interval: float = 1,
+    ) -> None:
+        self._spool_dir = Path(spool_dir)
+        self._max_bytes = max_bytes
+        self._segment_size = segment_size
+        self._fsync_batch = fsync_batch
+        self._fsync_interval = fsync_interval
+        super().__init__()
+
+        # NOTE: all the states below are protected by self.mutex
+        self._disk_usage = 0
+        # the [segment seq, offset, lines] after each read but uncommitted entry,
+        #   <lines> includes the corrupted lines skipped right after the entry.
+        self._inflight: deque[list[int]] = deque()
+        self._checkpoint_dirty = False
+        self._unsynced = 0
+        # rotated writers to be fsync'ed and closed by the fsync thread
+        self._rotated: list[BufferedWriter] = []
+        # segments of the corrupted entries dropped on reading, logged after
+        #   the mutex is released, as the logs might be put into the spool.
+        self._corrupted: list[int] = []
+
+        # NOTE: serializes the disk I/O done outside the mutex
+        self._io_lock = threading.Lock()
+        self._fsync_event = threading.Event()
+        self._load()
+
+        threading.Thread(
+            target=self._fsync_thread, daemon=True, name="logs_spool_fsync"
+        ).start()
+
+    # ------ segment files management ------ #
+
+    def _segment_fpath(self, seq: int) -> Path:
+        return self._spool_dir / f"{seq:016d}{SEGMENT_SUFFIX}"
+
+    def _list_segments(self) -> list[int]:
+        return sorted(
+            int(_fpath.stem)
+            for _fpath in self._spool_dir.glob(f"*{SEGMENT_SUFFIX}")
+            if _fpath.stem.isdigit()
+        )
+
+    def _load_checkpoint(self) -> tuple[int, int]:
+        with contextlib.suppress(Exception):
+            _checkpoint = json.loads((self._spool_dir / CHECKPOINT_FNAME).read_text())
+            return int(_checkpoint["segment"]), int(_checkpoint["offset"])
+        return -1, 0
+
+    def _save_checkpoint(self) -> None:
+        """Save the commit position, and remove the fully committed segments.
+
+        NOTE: called without the mutex held, so that the disk I/O doesn't
+              block the putters.
+        """
+        with self._io_lock:
+            with self.mutex:
+                _seq, _offset = self._committed
+                self._checkpoint_dirty = False
+                _removed: list[int] = []
+                while self._segments[0] < _seq:
+                    _removed.append(self._segments.popleft())
+
+            _tmp = self._spool_dir / f".{CHECKPOINT_FNAME}"
+            with open(_tmp, "w") as f:
+                json.dump({"segment": _seq, "offset": _offset}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(_tmp, self._spool_dir / CHECKPOINT_FNAME)
+
+            _freed = 0
+            for _old_seq in _removed:
+                _fpath = self._segment_fpath(_old_seq)
+                with contextlib.suppress(OSError):
+                    _size = _fpath.stat().st_size
+                    _fpath.unlink()
+                    _freed += _size
+            if _freed:
+                with self.mutex:
+                    self._disk_usage -= _freed
+
+    def _load(self) -> None:
+        self._spool_dir.mkdir(parents=True, exist_ok=True)
+        _segments = self._list_segments()
+        _ckpt_seq, _ckpt_offset = self._load_checkpoint()
+
+        for _seq in _segments:
+            if _seq < _ckpt_seq:
+                self._segment_fpath(_seq).unlink(missing_ok=True)
+        _segments = [_seq for _seq in _segments if _seq >= _ckpt_seq]
+
+        # always start a new segment for writing, never append to old segments
+        _write_seq = _segments[-1] + 1 if _segments else 0
+        self._segments: deque[int] = deque(_segments)
+        self._segments.append(_write_seq)
+        self._writer: BufferedWriter = open(self._segment_fpath(_write_seq), "ab")
+        self._write_seq, self._write_offset = _write_seq, 0
+        self._unflushed = False
+
+        # replay from the checkpoint
+        _read_seq, _read_offset = self._segments[0], 0
+        if _read_seq == _ckpt_seq:
+            _read_offset = _ckpt_offset
+        self._committed = (_read_seq, _read_offset)
+        self._open_reader(_read_seq, _read_offset)
+
+        _pending = 0
+        for _seq in _segments:
+            _fpath = self._segment_fpath(_seq)
+            self._disk_usage += _fpath.stat().st_size
+            with open(_fpath, "rb") as f:
+                if _seq == _read_seq:
+                    f.seek(_read_offset)
+                _pending += sum(1 for _line in f if _line.endswith(b"\n"))
+        self._pending = _pending
+        if _pending:
+            logger.info(f"{_pending} entries to be replayed from {self._spool_dir}")
+
+    def _open_reader(self, seq: int, offset: int) -> None:
+        self._reader: BufferedReader = open(self._segment_fpath(seq), "rb")
+        self._reader.seek(offset)
+        self._read_seq = seq
+
+    def _rotate_writer(self) -> None:
+        # NOTE: the rotated writer is fsync'ed and closed by the fsync thread
+        self._writer.flush()
+        self._rotated.append(self._writer)
+        self._fsync_event.set()
+
+        self._write_seq += 1
+        self._write_offset = 0
+        self._writer = open(self._segment_fpath(self._write_seq), "ab")
+        self._segments.append(self._write_seq)
+        self._unsynced, self._unflushed = 0, False
+
+    def _sync(self, *, force: bool = False) -> None:
+        """fsync the written entries, called without the mutex held.
+
+        NOTE: writers are only closed here with the I/O lock held, so it is
+              safe to fsync the taken writers outside the mutex.
+        """
+        with self._io_lock:
+            with self.mutex:
+                _rotated, self._rotated = self._rotated, []
+                _writer = None
+                if self._unsynced or force:
+                    self._writer.flush()
+                    _writer = self._writer
+                    self._unsynced, self._unflushed = 0, False
+
+            for _rotated_writer in _rotated:
+                os.fsync(_rotated_writer.fileno())
+                _rotated_writer.close()
+            if _writer:
+                os.fsync(_writer.fileno())
+
+    def _fsync_thread(self) -> None:
+        while True:
+            self._fsync_event.wait(self._fsync_interval)
+            self._fsync_event.clear()
+            self._sync()
+            if self._checkpoint_dirty:
+                self._save_checkpoint()
+
+    # ------ Queue internal API, called with mutex held ------ #
+
+    def _qsize(self) -> int:
+        return self._pending
+
+    def _put(self, item: bytes) -> None:  # type: ignore[override]
+        if self._write_offset >= self._segment_size:
+            self._rotate_writer()
+        self._writer.write(item)
+        self._write_offset += len(item)
+        self._disk_usage += len(item)
+        self._pending += 1
+        self._unflushed = True
+
+        self._unsynced += 1
+        if self._unsynced >= self._fsync_batch:
+            self._fsync_event.set()
+
+    def _get(self) -> tuple[LogGroupType, str, LogRecord]:
+        while True:
+            if self._read_seq == self._write_seq and self._unflushed:
+                # make the buffered entries visible to the reader
+                self._writer.flush()
+                self._unflushed = False
+
+            _line = self._reader.readline()
+            if _line.endswith(b"\n"):
+                _pos = (self._read_seq, self._reader.tell())
+                self._pending -= 1
+                with contextlib.suppress(Exception):
+                    _entry = _decode_entry(_line)
+                    self._inflight.append([*_pos, 1])
+                    return _entry
+
+                # NOTE: the corrupted line is committed along with the entry
+                #       before it, or right away if there is no such entry.
+                self._corrupted.append(self._read_seq)
+                if self._inflight:
+                    self._inflight[-1][:] = [*_pos, self._inflight[-1][2] + 1]
+                else:
+                    self._committed = _pos
+                    self._checkpoint_dirty = True
+                continue
+
+            # NOTE: pending count includes the corrupted entries, which are
+            #       dropped on reading, the spool might become empty here.
+            if self._read_seq == self._write_seq:
+                self._pending = 0
+                raise Empty
+
+            # reach the end of the current segment, the last line of
+            #   a segment might be truncated on power loss, drop it.
+            self._reader.close()
+            self._open_reader(
+                self._segments[self._segments.index(self._read_seq) + 1], 0
+            )
+
+    # ------ public API ------ #
+
+    def get(
+        self, block: bool = True, timeout: float | None = None
+    ) -> tuple[LogGroupType, str, LogRecord]:
+        try:
+            return super().get(block, timeout)
+        finally:
+            if self._corrupted:
+                with self.mutex:
+                    _corrupted, self._corrupted = self._corrupted, []
+                for _seq in _corrupted:
+                    logger.warning(f"drop corrupted entry in segment#{_seq}")
+
+    def put(
+        self,
+        item: tuple[LogGroupType, str, LogRecord],
+        block: bool = True,
+        timeout: float | None = None,
+    ) -> None:
+        """Append <item> to the spool.
+
+        NOTE: the spool never blocks the caller, Full is raised immediately
+              if the disk quota is used up.
+        """
+        _record = _encode_entry(item)
+        with self.mutex:
+            if self._disk_usage + len(_record) > self._max_bytes:
+                raise Full
+            self._put(_record)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def put_many(self, items: Sequence[tuple[LogGroupType, str, LogRecord]]) -> int:
+        """Append <items> to the spool within one lock acquisition.
+
+        Entries are appended in order until the disk quota is used up.
+
+        Returns:
+            The number of the accepted entries, i.e., the first <n> of <items>.
+        """
+        _records = [_encode_entry(_item) for _item in items]
+        _accepted = 0
+        with self.mutex:
+            for _record in _records:
+                if self._disk_usage + len(_record) > self._max_bytes:
+                    break
+                self._put(_record)
+                _accepted += 1
+            if _accepted:
+                self.unfinished_tasks += _accepted
+                self.not_empty.notify(_accepted)
+        return _accepted
+
+    def put_back(self, items: Sequence[tuple[LogGroupType, str, LogRecord]]) -> None:
+        """Append <items> read from the spool back to the end of the spool.
+
+        NOTE: the disk quota is not applied, so that the read entries failed to
+              upload are never dropped. The space is released after the read
+              entries are committed.
+        """
+        _records = [_encode_entry(_item) for _item in items]
+        with self.mutex:
+            for _record in _records:
+                self._put(_record)
+            self.unfinished_tasks += len(_records)
+            self.not_empty.notify(len(_records))
+
+    def commit(self, count: int) -> None:
+        """Commit the first <count> read entries as uploaded."""
+        with self.mutex:
+            for _ in range(min(count, len(self._inflight))):
+                _seq, _offset, _ = self._inflight.popleft()
+                self._committed = (_seq, _offset)
+                # NOTE: only save the checkpoint when the position changed
+                self._checkpoint_dirty = True
+
+    def rollback(self) -> None:
+        """Rewind the reader to the last committed entry."""
+        with self.mutex:
+            self._pending += sum(_lines for *_, _lines in self._inflight)
+            self._inflight.clear()
+            self._reader.close()
+            self._open_reader(*self._committed)
+
+    def fill_ratio(self) -> float:
+        with self.mutex:
+            return min(self._disk_usage / self._max_bytes, 1)
+
+    def close(self) -> None:
+        self._sync(force=True)
+        self._save_checkpoint()
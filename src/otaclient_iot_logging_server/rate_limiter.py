@@ -0,0 +1,118 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Per-ECU token bucket admission control.
+
+NOTE: in ingestion workers mode, each worker has its own rate limiter.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from typing import Iterable, Mapping
+
+from otaclient_iot_logging_server.configs import ECURateLimit, server_cfg
+from otaclient_iot_logging_server.ecu_info import ECUInfo
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "_tokens", "_last_refill")
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+
+    def consume(self) -> bool:
+        _now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (_now - self._last_refill) * self.rate
+        )
+        self._last_refill = _now
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+class ECURateLimiter:
+    """Rate limit the incoming logs by ECU id.
+
+    Buckets of the known ECUs are prepared on init, buckets for other ECUs
+        are created on their first logs with the default limit.
+    """
+
+    def __init__(
+        self,
+        default_limit: ECURateLimit,
+        *,
+        overrides: Mapping[str, ECURateLimit] | None = None,
+        ecu_ids: Iterable[str] = (),
+    ) -> None:
+        self._default_limit = default_limit
+        self._overrides = overrides or {}
+
+        # NOTE: None for the ECUs without limit
+        self._buckets: dict[str, TokenBucket | None] = {}
+        for _ecu_id in ecu_ids:
+            self._buckets[_ecu_id] = self._new_bucket(_ecu_id)
+
+        self.rejected: defaultdict[str, int] = defaultdict(int)
+        """Number of rejected logs by ECU id."""
+        self._limited_ecus: set[str] = set()
+
+    def _new_bucket(self, ecu_id: str) -> TokenBucket | None:
+        _limit = self._overrides.get(ecu_id, self._default_limit)
+        if _limit.rate <= 0:
+            return None
+        return TokenBucket(_limit.rate, _limit.burst)
+
+    def admit(self, ecu_id: str) -> bool:
+        """Consume one token of <ecu_id>'s bucket, return False if no token left."""
+        try:
+            _bucket = self._buckets[ecu_id]
+        except KeyError:
+            _bucket = self._buckets[ecu_id] = self._new_bucket(ecu_id)
+
+        if _bucket is None or _bucket.consume():
+            self._limited_ecus.discard(ecu_id)
+            return True
+
+        self.rejected[ecu_id] += 1
+        if ecu_id not in self._limited_ecus:
+            self._limited_ecus.add(ecu_id)
+            logger.warning(
+                f"{ecu_id=} exceeds rate limit {_bucket.rate} logs/s, "
+                f"{self.rejected[ecu_id]} logs rejected in total"
+            )
+        return False
+
+
+def create_ecu_rate_limiter(ecu_info: ECUInfo | None) -> ECURateLimiter | None:
+    """Create rate limiter from server_cfg, return None if rate limit is not configured."""
+    if server_cfg.ECU_RATE_LIMIT <= 0 and not server_cfg.ECU_RATE_LIMIT_OVERRIDES:
+        return None
+
+    return ECURateLimiter(
+        ECURateLimit(
+            rate=server_cfg.ECU_RATE_LIMIT, burst=server_cfg.ECU_RATE_LIMIT_BURST
+        ),
+        overrides=server_cfg.ECU_RATE_LIMIT_OVERRIDES,
+        ecu_ids=ecu_info.ecu_id_set if ecu_info else (),
+    )
@@ -15,16 +15,31 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import math
+import sys
 import time
 from http import HTTPStatus
-from queue import Full
+from typing import AsyncGenerator, AsyncIterable, Iterable
 
 from aiohttp import web
-from aiohttp.web import Request
+from aiohttp.http_exceptions import LineTooLong
+from aiohttp.web import Request, RequestPayloadError
 
-from otaclient_iot_logging_server._common import LogGroupType, LogMessage, LogsQueue
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord, LogsQueue
+from otaclient_iot_logging_server._utils import put_many
+from otaclient_iot_logging_server.backpressure import (
+    DrainRateMeter,
+    estimate_retry_after,
+)
 from otaclient_iot_logging_server.ecu_info import ECUInfo
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
+from otaclient_iot_logging_server.log_coalescer import LogCoalescer
+from otaclient_iot_logging_server.log_spool import LogsSpool
+from otaclient_iot_logging_server.rate_limiter import ECURateLimiter
+from otaclient_iot_logging_server.shm_ring_queue import ShmRingQueue
 from otaclient_iot_logging_server.v1._types import (
     ErrorCode,
     HealthCheckResponse,
@@ -32,11 +47,20 @@ from otaclient_iot_logging_server.v1._types import (
     LogType,
     PutLogRequest,
     PutLogResponse,
+    PutLogsRequest,
+    PutLogsResponse,
     ServiceStatus,
+    StreamLogsResponse,
 )
 
 logger = logging.getLogger(__name__)
 
+HTTP_BULK_BATCH_SIZE = 512
+"""Parsed NDJSON records are put into queue in batches of this size."""
+_NDJSON_RECORD_FIELDS = ("log_type", "timestamp", "level", "message")
+
+BACKLOG_FILL_RATIO_HEADER = "X-Backlog-Fill-Ratio"
+
 
 class OTAClientIoTLoggingServerServicer:
     """Handlers for otaclient IoT logging service."""
@@ -46,8 +70,24 @@ class OTAClientIoTLoggingServerServicer:
         *,
         ecu_info: ECUInfo | None = None,
         queue: LogsQueue,
+        stream_ack_logs_num: int = 1024,
+        stream_ack_interval: float = 1,
+        bulk_max_body_size: int = 64 * 1024**2,
+        max_backlog: int = 0,
+        drain_rate_meter: DrainRateMeter | None = None,
+        rate_limiter: ECURateLimiter | None = None,
+        coalescer: LogCoalescer | None = None,
     ):
         self._queue = queue
+        # NOTE: only the LogsBacklog supports priority lanes by log level
+        self._backlog = queue if isinstance(queue, LogsBacklog) else None
+        self._max_backlog = max_backlog
+        self._drain_rate_meter = drain_rate_meter
+        self._rate_limiter = rate_limiter
+        self._coalescer = coalescer
+        self._bulk_max_body_size = bulk_max_body_size
+        self._stream_ack_logs_num = stream_ack_logs_num
+        self._stream_ack_interval = stream_ack_interval
         self._allowed_ecus = None
 
         if ecu_info:
@@ -68,6 +108,99 @@ class OTAClientIoTLoggingServerServicer:
             return LogGroupType.METRICS
         return LogGroupType.LOG
 
+    def get_backpressure(self, queue_full: bool = False) -> tuple[int, float]:
+        """
+        Get the (retry_after_ms, backlog_fill_ratio) backpressure hints.
+
+        <retry_after_ms> is only suggested when <queue_full>, estimated from
+            the backlog size and the uploader's drain rate.
+        <backlog_fill_ratio> is rounded to 2 decimal places, 0 if unknown.
+        """
+        _queue, _backlog = self._queue, self._queue.qsize()
+        if isinstance(_queue, (LogsBacklog, LogsSpool, ShmRingQueue)):
+            _fill_ratio = _queue.fill_ratio()
+        elif self._max_backlog > 0:
+            _fill_ratio = min(_backlog / self._max_backlog, 1)
+        else:
+            return 0, 0.0
+
+        _retry_after_ms = 0
+        if queue_full and self._drain_rate_meter:
+            _retry_after = estimate_retry_after(
+                _backlog, _fill_ratio, self._drain_rate_meter.rate
+            )
+            _retry_after_ms = math.ceil(_retry_after * 1000)
+        return _retry_after_ms, round(_fill_ratio, 2)
+
+    def _backpressure_headers(self, queue_full: bool = False) -> dict[str, str]:
+        _retry_after_ms, _fill_ratio = self.get_backpressure(queue_full)
+        _headers = {BACKLOG_FILL_RATIO_HEADER: f"{_fill_ratio:.2f}"}
+        if _retry_after_ms:
+            # NOTE: Retry-After header only accepts integer seconds
+            _headers["Retry-After"] = str(math.ceil(_retry_after_ms / 1000))
+        return _headers
+
+    def _enqueue_many(
+        self, items: list[tuple[LogGroupType, str, LogRecord]], levels: list[int]
+    ) -> list[int]:
+        """Put <items> into queue with one bulk put, coalesce them first if configured.
+
+        Returns:
+            The indexes of the items rejected as the queue is full.
+        """
+        if _coalescer := self._coalescer:
+            # NOTE: the summary of an ended run goes before the item ending it,
+            #       summaries are marked with index -1.
+            _pending: list[tuple[LogGroupType, str, LogRecord]] = []
+            _pending_levels: list[int] = []
+            _pending_idxs: list[int] = []
+            for _idx, (_item, _level) in enumerate(zip(items, levels, strict=True)):
+                _summary, _duplicated = _coalescer.coalesce(
+                    (_item[0], _item[1]), _item[2], _level
+                )
+                if _summary:
+                    # NOTE: the summary keeps the level of its own run
+                    _pending.append((_item[0], _item[1], _summary[0]))
+                    _pending_levels.append(_summary[1])
+                    _pending_idxs.append(-1)
+                if not _duplicated:
+                    _pending.append(_item)
+                    _pending_levels.append(_level)
+                    _pending_idxs.append(_idx)
+            items, levels = _pending, _pending_levels
+        else:
+            _pending_idxs = None
+
+        if self._backlog:
+            _rejected: list[int] = []
+            self._backlog.put_many(items, levels=levels, rejected=_rejected)
+        else:
+            _rejected = list(range(put_many(self._queue, items), len(items)))
+
+        if _pending_idxs is None:
+            return _rejected
+        return [_pending_idxs[_idx] for _idx in _rejected if _pending_idxs[_idx] >= 0]
+
+    async def flush_coalesced_logs(self) -> None:
+        """Periodically put the summaries of the expired duplicated logs runs."""
+        if not (_coalescer := self._coalescer):
+            return
+        while True:
+            await asyncio.sleep(_coalescer.window)
+            if not (_expired := _coalescer.flush_expired()):
+                continue
+
+            _items = [
+                (_log_group_type, _ecu_id, _summary)
+                for (_log_group_type, _ecu_id), _summary, _ in _expired
+            ]
+            if self._backlog:
+                self._backlog.put_many(
+                    _items, levels=[_level for _, _, _level in _expired]
+                )
+            else:
+                put_many(self._queue, _items)
+
     def _put_log(
         self,
         ecu_id: str,
@@ -87,29 +220,87 @@ class OTAClientIoTLoggingServerServicer:
         # if ECU id is unknown(not listed in ecu_info.yaml), drop this log.
         if self._allowed_ecus and ecu_id not in self._allowed_ecus:
             return ErrorCode.NOT_ALLOWED_ECU_ID
+        if self._rate_limiter and not self._rate_limiter.admit(ecu_id):
+            return ErrorCode.ECU_RATE_LIMITED
 
         _logging_group_type = self.convert_from_log_type_to_log_group_type(log_type)
         if timestamp is None or timestamp == 0:
             timestamp = int(time.time()) * 1000  # milliseconds
-        _logging_msg = LogMessage(
-            timestamp=timestamp,
-            message=message,
-        )
+        _logging_msg = LogRecord(timestamp=timestamp, message=message)
         # logger.debug(f"receive log from {ecu_id}: {_logging_msg}")
-        try:
-            self._queue.put_nowait((_logging_group_type, ecu_id, _logging_msg))
-        except Full:
-            logger.debug(f"message dropped: {_logging_msg}")
+        # NOTE: intern the ecu_id, so that the pending entries of the same ECU
+        #       share one ecu_id string.
+        _item = (_logging_group_type, sys.intern(ecu_id), _logging_msg)
+        if self._enqueue_many([_item], [level]):
+            # NOTE: drops are counted and reported by the LogsBacklog, don't
+            #       log each of them on the hot path.
             return ErrorCode.SERVER_QUEUE_FULL
 
         return ErrorCode.NO_FAILURE
 
+    def _put_logs(self, entries: Iterable[PutLogRequest]) -> list[ErrorCode]:
+        """
+        Put a batch of log messages into queue within one bulk put.
+
+        NOTE: <entries> can be either the wrapped PutLogRequest or the raw
+              protobuf PutLogRequest message, fields are read directly from it.
+              Entries are put into the queue in order until it is full, except
+              with LogsBacklog, which decides on each entry by its log level
+              and drop policy.
+        """
+        _allowed_ecus = self._allowed_ecus
+        _rate_limiter = self._rate_limiter
+        _now = int(time.time()) * 1000  # milliseconds
+
+        _res: list[ErrorCode] = []
+        _items: list[tuple[LogGroupType, str, LogRecord]] = []
+        _levels: list[int] = []
+        # index in <_res> of each item
+        _items_res_idx: list[int] = []
+        for _entry in entries:
+            if not (_message := _entry.message):
+                _res.append(ErrorCode.NO_MESSAGE)
+                continue
+            _ecu_id = _entry.ecu_id
+            if _allowed_ecus and _ecu_id not in _allowed_ecus:
+                _res.append(ErrorCode.NOT_ALLOWED_ECU_ID)
+                continue
+            if _rate_limiter and not _rate_limiter.admit(_ecu_id):
+                _res.append(ErrorCode.ECU_RATE_LIMITED)
+                continue
+
+            _items.append(
+                (
+                    self.convert_from_log_type_to_log_group_type(_entry.log_type),
+                    sys.intern(_ecu_id),
+                    LogRecord(timestamp=_entry.timestamp or _now, message=_message),
+                )
+            )
+            _levels.append(_entry.level)
+            _items_res_idx.append(len(_res))
+            _res.append(ErrorCode.NO_FAILURE)
+
+        if not _items:
+            return _res
+
+        if _rejected := self._enqueue_many(_items, _levels):
+            for _idx in _rejected:
+                _res[_items_res_idx[_idx]] = ErrorCode.SERVER_QUEUE_FULL
+            logger.debug(f"queue full, {len(_rejected)} dropped")
+        return _res
+
     async def http_put_log(self, request: Request) -> web.Response:
         """
         put log message from HTTP POST request.
         """
         _ecu_id = request.match_info["ecu_id"]
-        _message = await request.text()
+        try:
+            # NOTE: compressed body is decoded by aiohttp, the decoded body size
+            #       is limited by the client_max_size of the application.
+            _message = await request.text()
+        except RequestPayloadError as e:
+            logger.debug(f"failed to read request body from {_ecu_id}: {e!r}")
+            return web.Response(status=HTTPStatus.BAD_REQUEST)
 
         _code = self._put_log(ecu_id=_ecu_id, message=_message)
 
@@ -117,10 +308,110 @@ class OTAClientIoTLoggingServerServicer:
             _status = HTTPStatus.BAD_REQUEST
         elif _code == ErrorCode.SERVER_QUEUE_FULL:
             _status = HTTPStatus.SERVICE_UNAVAILABLE
+        elif _code == ErrorCode.ECU_RATE_LIMITED:
+            _status = HTTPStatus.TOO_MANY_REQUESTS
+        else:
+            _status = HTTPStatus.OK
+
+        return web.Response(
+            status=_status,
+            headers=self._backpressure_headers(_code == ErrorCode.SERVER_QUEUE_FULL),
+        )
+
+    async def http_put_logs_bulk(self, request: Request) -> web.Response:
+        """
+        put log messages from HTTP POST request with NDJSON body.
+
+        Each line of the body is a JSON record with <message>, and optional
+            <log_type>, <timestamp> and <level> fields, i.e.:
+            {"message": "some log", "log_type": "LOG", "level": "INFO", "timestamp": 1707000000000}
+        The body is parsed incrementally and the records are put into queue
+            in batches. Malformed records are dropped.
+        Compressed body(gzip, deflate, and zstd if supported) is decoded as
+            a stream, the decoded body size is limited by <bulk_max_body_size>.
+        """
+        _ecu_id = request.match_info["ecu_id"]
+        if self._allowed_ecus and _ecu_id not in self._allowed_ecus:
+            return web.Response(status=HTTPStatus.BAD_REQUEST)
+
+        _accepted, _dropped = 0, 0
+        _queue_full, _too_large, _bad_payload = False, False, False
+        _rate_limited = False
+        _body_size = 0
+
+        _batch: list[PutLogRequest] = []
+
+        def _flush_batch() -> None:
+            nonlocal _accepted, _dropped, _queue_full, _rate_limited
+            _codes = self._put_logs(_batch)
+            _batch.clear()
+
+            _batch_accepted = _codes.count(ErrorCode.NO_FAILURE)
+            _accepted += _batch_accepted
+            _dropped += len(_codes) - _batch_accepted
+            _queue_full = _queue_full or ErrorCode.SERVER_QUEUE_FULL in _codes
+            _rate_limited = _rate_limited or ErrorCode.ECU_RATE_LIMITED in _codes
+
+        _content = request.content
+        while True:
+            try:
+                _line = await _content.readline()
+            except LineTooLong as e:
+                logger.debug(f"abort bulk request from {_ecu_id}: {e!r}")
+                _too_large = True
+                break
+            except RequestPayloadError as e:
+                logger.debug(f"abort bulk request from {_ecu_id}: {e!r}")
+                _bad_payload = True
+                break
+            if not _line:  # EOF
+                break
+
+            _body_size += len(_line)
+            if _body_size > self._bulk_max_body_size:
+                logger.debug(f"abort bulk request from {_ecu_id}: body too large")
+                _too_large = True
+                break
+            if not (_line := _line.strip()):
+                continue
+
+            try:
+                _record = json.loads(_line)
+                _batch.append(
+                    PutLogRequest(
+                        ecu_id=_ecu_id,
+                        **{
+                            k: _record[k] for k in _NDJSON_RECORD_FIELDS if k in _record
+                        },
+                    )
+                )
+            except Exception:
+                _dropped += 1
+                continue
+
+            if len(_batch) >= HTTP_BULK_BATCH_SIZE:
+                _flush_batch()
+        if _batch:
+            _flush_batch()
+
+        if _too_large:
+            _status = HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        elif _bad_payload:
+            _status = HTTPStatus.BAD_REQUEST
+        elif _queue_full:
+            _status = HTTPStatus.SERVICE_UNAVAILABLE
+        elif _rate_limited:
+            _status = HTTPStatus.TOO_MANY_REQUESTS
+        elif not _accepted:
+            _status = HTTPStatus.BAD_REQUEST
         else:
             _status = HTTPStatus.OK
 
-        return web.Response(status=_status)
+        return web.json_response(
+            {"accepted": _accepted, "dropped": _dropped},
+            status=_status,
+            headers=self._backpressure_headers(_queue_full),
+        )
 
     def grpc_check(self, service: str) -> HealthCheckResponse:
         """
@@ -146,4 +437,108 @@ class OTAClientIoTLoggingServerServicer:
             level=_level,
             message=_message,
         )
-        return PutLogResponse(code=_code)
+        _retry_after_ms, _fill_ratio = self.get_backpressure(
+            _code == ErrorCode.SERVER_QUEUE_FULL
+        )
+        return PutLogResponse(
+            code=_code,
+            retry_after_ms=_retry_after_ms,
+            backlog_fill_ratio=_fill_ratio,
+        )
+
+    def grpc_put_log_code(self, request: PutLogRequest) -> ErrorCode:
+        """
+        put log message from gRPC request, only return the error code
+
+        NOTE: <request> can be either the wrapped PutLogRequest or the raw
+              protobuf PutLogRequest message, fields are read directly from it.
+        """
+        return self._put_log(
+            ecu_id=request.ecu_id,
+            log_type=request.log_type,
+            timestamp=request.timestamp,
+            level=request.level,
+            message=request.message,
+        )
+
+    def grpc_put_logs(self, request: PutLogsRequest) -> PutLogsResponse:
+        """
+        put a batch of log messages from gRPC request
+        """
+        _codes = self._put_logs(request.logs)
+        _accepted = _codes.count(ErrorCode.NO_FAILURE)
+
+        if not _codes:
+            _code = ErrorCode.NO_MESSAGE
+        elif _accepted == len(_codes):
+            _code = ErrorCode.NO_FAILURE
+        else:
+            # report the first failure as the aggregated error code
+            _code = next(_c for _c in _codes if _c != ErrorCode.NO_FAILURE)
+
+        _retry_after_ms, _fill_ratio = self.get_backpressure(
+            ErrorCode.SERVER_QUEUE_FULL in _codes
+        )
+        return PutLogsResponse(
+            code=_code,
+            accepted=_accepted,
+            codes=[int(_c) for _c in _codes],
+            retry_after_ms=_retry_after_ms,
+            backlog_fill_ratio=_fill_ratio,
+        )
+
+    async def grpc_stream_logs(
+        self, request_iterator: AsyncIterable[PutLogRequest]
+    ) -> AsyncGenerator[StreamLogsResponse, None]:
+        """
+        put log messages from gRPC request stream, ack periodically
+
+        NOTE: entries are read directly from the protobuf messages in the
+              stream, no per-message wrapper conversion is performed.
+        """
+        _accepted, _dropped = 0, 0
+        _last_failure = ErrorCode.UNSPECIFIC
+
+        # whether any entry is rejected by queue full since last ack
+        _queue_full = False
+        _unacked = 0
+        _last_ack = time.monotonic()
+        async for _entry in request_iterator:
+            _code = self._put_log(
+                ecu_id=_entry.ecu_id,
+                log_type=_entry.log_type,
+                timestamp=_entry.timestamp,
+                level=_entry.level,
+                message=_entry.message,
+            )
+            if _code == ErrorCode.NO_FAILURE:
+                _accepted += 1
+            else:
+                _dropped += 1
+                _last_failure = _code
+                _queue_full = _queue_full or _code == ErrorCode.SERVER_QUEUE_FULL
+
+            _unacked += 1
+            if (
+                _unacked >= self._stream_ack_logs_num
+                or time.monotonic() - _last_ack >= self._stream_ack_interval
+            ):
+                _retry_after_ms, _fill_ratio = self.get_backpressure(_queue_full)
+                yield StreamLogsResponse(
+                    accepted=_accepted,
+                    dropped=_dropped,
+                    code=_last_failure,
+                    retry_after_ms=_retry_after_ms,
+                    backlog_fill_ratio=_fill_ratio,
+                )
+                _queue_full, _unacked, _last_ack = False, 0, time.monotonic()
+
+        # final ack on the producer closing the stream
+        _retry_after_ms, _fill_ratio = self.get_backpressure(_queue_full)
+        yield StreamLogsResponse(
+            accepted=_accepted,
+            dropped=_dropped,
+            code=_last_failure,
+            retry_after_ms=_retry_after_ms,
+            backlog_fill_ratio=_fill_ratio,
+        )
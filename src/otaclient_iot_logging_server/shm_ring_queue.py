@@ -0,0 +1,168 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Logs queue backed by a shared memory ring buffer.
+
+Log entries are serialized into length-prefixed records in a preallocated
+anonymous shared mmap, which is inherited by the forked processes. So that
+the queue can be used between threads, and between the forked ingestion
+workers and the uploader in the main process without pickling and pipes.
+
+Layout of the mmap:
+    state: head(u64), tail(u64), count(u64)
+    data: ring buffer of <capacity> bytes
+
+Layout of a record(might wrap around the end of the ring buffer):
+    size(u32), log group type(u8), timestamp(u64), ecu_id size(u16),
+    ecu_id(utf-8), message(utf-8)
+
+NOTE: the queue can only be shared with processes started by fork.
+"""
+
+from __future__ import annotations
+
+import mmap
+import multiprocessing as mp
+import struct
+from queue import Empty, Full
+from typing import Sequence
+
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+
+_STATE = struct.Struct("<QQQ")
+_RECORD_HEADER = struct.Struct("<IBQH")
+_RECORD_SIZE = struct.Struct("<I")
+
+_LOG_GROUP_TYPES = tuple(LogGroupType)
+_LOG_GROUP_TYPE_IDX = {_type: _idx for _idx, _type in enumerate(_LOG_GROUP_TYPES)}
+
+_mp_ctx = mp.get_context("fork")
+
+
+def _encode_record(item: tuple[LogGroupType, str, LogRecord]) -> bytes:
+    _log_group_type, _ecu_id, _log_msg = item
+    _ecu_id_bytes = _ecu_id.encode()
+    _message_bytes = _log_msg.message.encode()
+    return (
+        _RECORD_HEADER.pack(
+            _RECORD_HEADER.size + len(_ecu_id_bytes) + len(_message_bytes),
+            _LOG_GROUP_TYPE_IDX[_log_group_type],
+            _log_msg.timestamp,
+            len(_ecu_id_bytes),
+        )
+        + _ecu_id_bytes
+        + _message_bytes
+    )
+
+
+class ShmRingQueue:
+    """Logs queue backed by a shared memory ring buffer.
+
+    The queue is bounded by <capacity> bytes of the serialized records, and
+        the entries count if <maxsize> > 0.
+    Only the non-blocking put and get APIs are provided.
+    """
+
+    def __init__(self, capacity: int, *, maxsize: int = 0) -> None:
+        self.capacity = capacity
+        self.maxsize = maxsize
+        # NOTE: anonymous mmap is mapped with MAP_SHARED, so it is shared
+        #       with the forked child processes.
+        self._buf = mmap.mmap(-1, _STATE.size + capacity)
+        self._data = memoryview(self._buf)[_STATE.size :]
+        self._lock = _mp_ctx.Lock()
+
+    def _write(self, pos: int, record: bytes) -> None:
+        _first = min(len(record), self.capacity - pos)
+        self._data[pos : pos + _first] = record[:_first]
+        if _first < len(record):
+            self._data[: len(record) - _first] = record[_first:]
+
+    def _read(self, pos: int, size: int) -> bytes:
+        _first = min(size, self.capacity - pos)
+        if _first == size:
+            return self._data[pos : pos + size].tobytes()
+        return (
+            self._data[pos : pos + _first].tobytes()
+            + self._data[: size - _first].tobytes()
+        )
+
+    def put_nowait(self, item: tuple[LogGroupType, str, LogRecord]) -> None:
+        _record = _encode_record(item)
+        _size = len(_record)
+        with self._lock:
+            _head, _tail, _count = _STATE.unpack_from(self._buf)
+            if _size > self.capacity - (_tail - _head) or (0 < self.maxsize <= _count):
+                raise Full
+            self._write(_tail % self.capacity, _record)
+            _STATE.pack_into(self._buf, 0, _head, _tail + _size, _count + 1)
+
+    def put_many(self, items: Sequence[tuple[LogGroupType, str, LogRecord]]) -> int:
+        """Put <items> into the queue within one lock acquisition.
+
+        Entries are put in order until the queue is full.
+
+        Returns:
+            The number of the accepted entries, i.e., the first <n> of <items>.
+        """
+        _records = [_encode_record(_item) for _item in items]
+        with self._lock:
+            _head, _tail, _count = _STATE.unpack_from(self._buf)
+            _accepted = 0
+            for _record in _records:
+                if len(_record) > self.capacity - (_tail - _head) or (
+                    0 < self.maxsize <= _count
+                ):
+                    break
+                self._write(_tail % self.capacity, _record)
+                _tail += len(_record)
+                _count += 1
+                _accepted += 1
+            if _accepted:
+                _STATE.pack_into(self._buf, 0, _head, _tail, _count)
+        return _accepted
+
+    def get_nowait(self) -> tuple[LogGroupType, str, LogRecord]:
+        with self._lock:
+            _head, _tail, _count = _STATE.unpack_from(self._buf)
+            if not _count:
+                raise Empty
+            _pos = _head % self.capacity
+            (_size,) = _RECORD_SIZE.unpack(self._read(_pos, _RECORD_SIZE.size))
+            _record = self._read(_pos, _size)
+            _STATE.pack_into(self._buf, 0, _head + _size, _tail, _count - 1)
+
+        _, _log_group_type_idx, _timestamp, _ecu_id_size = _RECORD_HEADER.unpack_from(
+            _record
+        )
+        _ecu_id_end = _RECORD_HEADER.size + _ecu_id_size
+        return (
+            _LOG_GROUP_TYPES[_log_group_type_idx],
+            _record[_RECORD_HEADER.size : _ecu_id_end].decode(),
+            LogRecord(timestamp=_timestamp, message=_record[_ecu_id_end:].decode()),
+        )
+
+    def qsize(self) -> int:
+        with self._lock:
+            return _STATE.unpack_from(self._buf)[2]
+
+    def empty(self) -> bool:
+        return not self.qsize()
+
+    def fill_ratio(self) -> float:
+        with self._lock:
+            _head, _tail, _count = _STATE.unpack_from(self._buf)
+        _ratio = (_tail - _head) / self.capacity
+        if self.maxsize > 0:
+            _ratio = max(_ratio, _count / self.maxsize)
+        return min(_ratio, 1)
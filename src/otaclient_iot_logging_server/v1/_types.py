@@ -15,10 +15,14 @@
 
 from __future__ import annotations
 
+from typing import Iterable as _Iterable
+
 from otaclient_iot_logging_server.v1 import otaclient_iot_logging_server_v1_pb2 as pb2
 from proto_wrapper.proto_wrapper import (
     EnumWrapper,
     MessageWrapper,
+    RepeatedCompositeContainer,
+    RepeatedScalarContainer,
     calculate_slots,
 )
 
@@ -32,6 +36,7 @@ class LogType(EnumWrapper):
 
 class LogLevel(EnumWrapper):
     UNSPECIFIC = pb2.UNSPECIFIC_LOG_LEVEL
+    TRACE = pb2.TRACE
     DEBUG = pb2.DEBUG
     INFO = pb2.INFO
     WARN = pb2.WARN
@@ -45,6 +50,7 @@ class ErrorCode(EnumWrapper):
     SERVER_QUEUE_FULL = pb2.SERVER_QUEUE_FULL
     NOT_ALLOWED_ECU_ID = pb2.NOT_ALLOWED_ECU_ID
     NO_MESSAGE = pb2.NO_MESSAGE
+    ECU_RATE_LIMITED = pb2.ECU_RATE_LIMITED
 
 
 class ServiceStatus(EnumWrapper):
@@ -83,12 +89,73 @@ class PutLogResponse(MessageWrapper[pb2.PutLogResponse]):
     __slots__ = calculate_slots(pb2.PutLogResponse)
     code: ErrorCode
     message: str
+    retry_after_ms: int
+    backlog_fill_ratio: float
+
+    def __init__(
+        self,
+        *,
+        code: ErrorCode | None = ...,
+        message: str | None = ...,
+        retry_after_ms: int | None = ...,
+        backlog_fill_ratio: float | None = ...,
+    ) -> None: ...
+
+
+# PutLogs API v1
+
+
+class PutLogsRequest(MessageWrapper[pb2.PutLogsRequest]):
+    __slots__ = calculate_slots(pb2.PutLogsRequest)
+    logs: RepeatedCompositeContainer[PutLogRequest]
+
+    def __init__(
+        self,
+        *,
+        logs: _Iterable[PutLogRequest] | None = ...,
+    ) -> None: ...
+
+
+class PutLogsResponse(MessageWrapper[pb2.PutLogsResponse]):
+    __slots__ = calculate_slots(pb2.PutLogsResponse)
+    code: ErrorCode
+    message: str
+    accepted: int
+    codes: RepeatedScalarContainer[int]
+    retry_after_ms: int
+    backlog_fill_ratio: float
 
     def __init__(
         self,
         *,
         code: ErrorCode | None = ...,
         message: str | None = ...,
+        accepted: int | None = ...,
+        codes: _Iterable[int] | None = ...,
+        retry_after_ms: int | None = ...,
+        backlog_fill_ratio: float | None = ...,
+    ) -> None: ...
+
+
+# StreamLogs API v1
+
+
+class StreamLogsResponse(MessageWrapper[pb2.StreamLogsResponse]):
+    __slots__ = calculate_slots(pb2.StreamLogsResponse)
+    accepted: int
+    dropped: int
+    code: ErrorCode
+    retry_after_ms: int
+    backlog_fill_ratio: float
+
+    def __init__(
+        self,
+        *,
+        accepted: int | None = ...,
+        dropped: int | None = ...,
+        code: ErrorCode | None = ...,
+        retry_after_ms: int | None = ...,
+        backlog_fill_ratio: float | None = ...,
     ) -> None: ...
 
 
@@ -15,7 +15,7 @@
 
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, AsyncIterator
 
 from otaclient_iot_logging_server.v1 import _types
 from otaclient_iot_logging_server.v1 import otaclient_iot_logging_server_v1_pb2 as pb2
@@ -37,3 +37,52 @@ class OTAClientIoTLoggingServiceV1(pb2_grpc.OTAClientIoTLoggingServiceServicer):
     async def PutLog(self, request: pb2.PutLogRequest, context) -> pb2.PutLogResponse:
         response = self._stub.grpc_put_log(_types.PutLogRequest.convert(request))
         return response.export_pb()
+
+    async def PutLogs(
+        self, request: pb2.PutLogsRequest, context
+    ) -> pb2.PutLogsResponse:
+        # NOTE: entries are read directly from the protobuf message by the stub,
+        #       skip the wrapper conversion to avoid per-entry overhead.
+        response = self._stub.grpc_put_logs(request)
+        return response.export_pb()
+
+    async def StreamLogs(
+        self, request_iterator: AsyncIterator[pb2.PutLogRequest], context
+    ) -> AsyncIterator[pb2.StreamLogsResponse]:
+        async for response in self._stub.grpc_stream_logs(request_iterator):
+            yield response.export_pb()
+
+
+class OTAClientIoTLoggingServiceV1FastPath(OTAClientIoTLoggingServiceV1):
+    """Optimized OTAClientIoTLoggingServiceV1 for the hot PutLog API.
+
+    PutLog request fields are read directly from the protobuf message without
+        wrapper conversion, and the cached response messages are returned.
+    """
+
+    def __init__(self, otaclient_iot_logging_server_stub: Any):
+        super().__init__(otaclient_iot_logging_server_stub)
+        # NOTE: the cached response messages MUST NOT be modified.
+        #       responses are cached by (code, backlog_fill_ratio), as the fill
+        #       ratio is rounded to 2 decimal places, the cache size is bounded.
+        self._put_log_responses: dict[tuple[int, float], pb2.PutLogResponse] = {}
+
+    async def PutLog(self, request: pb2.PutLogRequest, context) -> pb2.PutLogResponse:
+        _code = self._stub.grpc_put_log_code(request)
+        _retry_after_ms, _fill_ratio = self._stub.get_backpressure(
+            _code == _types.ErrorCode.SERVER_QUEUE_FULL
+        )
+        if _retry_after_ms:
+            return pb2.PutLogResponse(
+                code=_code,
+                retry_after_ms=_retry_after_ms,
+                backlog_fill_ratio=_fill_ratio,
+            )
+
+        try:
+            return self._put_log_responses[(_code, _fill_ratio)]
+        except KeyError:
+            _response = self._put_log_responses[(_code, _fill_ratio)] = (
+                pb2.PutLogResponse(code=_code, backlog_fill_ratio=_fill_ratio)
+            )
+            return _response
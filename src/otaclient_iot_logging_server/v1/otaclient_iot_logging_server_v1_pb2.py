@@ -13,7 +13,7 @@ _sym_db = _symbol_database.Default()
 
 
 DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(
-    b'\nIotaclient_iot_logging_server_pb2/v1/otaclient_iot_logging_server_v1.proto"y\n\rPutLogRequest\x12\x0e\n\x06\x65\x63u_id\x18\x01 \x01(\t\x12\x1a\n\x08log_type\x18\x02 \x01(\x0e\x32\x08.LogType\x12\x11\n\ttimestamp\x18\x03 \x01(\x04\x12\x18\n\x05level\x18\x04 \x01(\x0e\x32\t.LogLevel\x12\x0f\n\x07message\x18\x05 \x01(\t";\n\x0ePutLogResponse\x12\x18\n\x04\x63ode\x18\x01 \x01(\x0e\x32\n.ErrorCode\x12\x0f\n\x07message\x18\x02 \x01(\t"%\n\x12HealthCheckRequest\x12\x0f\n\x07service\x18\x01 \x01(\t"\x9a\x01\n\x13HealthCheckResponse\x12\x32\n\x06status\x18\x01 \x01(\x0e\x32".HealthCheckResponse.ServingStatus"O\n\rServingStatus\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x0b\n\x07SERVING\x10\x01\x12\x0f\n\x0bNOT_SERVING\x10\x02\x12\x13\n\x0fSERVICE_UNKNOWN\x10\x03*\x1f\n\x07LogType\x12\x07\n\x03LOG\x10\x00\x12\x0b\n\x07METRICS\x10\x01*d\n\x08LogLevel\x12\x18\n\x14UNSPECIFIC_LOG_LEVEL\x10\x00\x12\t\n\x05TRACE\x10\x01\x12\t\n\x05\x44\x45\x42UG\x10\x02\x12\x08\n\x04INFO\x10\x03\x12\x08\n\x04WARN\x10\x04\x12\t\n\x05\x45RROR\x10\x05\x12\t\n\x05\x46\x41TAL\x10\x06*u\n\tErrorCode\x12\x19\n\x15UNSPECIFIC_ERROR_CODE\x10\x00\x12\x0e\n\nNO_FAILURE\x10\x01\x12\x15\n\x11SERVER_QUEUE_FULL\x10\x02\x12\x16\n\x12NOT_ALLOWED_ECU_ID\x10\x03\x12\x0e\n\nNO_MESSAGE\x10\x04\x32}\n\x1aOTAClientIoTLoggingService\x12+\n\x06PutLog\x12\x0e.PutLogRequest\x1a\x0f.PutLogResponse"\x00\x12\x32\n\x05\x43heck\x12\x13.HealthCheckRequest\x1a\x14.HealthCheckResponseb\x06proto3'
+    b'\nIotaclient_iot_logging_server_pb2/v1/otaclient_iot_logging_server_v1.proto"y\n\rPutLogRequest\x12\x0e\n\x06\x65\x63u_id\x18\x01 \x01(\t\x12\x1a\n\x08log_type\x18\x02 \x01(\x0e\x32\x08.LogType\x12\x11\n\ttimestamp\x18\x03 \x01(\x04\x12\x18\n\x05level\x18\x04 \x01(\x0e\x32\t.LogLevel\x12\x0f\n\x07message\x18\x05 \x01(\t"o\n\x0ePutLogResponse\x12\x18\n\x04\x63ode\x18\x01 \x01(\x0e\x32\n.ErrorCode\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x16\n\x0eretry_after_ms\x18\x03 \x01(\r\x12\x1a\n\x12\x62\x61\x63klog_fill_ratio\x18\x04 \x01(\x02".\n\x0ePutLogsRequest\x12\x1c\n\x04logs\x18\x01 \x03(\x0b\x32\x0e.PutLogRequest"\x9d\x01\n\x0fPutLogsResponse\x12\x18\n\x04\x63ode\x18\x01 \x01(\x0e\x32\n.ErrorCode\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x03 \x01(\r\x12\x19\n\x05\x63odes\x18\x04 \x03(\x0e\x32\n.ErrorCode\x12\x16\n\x0eretry_after_ms\x18\x05 \x01(\r\x12\x1a\n\x12\x62\x61\x63klog_fill_ratio\x18\x06 \x01(\x02"\x85\x01\n\x12StreamLogsResponse\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x01 \x01(\x04\x12\x0f\n\x07\x64ropped\x18\x02 \x01(\x04\x12\x18\n\x04\x63ode\x18\x03 \x01(\x0e\x32\n.ErrorCode\x12\x16\n\x0eretry_after_ms\x18\x04 \x01(\r\x12\x1a\n\x12\x62\x61\x63klog_fill_ratio\x18\x05 \x01(\x02"%\n\x12HealthCheckRequest\x12\x0f\n\x07service\x18\x01 \x01(\t"\x9a\x01\n\x13HealthCheckResponse\x12\x32\n\x06status\x18\x01 \x01(\x0e\x32".HealthCheckResponse.ServingStatus"O\n\rServingStatus\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x0b\n\x07SERVING\x10\x01\x12\x0f\n\x0bNOT_SERVING\x10\x02\x12\x13\n\x0fSERVICE_UNKNOWN\x10\x03*\x1f\n\x07LogType\x12\x07\n\x03LOG\x10\x00\x12\x0b\n\x07METRICS\x10\x01*d\n\x08LogLevel\x12\x18\n\x14UNSPECIFIC_LOG_LEVEL\x10\x00\x12\t\n\x05TRACE\x10\x01\x12\t\n\x05\x44\x45\x42UG\x10\x02\x12\x08\n\x04INFO\x10\x03\x12\x08\n\x04WARN\x10\x04\x12\t\n\x05\x45RROR\x10\x05\x12\t\n\x05\x46\x41TAL\x10\x06*\x8b\x01\n\tErrorCode\x12\x19\n\x15UNSPECIFIC_ERROR_CODE\x10\x00\x12\x0e\n\nNO_FAILURE\x10\x01\x12\x15\n\x11SERVER_QUEUE_FULL\x10\x02\x12\x16\n\x12NOT_ALLOWED_ECU_ID\x10\x03\x12\x0e\n\nNO_MESSAGE\x10\x04\x12\x14\n\x10\x45\x43U_RATE_LIMITED\x10\x05\x32\xe6\x01\n\x1aOTAClientIoTLoggingService\x12+\n\x06PutLog\x12\x0e.PutLogRequest\x1a\x0f.PutLogResponse"\x00\x12.\n\x07PutLogs\x12\x0f.PutLogsRequest\x1a\x10.PutLogsResponse"\x00\x12\x37\n\nStreamLogs\x12\x0e.PutLogRequest\x1a\x13.StreamLogsResponse"\x00(\x01\x30\x01\x12\x32\n\x05\x43heck\x12\x13.HealthCheckRequest\x1a\x14.HealthCheckResponseb\x06proto3'
 )
 
 _globals = globals()
@@ -26,22 +26,28 @@ _builder.BuildTopDescriptorsAndMessages(
 if _descriptor._USE_C_DESCRIPTORS == False:
 
     DESCRIPTOR._options = None
-    _globals["_LOGTYPE"]._serialized_start = 457
-    _globals["_LOGTYPE"]._serialized_end = 488
-    _globals["_LOGLEVEL"]._serialized_start = 490
-    _globals["_LOGLEVEL"]._serialized_end = 590
-    _globals["_ERRORCODE"]._serialized_start = 592
-    _globals["_ERRORCODE"]._serialized_end = 709
+    _globals["_LOGTYPE"]._serialized_start = 853
+    _globals["_LOGTYPE"]._serialized_end = 884
+    _globals["_LOGLEVEL"]._serialized_start = 886
+    _globals["_LOGLEVEL"]._serialized_end = 986
+    _globals["_ERRORCODE"]._serialized_start = 989
+    _globals["_ERRORCODE"]._serialized_end = 1128
     _globals["_PUTLOGREQUEST"]._serialized_start = 77
     _globals["_PUTLOGREQUEST"]._serialized_end = 198
     _globals["_PUTLOGRESPONSE"]._serialized_start = 200
-    _globals["_PUTLOGRESPONSE"]._serialized_end = 259
-    _globals["_HEALTHCHECKREQUEST"]._serialized_start = 261
-    _globals["_HEALTHCHECKREQUEST"]._serialized_end = 298
-    _globals["_HEALTHCHECKRESPONSE"]._serialized_start = 301
-    _globals["_HEALTHCHECKRESPONSE"]._serialized_end = 455
-    _globals["_HEALTHCHECKRESPONSE_SERVINGSTATUS"]._serialized_start = 376
-    _globals["_HEALTHCHECKRESPONSE_SERVINGSTATUS"]._serialized_end = 455
-    _globals["_OTACLIENTIOTLOGGINGSERVICE"]._serialized_start = 711
-    _globals["_OTACLIENTIOTLOGGINGSERVICE"]._serialized_end = 836
+    _globals["_PUTLOGRESPONSE"]._serialized_end = 311
+    _globals["_PUTLOGSREQUEST"]._serialized_start = 313
+    _globals["_PUTLOGSREQUEST"]._serialized_end = 359
+    _globals["_PUTLOGSRESPONSE"]._serialized_start = 362
+    _globals["_PUTLOGSRESPONSE"]._serialized_end = 519
+    _globals["_STREAMLOGSRESPONSE"]._serialized_start = 522
+    _globals["_STREAMLOGSRESPONSE"]._serialized_end = 655
+    _globals["_HEALTHCHECKREQUEST"]._serialized_start = 657
+    _globals["_HEALTHCHECKREQUEST"]._serialized_end = 694
+    _globals["_HEALTHCHECKRESPONSE"]._serialized_start = 697
+    _globals["_HEALTHCHECKRESPONSE"]._serialized_end = 851
+    _globals["_HEALTHCHECKRESPONSE_SERVINGSTATUS"]._serialized_start = 772
+    _globals["_HEALTHCHECKRESPONSE_SERVINGSTATUS"]._serialized_end = 851
+    _globals["_OTACLIENTIOTLOGGINGSERVICE"]._serialized_start = 1131
+    _globals["_OTACLIENTIOTLOGGINGSERVICE"]._serialized_end = 1361
 # @@protoc_insertion_point(module_scope)
@@ -1,7 +1,14 @@
+from google.protobuf.internal import containers as _containers
 from google.protobuf.internal import enum_type_wrapper as _enum_type_wrapper
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import message as _message
-from typing import ClassVar as _ClassVar, Optional as _Optional, Union as _Union
+from typing import (
+    ClassVar as _ClassVar,
+    Iterable as _Iterable,
+    Mapping as _Mapping,
+    Optional as _Optional,
+    Union as _Union,
+)
 
 DESCRIPTOR: _descriptor.FileDescriptor
 
@@ -27,6 +34,7 @@ class ErrorCode(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
     SERVER_QUEUE_FULL: _ClassVar[ErrorCode]
     NOT_ALLOWED_ECU_ID: _ClassVar[ErrorCode]
     NO_MESSAGE: _ClassVar[ErrorCode]
+    ECU_RATE_LIMITED: _ClassVar[ErrorCode]
 
 LOG: LogType
 METRICS: LogType
@@ -42,6 +50,7 @@ NO_FAILURE: ErrorCode
 SERVER_QUEUE_FULL: ErrorCode
 NOT_ALLOWED_ECU_ID: ErrorCode
 NO_MESSAGE: ErrorCode
+ECU_RATE_LIMITED: ErrorCode
 
 class PutLogRequest(_message.Message):
     __slots__ = ["ecu_id", "log_type", "timestamp", "level", "message"]
@@ -65,15 +74,81 @@ class PutLogRequest(_message.Message):
     ) -> None: ...
 
 class PutLogResponse(_message.Message):
-    __slots__ = ["code", "message"]
+    __slots__ = ["code", "message", "retry_after_ms", "backlog_fill_ratio"]
     CODE_FIELD_NUMBER: _ClassVar[int]
     MESSAGE_FIELD_NUMBER: _ClassVar[int]
+    RETRY_AFTER_MS_FIELD_NUMBER: _ClassVar[int]
+    BACKLOG_FILL_RATIO_FIELD_NUMBER: _ClassVar[int]
     code: ErrorCode
     message: str
+    retry_after_ms: int
+    backlog_fill_ratio: float
     def __init__(
         self,
         code: _Optional[_Union[ErrorCode, str]] = ...,
         message: _Optional[str] = ...,
+        retry_after_ms: _Optional[int] = ...,
+        backlog_fill_ratio: _Optional[float] = ...,
+    ) -> None: ...
+
+class PutLogsRequest(_message.Message):
+    __slots__ = ["logs"]
+    LOGS_FIELD_NUMBER: _ClassVar[int]
+    logs: _containers.RepeatedCompositeFieldContainer[PutLogRequest]
+    def __init__(
+        self, logs: _Optional[_Iterable[_Union[PutLogRequest, _Mapping]]] = ...
+    ) -> None: ...
+
+class PutLogsResponse(_message.Message):
+    __slots__ = [
+        "code",
+        "message",
+        "accepted",
+        "codes",
+        "retry_after_ms",
+        "backlog_fill_ratio",
+    ]
+    CODE_FIELD_NUMBER: _ClassVar[int]
+    MESSAGE_FIELD_NUMBER: _ClassVar[int]
+    ACCEPTED_FIELD_NUMBER: _ClassVar[int]
+    CODES_FIELD_NUMBER: _ClassVar[int]
+    RETRY_AFTER_MS_FIELD_NUMBER: _ClassVar[int]
+    BACKLOG_FILL_RATIO_FIELD_NUMBER: _ClassVar[int]
+    code: ErrorCode
+    message: str
+    accepted: int
+    codes: _containers.RepeatedScalarFieldContainer[ErrorCode]
+    retry_after_ms: int
+    backlog_fill_ratio: float
+    def __init__(
+        self,
+        code: _Optional[_Union[ErrorCode, str]] = ...,
+        message: _Optional[str] = ...,
+        accepted: _Optional[int] = ...,
+        codes: _Optional[_Iterable[_Union[ErrorCode, str]]] = ...,
+        retry_after_ms: _Optional[int] = ...,
+        backlog_fill_ratio: _Optional[float] = ...,
+    ) -> None: ...
+
+class StreamLogsResponse(_message.Message):
+    __slots__ = ["accepted", "dropped", "code", "retry_after_ms", "backlog_fill_ratio"]
+    ACCEPTED_FIELD_NUMBER: _ClassVar[int]
+    DROPPED_FIELD_NUMBER: _ClassVar[int]
+    CODE_FIELD_NUMBER: _ClassVar[int]
+    RETRY_AFTER_MS_FIELD_NUMBER: _ClassVar[int]
+    BACKLOG_FILL_RATIO_FIELD_NUMBER: _ClassVar[int]
+    accepted: int
+    dropped: int
+    code: ErrorCode
+    retry_after_ms: int
+    backlog_fill_ratio: float
+    def __init__(
+        self,
+        accepted: _Optional[int] = ...,
+        dropped: _Optional[int] = ...,
+        code: _Optional[_Union[ErrorCode, str]] = ...,
+        retry_after_ms: _Optional[int] = ...,
+        backlog_fill_ratio: _Optional[float] = ...,
     ) -> None: ...
 
 class HealthCheckRequest(_message.Message):
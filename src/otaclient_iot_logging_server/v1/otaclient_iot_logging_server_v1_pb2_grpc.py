@@ -21,6 +21,16 @@ class OTAClientIoTLoggingServiceStub(object):
             request_serializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogRequest.SerializeToString,
             response_deserializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogResponse.FromString,
         )
+        self.PutLogs = channel.unary_unary(
+            "/OTAClientIoTLoggingService/PutLogs",
+            request_serializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogsRequest.SerializeToString,
+            response_deserializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogsResponse.FromString,
+        )
+        self.StreamLogs = channel.stream_stream(
+            "/OTAClientIoTLoggingService/StreamLogs",
+            request_serializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogRequest.SerializeToString,
+            response_deserializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.StreamLogsResponse.FromString,
+        )
         self.Check = channel.unary_unary(
             "/OTAClientIoTLoggingService/Check",
             request_serializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.HealthCheckRequest.SerializeToString,
@@ -39,6 +49,25 @@ class OTAClientIoTLoggingServiceServicer(object):
         context.set_details("Method not implemented!")
         raise NotImplementedError("Method not implemented!")
 
+    def PutLogs(self, request, context):
+        """
+        `PutLogs` service requests OTA Client logging service to put a batch of
+        logs within one call.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def StreamLogs(self, request_iterator, context):
+        """
+        `StreamLogs` allows one long-lived producer to keep pushing logs to
+        OTA Client logging service within one stream. The service acks
+        periodically with the summary of accepted and dropped logs.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
     def Check(self, request, context):
         """
         `Check` requests OTA Client logging service to check the health of the
@@ -56,6 +85,16 @@ def add_OTAClientIoTLoggingServiceServicer_to_server(servicer, server):
             request_deserializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogRequest.FromString,
             response_serializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogResponse.SerializeToString,
         ),
+        "PutLogs": grpc.unary_unary_rpc_method_handler(
+            servicer.PutLogs,
+            request_deserializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogsRequest.FromString,
+            response_serializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogsResponse.SerializeToString,
+        ),
+        "StreamLogs": grpc.stream_stream_rpc_method_handler(
+            servicer.StreamLogs,
+            request_deserializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogRequest.FromString,
+            response_serializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.StreamLogsResponse.SerializeToString,
+        ),
         "Check": grpc.unary_unary_rpc_method_handler(
             servicer.Check,
             request_deserializer=otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.HealthCheckRequest.FromString,
@@ -101,6 +140,64 @@ class OTAClientIoTLoggingService(object):
             metadata,
         )
 
+    @staticmethod
+    def PutLogs(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/OTAClientIoTLoggingService/PutLogs",
+            otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogsRequest.SerializeToString,
+            otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def StreamLogs(
+        request_iterator,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            "/OTAClientIoTLoggingService/StreamLogs",
+            otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.PutLogRequest.SerializeToString,
+            otaclient__iot__logging__server__pb2_dot_v1_dot_otaclient__iot__logging__server__v1__pb2.StreamLogsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
     @staticmethod
     def Check(
         request,
@@ -16,11 +16,20 @@
 from __future__ import annotations
 
 import logging
+import threading
+import time
 from queue import Queue
 
+from pytest_mock import MockerFixture
+
 import otaclient_iot_logging_server._log_setting
+import otaclient_iot_logging_server.ingestion_workers as ingestion_workers_module
 from otaclient_iot_logging_server._common import LogGroupType, LogsQueue
 from otaclient_iot_logging_server._log_setting import _LogTeeHandler  # type: ignore
+from otaclient_iot_logging_server.ingestion_workers import (
+    create_ipc_queue,
+    launch_ingestion_workers,
+)
 
 MODULE = otaclient_iot_logging_server._log_setting.__name__
 
@@ -37,8 +46,70 @@ def test_server_logger():
     logger.info("emit one logging entry")
     # ------ clenaup ------ #
     logger.removeHandler(_handler)
+    # NOTE: the buffered records are flushed on close
+    _handler.close()
     # ------ check result ------ #
     _log = _queue.get_nowait()
     assert _log[0] == LogGroupType.LOG
     assert _log[1] == suffix
     assert _log[2]
+
+
+def test_server_logger_flush_in_bulk():
+    _queue: LogsQueue = Queue()
+    _handler = _LogTeeHandler(_queue, "test_suffix", flush_size=4, flush_interval=60)
+    logger.addHandler(_handler)
+    try:
+        for _idx in range(3):
+            logger.info(f"entry_{_idx}")
+        assert _queue.empty()
+
+        # records are put into queue at once when <flush_size> is reached
+        logger.info("entry_3")
+        assert _queue.qsize() == 4
+    finally:
+        logger.removeHandler(_handler)
+        _handler.close()
+
+
+def test_server_logger_flush_periodically():
+    _queue: LogsQueue = Queue()
+    _handler = _LogTeeHandler(_queue, "test_suffix", flush_interval=0.1)
+    logger.addHandler(_handler)
+    try:
+        logger.info("emit one logging entry")
+        assert _queue.get(timeout=3)[2]
+    finally:
+        logger.removeHandler(_handler)
+        _handler.close()
+
+
+def _logging_worker_main(_queue: LogsQueue, worker_idx: int) -> None:
+    logger.info(f"worker#{worker_idx} log")
+    time.sleep(30)
+
+
+def test_server_logger_in_ingestion_workers(mocker: MockerFixture):
+    mocker.patch(
+        f"{ingestion_workers_module.__name__}._worker_main", _logging_worker_main
+    )
+    _queue = create_ipc_queue(maxsize=1024)
+    _handler = _LogTeeHandler(_queue, "test_suffix", flush_interval=0.1)
+    logger.addHandler(_handler)
+    try:
+        # no threads started before the workers are forked
+        assert not any(
+            _thread.name == "log_tee_flush" for _thread in threading.enumerate()
+        )
+        _workers = launch_ingestion_workers(_queue, 2)
+        try:
+            # logs are flushed by the flush thread of each worker
+            _received = {_queue.get(timeout=3)[2].message for _ in range(2)}
+            assert _received == {"worker#0 log", "worker#1 log"}
+        finally:
+            for _worker in _workers:
+                _worker.kill()
+                _worker.join()
+    finally:
+        logger.removeHandler(_handler)
+        _handler.close()
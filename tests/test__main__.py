@@ -42,6 +42,13 @@ class _ServerCfg:
     LISTEN_PORT_GRPC: int = 4321
     MAX_LOGS_PER_MERGE: int = 123
     MAX_LOGS_BACKLOG: int = 1234
+    MAX_LOGS_BACKLOG_BYTES: int = 123456
+    SPOOL_DIR: str = ""
+    USE_SHM_RING_QUEUE: bool = False
+    LOGS_DROP_POLICY: str = "drop_newest"
+    LOGS_DROP_SAMPLING_RATE: int = 10
+    INGESTION_WORKERS: int = 1
+    ASYNC_PIPELINE: bool = False
     UPLOAD_INTERVAL: int = 12
     EXIT_ON_CONFIG_FILE_CHANGED: bool = False
 
@@ -93,3 +100,29 @@ def test_main(
         == f"launching gRPC iot_logging_server({_version}) at http://{_in_server_cfg.LISTEN_ADDRESS}:{_in_server_cfg.LISTEN_PORT_GRPC}"
     )
     assert (caplog.records[-1].msg) == f"iot_logging_server config: \n{_in_server_cfg}"
+
+
+def test_main_async_pipeline(mocker: MockerFixture):
+    mocker.patch(f"{MODULE}.config_logging", mocker.MagicMock(return_value=logger))
+    mocker.patch(
+        f"{MODULE}.start_aws_iot_logger_thread",
+        _aws_iot_logger_thread_mock := mocker.MagicMock(),
+    )
+    mocker.patch(
+        f"{MODULE}.create_aws_iot_logger",
+        _create_aws_iot_logger_mock := mocker.MagicMock(),
+    )
+    mocker.patch(
+        f"{MODULE}.launch_server",
+        _launch_server_mock := mocker.MagicMock(),
+    )
+    mocker.patch(f"{MODULE}.server_cfg", _ServerCfg(ASYNC_PIPELINE=True))
+
+    _main_module.main()
+
+    # the uploader runs in the server's event loop instead of a thread
+    _aws_iot_logger_thread_mock.assert_not_called()
+    _launch_server_mock.assert_called_once_with(
+        queue=mocker.ANY,
+        uploader=_create_aws_iot_logger_mock.return_value.async_main,
+    )
@@ -18,6 +18,7 @@ from __future__ import annotations
 import logging
 import random
 import time
+from queue import Full, Queue
 from typing import Any
 
 import pytest
@@ -26,6 +27,7 @@ from otaclient_iot_logging_server._utils import (
     NestedDict,
     chain_query,
     parse_pkcs11_uri,
+    put_many,
     retry,
 )
 
@@ -230,3 +232,23 @@ class TestRetry:
 )
 def test_parse_pkcs11_uri(_pkcs11_uri: str, _expected: dict[str, Any]):
     assert parse_pkcs11_uri(_pkcs11_uri) == _expected
+
+
+class _NoBulkQueue:
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.items: list[int] = []
+
+    def put_nowait(self, item: int) -> None:
+        if len(self.items) >= self.maxsize:
+            raise Full
+        self.items.append(item)
+
+
+@pytest.mark.parametrize("_queue", (Queue(maxsize=3), _NoBulkQueue(maxsize=3)))
+def test_put_many(_queue: Queue | _NoBulkQueue):
+    assert put_many(_queue, range(5)) == 3
+    if isinstance(_queue, Queue):
+        assert [_queue.get_nowait() for _ in range(3)] == [0, 1, 2]
+    else:
+        assert _queue.items == [0, 1, 2]
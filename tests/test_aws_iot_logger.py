@@ -18,22 +18,42 @@ from __future__ import annotations
 import logging
 import os
 import random
+import threading
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 from queue import Queue
 from uuid import uuid1
 
 import pytest
 from awscrt.exceptions import AwsCrtError
+from botocore.exceptions import ClientError, EndpointConnectionError
 from pytest_mock import MockerFixture
 
 import otaclient_iot_logging_server.aws_iot_logger
-from otaclient_iot_logging_server._common import LogGroupType, LogMessage, LogsQueue
+from otaclient_iot_logging_server._common import (
+    LogGroupType,
+    LogMessage,
+    LogRecord,
+    LogsQueue,
+)
 from otaclient_iot_logging_server.aws_iot_logger import (
+    EVENT_OVERHEAD,
+    MAX_BYTES_PER_PUT,
+    MAX_EVENT_SIZE,
+    MAX_LOGS_PER_PUT,
+    MAX_RETRY_BYTES,
+    MAX_SPAN_PER_PUT,
+    RETRY_BACKOFF_FACTOR,
+    RETRY_BACKOFF_MAX,
     AWSIoTLogger,
+    build_log_batches,
     get_log_stream_name,
 )
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
+from otaclient_iot_logging_server.log_spool import LogsSpool
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +87,50 @@ def test_get_log_stream_name(
     assert get_log_stream_name(_thing_name, _suffix) == _expected
 
 
+def _batches_summary(batches: list[list[LogMessage]]) -> list[int]:
+    return [len(_batch) for _batch in batches]
+
+
+def test_build_log_batches_sorted_and_split_by_count():
+    _logs = [
+        LogRecord(timestamp=_ts, message="msg")
+        for _ts in reversed(range(MAX_LOGS_PER_PUT + 1))
+    ]
+    _batches = build_log_batches(_logs)
+    assert _batches_summary(_batches) == [MAX_LOGS_PER_PUT, 1]
+    _timestamps = [_log["timestamp"] for _batch in _batches for _log in _batch]
+    assert _timestamps == sorted(_timestamps)
+
+
+def test_build_log_batches_split_by_bytes():
+    # NOTE: the size of a message is counted in utf-8 encoded bytes
+    _message = "あ" * ((64 * 1024 - EVENT_OVERHEAD) // 3)
+    _event_size = len(_message.encode()) + EVENT_OVERHEAD
+    _per_batch = MAX_BYTES_PER_PUT // _event_size
+    _batches = build_log_batches(
+        [LogRecord(timestamp=0, message=_message) for _ in range(_per_batch + 1)]
+    )
+    assert _batches_summary(_batches) == [_per_batch, 1]
+
+
+def test_build_log_batches_split_by_span():
+    _logs = [
+        LogRecord(timestamp=0, message="msg"),
+        LogRecord(timestamp=MAX_SPAN_PER_PUT - 1, message="msg"),
+        LogRecord(timestamp=MAX_SPAN_PER_PUT, message="msg"),
+    ]
+    assert _batches_summary(build_log_batches(_logs)) == [2, 1]
+
+
+def test_build_log_batches_truncate_oversized_message():
+    (_batch,) = build_log_batches(
+        [LogRecord(timestamp=0, message="あ" * MAX_EVENT_SIZE)]
+    )
+    _message = _batch[0]["message"]
+    assert len(_message.encode()) + EVENT_OVERHEAD <= MAX_EVENT_SIZE
+    assert _message == "あ" * len(_message)
+
+
 _mocked_ECUs_list = ("main_ecu", "sub_ecu0", "sub_ecu1", "sub_ecu2", "sub_ecu3")
 
 
@@ -74,19 +138,43 @@ def generate_random_msgs(
     msg_len: int,
     msg_num: int,
     ecus_list: tuple[str, ...] = _mocked_ECUs_list,
-) -> list[tuple[str, LogMessage]]:
-    _res: list[tuple[str, LogMessage]] = []
+) -> list[tuple[str, LogRecord]]:
+    _res: list[tuple[str, LogRecord]] = []
     for _ in range(msg_num):
         _ecu_id, *_ = random.sample(ecus_list, 1)
         _log_group_type = random.choice(list(LogGroupType))
         _msg = os.urandom(msg_len).hex()
         _timestamp = int(time.time()) * 1000  # milliseconds
         _res.append(
-            (_log_group_type, _ecu_id, LogMessage(timestamp=_timestamp, message=_msg))
+            (_log_group_type, _ecu_id, LogRecord(timestamp=_timestamp, message=_msg))
         )
     return _res
 
 
+class _FakeLogsEndpoint:
+    """Fake logs client, requests to <failing_stream> fail with connection error."""
+
+    class ResourceNotFoundException(Exception):
+        pass
+
+    class ResourceAlreadyExistsException(Exception):
+        pass
+
+    def __init__(self, failing_stream: str | None) -> None:
+        self.exceptions = self
+        self.failing_stream = failing_stream
+        self.failed_requests = 0
+        self.uploaded: defaultdict[tuple[str, str], list[LogMessage]] = defaultdict(
+            list
+        )
+
+    def put_log_events(self, *, logGroupName: str, logStreamName: str, logEvents):
+        if logStreamName == self.failing_stream:
+            self.failed_requests += 1
+            raise EndpointConnectionError(endpoint_url="https://logs.fake")
+        self.uploaded[(logGroupName, logStreamName)].extend(logEvents)
+
+
 class TestAWSIoTLogger:
     MSG_LEN = 16
     MSG_NUM = 4096
@@ -114,27 +202,40 @@ class TestAWSIoTLogger:
                 if _log_group_type == LogGroupType.METRICS
                 else self._otaclient_logs_log_group
             )
-            _merged_msgs[(_log_group_name, _ecu_id)].append(_log_msg)
+            _merged_msgs[(_log_group_name, _ecu_id)].append(_log_msg.to_log_message())
         self._merged_msgs = _merged_msgs
         # prepare the queue for test
         _queue: LogsQueue = Queue()
         for _item in _msgs:
             _queue.put_nowait(_item)
         self._queue = _queue
+        self._msgs = _msgs
 
     @pytest.fixture(autouse=True)
     def setup_test(self, prepare_test_data, mocker: MockerFixture):
         _time_mocker = mocker.MagicMock(spec=time)
         # NOTE: a hack here to interrupt the while loop
         _time_mocker.sleep.side_effect = self._TestFinished
+        _time_mocker.monotonic.return_value = 0
         mocker.patch(f"{MODULE}.time", _time_mocker)
+        self._time_mocker = _time_mocker
         # ------ prepare test self ------ #
         # The following bound variables will be used in thread_main method.
         # NOTE: another hack to let all entries being merged within one
         #       loop iteration.
         self._max_logs_per_merge = float("inf")
         self.put_log_events = self._mocked_put_log_events
+        self._merge_logs = AWSIoTLogger._merge_logs.__get__(self)
+        self._upload = AWSIoTLogger._upload.__get__(self)
+        self._upload_stream = AWSIoTLogger._upload_stream.__get__(self)
+        self._trim_retry_queue = AWSIoTLogger._trim_retry_queue.__get__(self)
+        self._upload_executor = None
         self._interval = 6  # place holder
+        self._drain_rate_meter = None
+        self._spool = None
+        self._spool_read = self._spool_committed = 0
+        self._retry_queues = {}
+        self._adaptive_flush, self._max_latency = False, 0
         self._session_config = mocker.MagicMock()  # place holder
         # for holding test results
         # mocked_send_messages will record each calls in this dict
@@ -157,6 +258,371 @@ class TestAWSIoTLogger:
         # confirm the send_messages mock receives the expecting calls.
         assert self._merged_msgs == self._test_result
 
+    def test_thread_main_with_sharded_backlog(self):
+        self._queue = LogsBacklog(max_bytes=1024**3)
+        for _item in self._msgs:
+            self._queue.put_nowait(_item)
+
+        with pytest.raises(self._TestFinished):
+            AWSIoTLogger.thread_main.__get__(self)()
+        assert self._merged_msgs == self._test_result
+        assert self._queue.empty()
+
+    async def test_async_main(self, mocker: MockerFixture):
+        mocker.patch(
+            f"{MODULE}.asyncio.sleep",
+            mocker.AsyncMock(side_effect=self._TestFinished),
+        )
+
+        with pytest.raises(self._TestFinished):
+            await AWSIoTLogger.async_main.__get__(self)()
+        assert self._merged_msgs == self._test_result
+
+    async def test_async_main_merge_spool_off_loop(
+        self, tmp_path: Path, mocker: MockerFixture
+    ):
+        mocker.patch(
+            f"{MODULE}.asyncio.sleep",
+            mocker.AsyncMock(side_effect=self._TestFinished),
+        )
+        self._queue = self._spool = LogsSpool(tmp_path, max_bytes=1024**3)
+        for _item in self._msgs:
+            self._queue.put_nowait(_item)
+        _merge_threads = []
+
+        def _merge_logs():
+            _merge_threads.append(threading.current_thread())
+            return AWSIoTLogger._merge_logs(self)
+
+        self._merge_logs = _merge_logs
+
+        with pytest.raises(self._TestFinished):
+            await AWSIoTLogger.async_main.__get__(self)()
+        # reading the spool doesn't block the event loop
+        assert threading.main_thread() not in _merge_threads
+        assert self._merged_msgs == self._test_result
+
+    def test_thread_main_drain_backlog_back_to_back(self):
+        self._max_logs_per_merge = 1024
+        _uploaded_msgs: dict[(LogGroupType, str), list[LogMessage]] = defaultdict(list)
+
+        def _put_log_events(_log_group_name, _ecu_id, _logs) -> bool:
+            _uploaded_msgs[(_log_group_name, _ecu_id)].extend(_logs)
+            return True
+
+        self.put_log_events = _put_log_events
+
+        with pytest.raises(self._TestFinished):
+            AWSIoTLogger.thread_main.__get__(self)()
+        # no idling between the saturated rounds, only after the queue is drained
+        assert self._merged_msgs == _uploaded_msgs
+        assert self._queue.empty()
+
+    def test_thread_main_idle_on_upload_failure(self, mocker: MockerFixture):
+        self._max_logs_per_merge = 1024
+        self.put_log_events = mocker.MagicMock(return_value=False)
+
+        with pytest.raises(self._TestFinished):
+            AWSIoTLogger.thread_main.__get__(self)()
+        # idle after the failed saturated round
+        assert self._queue.qsize() == self.MSG_NUM - 1024
+
+    def test_upload_split_stream_into_batches(self, mocker: MockerFixture):
+        self.put_log_events = mocker.MagicMock(return_value=True)
+        _logs = [
+            LogRecord(timestamp=_ts, message="msg")
+            for _ts in range(MAX_LOGS_PER_PUT + 1)
+        ]
+        assert self._upload({(LogGroupType.LOG, "main_ecu"): _logs}, len(_logs))
+        assert [len(_call.args[2]) for _call in self.put_log_events.call_args_list] == [
+            MAX_LOGS_PER_PUT,
+            1,
+        ]
+
+    def test_merge_logs_adaptive_flush(self):
+        self._queue = LogsBacklog(max_bytes=1024**3)
+        self._adaptive_flush, self._max_latency = True, 0.1
+        self._max_logs_per_merge, self._interval = 16, 5
+        for _idx in range(16):
+            self._queue.put_nowait(
+                (
+                    LogGroupType.LOG,
+                    "busy_ecu",
+                    LogRecord(timestamp=_idx, message="busy"),
+                )
+            )
+        self._queue.put_nowait(
+            (LogGroupType.LOG, "idle_ecu", LogRecord(timestamp=0, message="idle"))
+        )
+
+        # the full stream is flushed immediately
+        _message_dict, _merge_count = self._merge_logs()
+        assert list(_message_dict) == [(LogGroupType.LOG, "busy_ecu")]
+        assert _merge_count == 16
+        # the idle stream is flushed after it is pending for <max_latency>
+        _message_dict, _merge_count = self._merge_logs()
+        assert list(_message_dict) == [(LogGroupType.LOG, "idle_ecu")]
+        assert self._queue.empty()
+
+    def test_upload_streams_concurrently(self):
+        _streams_num, _delay = 8, 0.2
+        self._upload_executor = ThreadPoolExecutor(max_workers=_streams_num)
+        _uploaded: defaultdict[str, list[int]] = defaultdict(list)
+
+        def _put_log_events(_log_group_name, _ecu_id, _logs) -> bool:
+            time.sleep(_delay)
+            _uploaded[_ecu_id].append(_logs[0]["timestamp"])
+            return True
+
+        self.put_log_events = _put_log_events
+        # each stream is uploaded with 2 batches
+        _message_dict = {
+            (LogGroupType.LOG, f"ecu_{_idx}"): [
+                LogRecord(timestamp=_ts, message="msg")
+                for _ts in range(MAX_LOGS_PER_PUT + 1)
+            ]
+            for _idx in range(_streams_num)
+        }
+        try:
+            _start = time.perf_counter()
+            assert self._upload(_message_dict, _streams_num * (MAX_LOGS_PER_PUT + 1))
+            assert time.perf_counter() - _start < _streams_num * _delay
+        finally:
+            self._upload_executor.shutdown()
+
+        # the batches of a stream are uploaded in order
+        assert _uploaded == {
+            f"ecu_{_idx}": [0, MAX_LOGS_PER_PUT] for _idx in range(_streams_num)
+        }
+
+    @pytest.fixture
+    def fake_endpoint(self):
+        _endpoint = _FakeLogsEndpoint(failing_stream="sub_ecu0")
+        self._client, self._exc_types = _endpoint, _endpoint.exceptions
+        self.put_log_events = AWSIoTLogger.put_log_events.__get__(self)
+        return _endpoint
+
+    def test_upload_retry_failed_stream_later(self, fake_endpoint: _FakeLogsEndpoint):
+        _failing = (LogGroupType.LOG, "sub_ecu0")
+        _healthy = (LogGroupType.LOG, "main_ecu")
+        _logs = [LogRecord(timestamp=_ts, message="msg") for _ts in range(8)]
+
+        # the failing stream is queued for retrying, the healthy one is uploaded
+        assert self._upload({_failing: _logs[:4], _healthy: _logs[:4]}, 8)
+        _retry_at = self._retry_queues[_failing].retry_at
+        assert RETRY_BACKOFF_FACTOR / 2 <= _retry_at <= RETRY_BACKOFF_FACTOR
+        # new entries are queued behind until the retry is due
+        assert self._upload({_failing: _logs[4:], _healthy: _logs[4:]}, 8)
+        assert fake_endpoint.failed_requests == 1
+        assert fake_endpoint.uploaded == {
+            (self._otaclient_logs_log_group, "main_ecu"): [
+                _log.to_log_message() for _log in _logs
+            ]
+        }
+
+        # retry failed again, with a longer backoff
+        self._time_mocker.monotonic.return_value = _retry_at
+        assert not self._upload({}, 0)
+        assert fake_endpoint.failed_requests == 2
+        assert self._retry_queues[_failing].retry_at - _retry_at >= RETRY_BACKOFF_FACTOR
+
+        # pending entries are uploaded in order once the endpoint recovers
+        fake_endpoint.failing_stream = None
+        self._time_mocker.monotonic.return_value = _retry_at + RETRY_BACKOFF_MAX
+        assert self._upload({}, 0)
+        assert fake_endpoint.uploaded[(self._otaclient_logs_log_group, "sub_ecu0")] == [
+            _log.to_log_message() for _log in _logs
+        ]
+        assert not self._retry_queues
+        self._time_mocker.sleep.assert_not_called()
+
+    def test_upload_retry_queue_bounded_by_bytes(
+        self, fake_endpoint: _FakeLogsEndpoint
+    ):
+        _failing = (LogGroupType.LOG, "sub_ecu0")
+        _message = "x" * (1024 - EVENT_OVERHEAD)
+        _round_logs_num = 64
+        _rounds = MAX_RETRY_BYTES // (1024 * _round_logs_num)
+
+        # many small rounds are kept until the size limit is reached
+        for _round in range(_rounds):
+            _logs = [
+                LogRecord(timestamp=_round * _round_logs_num + _idx, message=_message)
+                for _idx in range(_round_logs_num)
+            ]
+            self._upload({_failing: _logs}, _round_logs_num)
+        _retry_queue = self._retry_queues[_failing]
+        assert len(_retry_queue.logs) == _rounds * _round_logs_num
+
+        # then the oldest entries are dropped
+        self._upload(
+            {_failing: [LogRecord(timestamp=-1, message=_message)]}, _round_logs_num
+        )
+        assert len(_retry_queue.logs) == _rounds * _round_logs_num
+        assert _retry_queue.logs[0].timestamp == 1
+        assert _retry_queue.nbytes <= MAX_RETRY_BYTES
+        assert fake_endpoint.failed_requests == 1
+
+    def test_thread_main_keep_uploading_healthy_streams(
+        self, fake_endpoint: _FakeLogsEndpoint
+    ):
+        self._max_logs_per_merge = 1024
+
+        with pytest.raises(self._TestFinished):
+            AWSIoTLogger.thread_main.__get__(self)()
+        # no idling on the failing stream, the backlog is drained back-to-back
+        assert self._queue.empty()
+        assert fake_endpoint.uploaded == {
+            _stream: _logs
+            for _stream, _logs in self._merged_msgs.items()
+            if _stream[1] != "sub_ecu0"
+        }
+        assert sum(
+            len(_retry_queue.logs) for _retry_queue in self._retry_queues.values()
+        ) == sum(
+            len(_logs)
+            for _stream, _logs in self._merged_msgs.items()
+            if _stream[1] == "sub_ecu0"
+        )
+
+    def test_thread_main_spool_put_back_failed_stream(
+        self, fake_endpoint: _FakeLogsEndpoint, tmp_path: Path
+    ):
+        self._queue = self._spool = LogsSpool(tmp_path, max_bytes=1024**3)
+        for _item in self._msgs:
+            self._queue.put_nowait(_item)
+
+        with pytest.raises(self._TestFinished):
+            AWSIoTLogger.thread_main.__get__(self)()
+        # the healthy streams are uploaded and committed
+        assert fake_endpoint.uploaded == {
+            _stream: _logs
+            for _stream, _logs in self._merged_msgs.items()
+            if _stream[1] != "sub_ecu0"
+        }
+        # while the entries of the failing stream are put back into the spool
+        _put_back = []
+        while not self._queue.empty():
+            _put_back.append(self._queue.get_nowait())
+        assert sorted(_put_back, key=lambda _item: _item[0].value) == [
+            _item
+            for _log_group_type in LogGroupType
+            for _item in self._msgs
+            if _item[0] == _log_group_type and _item[1] == "sub_ecu0"
+        ]
+
+    def test_thread_main_spool_put_back_over_quota(
+        self, fake_endpoint: _FakeLogsEndpoint, tmp_path: Path
+    ):
+        self._queue = self._spool = LogsSpool(tmp_path, max_bytes=64 * 1024)
+        _accepted = self._spool.put_many(self._msgs)
+        assert _accepted < len(self._msgs)
+
+        with pytest.raises(self._TestFinished):
+            AWSIoTLogger.thread_main.__get__(self)()
+        # the entries of the failing stream are put back even the spool is full
+        _put_back = []
+        while not self._queue.empty():
+            _put_back.append(self._queue.get_nowait())
+        assert sorted(_put_back, key=lambda _item: _item[0].value) == [
+            _item
+            for _log_group_type in LogGroupType
+            for _item in self._msgs[:_accepted]
+            if _item[0] == _log_group_type and _item[1] == "sub_ecu0"
+        ]
+
+    def test_put_log_events_create_log_stream(self, mocker: MockerFixture):
+        _endpoint = _FakeLogsEndpoint(failing_stream=None)
+        mocker.patch.object(
+            _endpoint,
+            "put_log_events",
+            side_effect=[_endpoint.ResourceNotFoundException(), None],
+        )
+        _endpoint.create_log_stream = mocker.MagicMock()
+        self._client, self._exc_types = _endpoint, _endpoint.exceptions
+        self._create_log_stream = AWSIoTLogger._create_log_stream.__get__(self)
+
+        # uploaded again right after the log stream is created
+        assert AWSIoTLogger.put_log_events(self, "log_group", "log_stream", [])
+        _endpoint.create_log_stream.assert_called_once_with(
+            logGroupName="log_group", logStreamName="log_stream"
+        )
+        assert _endpoint.put_log_events.call_count == 2
+
+    @pytest.mark.parametrize(
+        "_code, _status, _uploaded",
+        (
+            ("ThrottlingException", 400, False),
+            ("ServiceUnavailableException", 503, False),
+            ("SomeServerError", 500, False),
+            # rejected logs are not retried
+            ("InvalidParameterException", 400, True),
+        ),
+    )
+    def test_put_log_events_retry_on_client_error(
+        self, _code: str, _status: int, _uploaded: bool, mocker: MockerFixture
+    ):
+        _endpoint = _FakeLogsEndpoint(failing_stream=None)
+        mocker.patch.object(
+            _endpoint,
+            "put_log_events",
+            side_effect=ClientError(
+                {
+                    "Error": {"Code": _code, "Message": ""},
+                    "ResponseMetadata": {"HTTPStatusCode": _status},
+                },
+                "PutLogEvents",
+            ),
+        )
+        self._client, self._exc_types = _endpoint, _endpoint.exceptions
+
+        assert (
+            AWSIoTLogger.put_log_events(self, "log_group", "log_stream", [])
+            is _uploaded
+        )
+
+    @pytest.mark.parametrize(
+        "_failing_streams",
+        (
+            pytest.param(set(), id="all_uploaded"),
+            pytest.param({"sub_ecu0"}, id="some_failed"),
+            pytest.param(set(_mocked_ECUs_list), id="all_failed"),
+        ),
+    )
+    def test_thread_main_commit_spool(
+        self, _failing_streams: set[str], mocker: MockerFixture
+    ):
+        self._spool = mocker.MagicMock()
+        self.put_log_events = mocker.MagicMock(
+            side_effect=lambda _group, _stream, _batch: _stream not in _failing_streams
+        )
+
+        with pytest.raises(self._TestFinished):
+            AWSIoTLogger.thread_main.__get__(self)()
+
+        # no stream is uploaded, the round is rolled back to be read again
+        if _failing_streams == set(_mocked_ECUs_list):
+            self._spool.commit.assert_not_called()
+            self._spool.put_back.assert_not_called()
+            self._spool.rollback.assert_called_once()
+            return
+
+        # otherwise the round is committed, while the entries of the failed
+        #   streams are put back to the end of the spool
+        self._spool.commit.assert_called_once_with(self.MSG_NUM)
+        self._spool.rollback.assert_not_called()
+        if not _failing_streams:
+            self._spool.put_back.assert_not_called()
+            return
+        self._spool.put_back.assert_called_once()
+        (_put_back,), _ = self._spool.put_back.call_args
+        assert sorted(_put_back, key=lambda _item: _item[0].value) == [
+            _item
+            for _log_group_type in LogGroupType
+            for _item in self._msgs
+            if _item[0] == _log_group_type and _item[1] in _failing_streams
+        ]
+
 
 class TestCreateLogStreamAwsCrtError:
     """Test that _create_log_stream properly handles AwsCrtError from awscrt."""
@@ -188,7 +654,7 @@ class TestCreateLogStreamAwsCrtError:
         iot_logger._exc_types = mock_client.exceptions
 
         with pytest.raises(AwsCrtError) as exc_info:
-            AWSIoTLogger._create_log_stream.__wrapped__(
+            AWSIoTLogger._create_log_stream(
                 iot_logger, "test-log-group", "test-log-stream"
             )
         # Verify the re-raised error is the exact AwsCrtError instance
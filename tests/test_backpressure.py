@@ -0,0 +1,63 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import pytest
+
+from otaclient_iot_logging_server.backpressure import (
+    MAX_RETRY_AFTER,
+    MIN_RETRY_AFTER,
+    DrainRateMeter,
+    estimate_retry_after,
+)
+
+
+def test_drain_rate_meter():
+    _meter = DrainRateMeter(initial_rate=100)
+    assert _meter.rate == 100
+
+    _alpha = DrainRateMeter.SMOOTHING_FACTOR
+    _meter.record(drained=512, elapsed=2)
+    assert _meter.rate == pytest.approx(_alpha * 256 + (1 - _alpha) * 100)
+
+    # invalid records are ignored
+    _rate = _meter.rate
+    _meter.record(drained=0, elapsed=2)
+    _meter.record(drained=512, elapsed=0)
+    assert _meter.rate == _rate
+
+
+@pytest.mark.parametrize(
+    "backlog, fill_ratio, drain_rate, expected",
+    (
+        # drain 2048 logs to reach half of the backlog
+        (4096, 1, 512, 4),
+        # the backlog is filled by the memory budget
+        (1024, 0.8, 96, 4),
+        # already below the resume fill ratio
+        (1024, 0.25, 512, MIN_RETRY_AFTER),
+        # too slow draining
+        (4096, 1, 1, MAX_RETRY_AFTER),
+        # uploader is not draining at all
+        (4096, 1, 0, MAX_RETRY_AFTER),
+    ),
+)
+def test_estimate_retry_after(
+    backlog: int, fill_ratio: float, drain_rate: float, expected: float
+):
+    assert estimate_retry_after(backlog, fill_ratio, drain_rate) == pytest.approx(
+        expected
+    )
@@ -47,9 +47,37 @@ AWS_PROFILE_INFO_FPATH = TEST_DATA_DPATH / "aws_profile_info.yaml"
                 "SERVER_LOGSTREAM_SUFFIX": "iot_logging_server",
                 "SERVER_LOGGING_LEVEL": "INFO",
                 "SERVER_LOGGING_LOG_FORMAT": "[%(asctime)s][%(levelname)s]-%(name)s:%(funcName)s:%(lineno)d,%(message)s",
-                "MAX_LOGS_BACKLOG": 4096,
+                "MAX_LOGS_BACKLOG": 65536,
+                "MAX_LOGS_BACKLOG_BYTES": 16 * 1024**2,
                 "MAX_LOGS_PER_MERGE": 512,
                 "UPLOAD_INTERVAL": 3,
+                "STREAM_LOGS_ACK_LOGS_NUM": 1024,
+                "STREAM_LOGS_ACK_INTERVAL": 1,
+                "ENABLE_TCP_LISTENER": True,
+                "LISTEN_UNIX_SOCKET": "",
+                "LISTEN_UNIX_SOCKET_GRPC": "",
+                "LISTEN_UNIX_SOCKET_MODE": 0o660,
+                "GRPC_FAST_PATH": True,
+                "GRPC_COMPRESSION": "none",
+                "HTTP_MAX_BODY_SIZE": 1024**2,
+                "HTTP_BULK_MAX_BODY_SIZE": 64 * 1024**2,
+                "INGESTION_WORKERS": 1,
+                "USE_UVLOOP": False,
+                "ECU_RATE_LIMIT": 0,
+                "ECU_RATE_LIMIT_BURST": 1024,
+                "ECU_RATE_LIMIT_OVERRIDES": {},
+                "SPOOL_DIR": "",
+                "SPOOL_MAX_BYTES": 256 * 1024**2,
+                "SPOOL_SEGMENT_SIZE": 8 * 1024**2,
+                "SPOOL_FSYNC_BATCH": 1024,
+                "SPOOL_FSYNC_INTERVAL": 1,
+                "USE_SHM_RING_QUEUE": False,
+                "LOGS_DROP_POLICY": "drop_newest",
+                "LOGS_DROP_SAMPLING_RATE": 10,
+                "ASYNC_PIPELINE": False,
+                "COALESCE_WINDOW": 0,
+                "UPLOAD_MAX_LATENCY": 0,
+                "UPLOAD_CONCURRENCY": 4,
                 "ECU_INFO_YAML": "/boot/ota/ecu_info.yaml",
                 "EXIT_ON_CONFIG_FILE_CHANGED": True,
             },
@@ -72,9 +100,37 @@ AWS_PROFILE_INFO_FPATH = TEST_DATA_DPATH / "aws_profile_info.yaml"
                 "SERVER_LOGSTREAM_SUFFIX": "iot_logging_server",
                 "SERVER_LOGGING_LEVEL": "ERROR",
                 "SERVER_LOGGING_LOG_FORMAT": "[%(asctime)s][%(levelname)s]-%(name)s:%(funcName)s:%(lineno)d,%(message)s",
-                "MAX_LOGS_BACKLOG": 4096,
+                "MAX_LOGS_BACKLOG": 65536,
+                "MAX_LOGS_BACKLOG_BYTES": 16 * 1024**2,
                 "MAX_LOGS_PER_MERGE": 512,
                 "UPLOAD_INTERVAL": 30,
+                "STREAM_LOGS_ACK_LOGS_NUM": 1024,
+                "STREAM_LOGS_ACK_INTERVAL": 1,
+                "ENABLE_TCP_LISTENER": True,
+                "LISTEN_UNIX_SOCKET": "",
+                "LISTEN_UNIX_SOCKET_GRPC": "",
+                "LISTEN_UNIX_SOCKET_MODE": 0o660,
+                "GRPC_FAST_PATH": True,
+                "GRPC_COMPRESSION": "none",
+                "HTTP_MAX_BODY_SIZE": 1024**2,
+                "HTTP_BULK_MAX_BODY_SIZE": 64 * 1024**2,
+                "INGESTION_WORKERS": 1,
+                "USE_UVLOOP": False,
+                "ECU_RATE_LIMIT": 0,
+                "ECU_RATE_LIMIT_BURST": 1024,
+                "ECU_RATE_LIMIT_OVERRIDES": {},
+                "SPOOL_DIR": "",
+                "SPOOL_MAX_BYTES": 256 * 1024**2,
+                "SPOOL_SEGMENT_SIZE": 8 * 1024**2,
+                "SPOOL_FSYNC_BATCH": 1024,
+                "SPOOL_FSYNC_INTERVAL": 1,
+                "USE_SHM_RING_QUEUE": False,
+                "LOGS_DROP_POLICY": "drop_newest",
+                "LOGS_DROP_SAMPLING_RATE": 10,
+                "ASYNC_PIPELINE": False,
+                "COALESCE_WINDOW": 0,
+                "UPLOAD_MAX_LATENCY": 0,
+                "UPLOAD_CONCURRENCY": 4,
                 "ECU_INFO_YAML": "/boot/ota/ecu_info.yaml",
                 "EXIT_ON_CONFIG_FILE_CHANGED": True,
             },
@@ -93,8 +149,36 @@ AWS_PROFILE_INFO_FPATH = TEST_DATA_DPATH / "aws_profile_info.yaml"
                 "SERVER_LOGGING_LEVEL": "DEBUG",
                 "SERVER_LOGGING_LOG_FORMAT": "someformat",
                 "MAX_LOGS_BACKLOG": "1024",
+                "MAX_LOGS_BACKLOG_BYTES": "1048576",
                 "MAX_LOGS_PER_MERGE": "128",
                 "UPLOAD_INTERVAL": "10",
+                "STREAM_LOGS_ACK_LOGS_NUM": "256",
+                "STREAM_LOGS_ACK_INTERVAL": "0.5",
+                "ENABLE_TCP_LISTENER": "false",
+                "LISTEN_UNIX_SOCKET": "/run/otaclient-logger/http.sock",
+                "LISTEN_UNIX_SOCKET_GRPC": "/run/otaclient-logger/grpc.sock",
+                "LISTEN_UNIX_SOCKET_MODE": "0600",
+                "GRPC_FAST_PATH": "false",
+                "GRPC_COMPRESSION": "gzip",
+                "HTTP_MAX_BODY_SIZE": "2048",
+                "HTTP_BULK_MAX_BODY_SIZE": "4096",
+                "INGESTION_WORKERS": "4",
+                "USE_UVLOOP": "true",
+                "ECU_RATE_LIMIT": "100",
+                "ECU_RATE_LIMIT_BURST": "200",
+                "ECU_RATE_LIMIT_OVERRIDES": '{"sub1": {"rate": 10, "burst": 20}}',
+                "SPOOL_DIR": "/var/spool/otaclient-logger",
+                "SPOOL_MAX_BYTES": "1048576",
+                "SPOOL_SEGMENT_SIZE": "65536",
+                "SPOOL_FSYNC_BATCH": "16",
+                "SPOOL_FSYNC_INTERVAL": "0.5",
+                "USE_SHM_RING_QUEUE": "true",
+                "LOGS_DROP_POLICY": "sampling",
+                "LOGS_DROP_SAMPLING_RATE": "5",
+                "ASYNC_PIPELINE": "true",
+                "COALESCE_WINDOW": "1.5",
+                "UPLOAD_MAX_LATENCY": "0.5",
+                "UPLOAD_CONCURRENCY": "8",
                 "ECU_INFO_YAML": "/some/where/ecu_info.yaml",
                 "EXIT_ON_CONFIG_FILE_CHANGED": "false",
             },
@@ -110,8 +194,36 @@ AWS_PROFILE_INFO_FPATH = TEST_DATA_DPATH / "aws_profile_info.yaml"
                 "SERVER_LOGGING_LEVEL": "DEBUG",
                 "SERVER_LOGGING_LOG_FORMAT": "someformat",
                 "MAX_LOGS_BACKLOG": 1024,
+                "MAX_LOGS_BACKLOG_BYTES": 1048576,
                 "MAX_LOGS_PER_MERGE": 128,
                 "UPLOAD_INTERVAL": 10,
+                "STREAM_LOGS_ACK_LOGS_NUM": 256,
+                "STREAM_LOGS_ACK_INTERVAL": 0.5,
+                "ENABLE_TCP_LISTENER": False,
+                "LISTEN_UNIX_SOCKET": "/run/otaclient-logger/http.sock",
+                "LISTEN_UNIX_SOCKET_GRPC": "/run/otaclient-logger/grpc.sock",
+                "LISTEN_UNIX_SOCKET_MODE": 0o600,
+                "GRPC_FAST_PATH": False,
+                "GRPC_COMPRESSION": "gzip",
+                "HTTP_MAX_BODY_SIZE": 2048,
+                "HTTP_BULK_MAX_BODY_SIZE": 4096,
+                "INGESTION_WORKERS": 4,
+                "USE_UVLOOP": True,
+                "ECU_RATE_LIMIT": 100,
+                "ECU_RATE_LIMIT_BURST": 200,
+                "ECU_RATE_LIMIT_OVERRIDES": {"sub1": {"rate": 10.0, "burst": 20}},
+                "SPOOL_DIR": "/var/spool/otaclient-logger",
+                "SPOOL_MAX_BYTES": 1048576,
+                "SPOOL_SEGMENT_SIZE": 65536,
+                "SPOOL_FSYNC_BATCH": 16,
+                "SPOOL_FSYNC_INTERVAL": 0.5,
+                "USE_SHM_RING_QUEUE": True,
+                "LOGS_DROP_POLICY": "sampling",
+                "LOGS_DROP_SAMPLING_RATE": 5,
+                "ASYNC_PIPELINE": True,
+                "COALESCE_WINDOW": 1.5,
+                "UPLOAD_MAX_LATENCY": 0.5,
+                "UPLOAD_CONCURRENCY": 8,
                 "ECU_INFO_YAML": "/some/where/ecu_info.yaml",
                 "EXIT_ON_CONFIG_FILE_CHANGED": False,
             },
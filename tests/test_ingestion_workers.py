@@ -0,0 +1,123 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+import otaclient_iot_logging_server.ingestion_workers as ingestion_workers_module
+import otaclient_iot_logging_server.log_proxy_server as log_server_module
+from otaclient_iot_logging_server._common import LogGroupType
+from otaclient_iot_logging_server.configs import server_cfg
+from otaclient_iot_logging_server.ecu_info import parse_ecu_info
+from otaclient_iot_logging_server.ingestion_workers import (
+    create_ipc_queue,
+    launch_ingestion_workers,
+    wait_for_ingestion_workers,
+)
+
+MODULE = ingestion_workers_module.__name__
+TEST_DIR = Path(__file__).parent / "data"
+
+LISTEN_ADDRESS = "127.0.0.1"
+LISTEN_PORT = 8093
+WORKERS_NUM = 2
+
+
+def _post_log(ecu_id: str, msg: str) -> None:
+    # NOTE: urllib opens a new connection for each request, so that
+    #       the requests are balanced among the workers by the kernel.
+    _req = urllib.request.Request(
+        f"http://{LISTEN_ADDRESS}:{LISTEN_PORT}/{ecu_id}", data=msg.encode()
+    )
+    with urllib.request.urlopen(_req, timeout=1):
+        pass
+
+
+def test_ingestion_workers(mocker: MockerFixture):
+    mocker.patch(
+        f"{log_server_module.__name__}.server_cfg",
+        server_cfg.model_copy(
+            update={
+                "LISTEN_ADDRESS": LISTEN_ADDRESS,
+                "LISTEN_PORT": LISTEN_PORT,
+                "LISTEN_PORT_GRPC": 8095,
+            }
+        ),
+    )
+    mocker.patch(
+        f"{log_server_module.__name__}.ecu_info",
+        parse_ecu_info(TEST_DIR / "ecu_info.yaml"),
+    )
+
+    queue = create_ipc_queue(maxsize=1024)
+    workers = launch_ingestion_workers(queue, WORKERS_NUM)
+    try:
+        # wait for the workers' servers up
+        for _ in range(50):
+            try:
+                _post_log("main", "warm up")
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            pytest.fail("ingestion workers failed to start")
+        queue.get(timeout=3)
+
+        msg_num = 64
+        for _idx in range(msg_num):
+            _post_log("sub1", f"msg_{_idx}")
+
+        _received = []
+        for _ in range(msg_num):
+            _log_group_type, _ecu_id, _log_msg = queue.get(timeout=3)
+            assert _log_group_type == LogGroupType.LOG
+            assert _ecu_id == "sub1"
+            _received.append(_log_msg.message)
+        assert sorted(_received) == sorted(f"msg_{_idx}" for _idx in range(msg_num))
+        assert all(_worker.is_alive() for _worker in workers)
+    finally:
+        for _worker in workers:
+            _worker.kill()
+            _worker.join()
+
+
+def _exit_worker_main(_queue, worker_idx: int) -> None:
+    if worker_idx == 0:
+        return
+    time.sleep(30)
+
+
+def test_wait_for_ingestion_workers_exit_on_worker_exits(mocker: MockerFixture):
+    mocker.patch(f"{MODULE}._worker_main", _exit_worker_main)
+    mocker.patch(f"{MODULE}.sd_notify_enabled", return_value=False)
+
+    workers = launch_ingestion_workers(create_ipc_queue(maxsize=1), WORKERS_NUM)
+    try:
+        with pytest.raises(SystemExit):
+            wait_for_ingestion_workers(workers)
+        # NOTE: the sentinel is ready right before the process being reaped
+        workers[0].join(timeout=3)
+        assert not workers[0].is_alive()
+        assert workers[1].is_alive()
+    finally:
+        for _worker in workers:
+            _worker.kill()
+            _worker.join()
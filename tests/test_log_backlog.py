@@ -0,0 +1,356 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import contextlib
+import threading
+import time
+from queue import Empty, Full
+
+import pytest
+
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+from otaclient_iot_logging_server.log_backlog import (
+    DEFAULT_LANE,
+    DROP_NEWEST,
+    DROP_OLDEST,
+    DROP_SAMPLING,
+    ENTRY_OVERHEAD,
+    LogsBacklog,
+    get_drop_summary,
+    get_entry_size,
+    get_lane,
+)
+from otaclient_iot_logging_server.v1._types import LogLevel
+
+
+def _entry(msg_len: int) -> tuple[LogGroupType, str, LogRecord]:
+    return (LogGroupType.LOG, "main", LogRecord(timestamp=0, message="x" * msg_len))
+
+
+def test_bounded_by_bytes():
+    _backlog = LogsBacklog(max_bytes=4 * (ENTRY_OVERHEAD + 100))
+
+    # one large entry takes the space of many small entries
+    _backlog.put_nowait(_entry(ENTRY_OVERHEAD + 200))
+    _backlog.put_nowait(_entry(100))
+    _backlog.put_nowait(_entry(100))
+    with pytest.raises(Full):
+        _backlog.put_nowait(_entry(100))
+    assert _backlog.nbytes == 4 * (ENTRY_OVERHEAD + 100)
+    assert _backlog.fill_ratio() == 1
+
+    _backlog.get_nowait()
+    assert _backlog.nbytes == 2 * (ENTRY_OVERHEAD + 100)
+    assert _backlog.fill_ratio() == pytest.approx(0.5)
+    for _ in range(2):
+        _backlog.put_nowait(_entry(100))
+    assert _backlog.qsize() == 4
+
+
+def test_bounded_by_entries_count():
+    _backlog = LogsBacklog(maxsize=2, max_bytes=1024**2)
+
+    _backlog.put_nowait(_entry(1))
+    assert _backlog.fill_ratio() == pytest.approx(0.5)
+    _backlog.put_nowait(_entry(1))
+    with pytest.raises(Full):
+        _backlog.put_nowait(_entry(1))
+
+    while not _backlog.empty():
+        _backlog.get_nowait()
+    with pytest.raises(Empty):
+        _backlog.get_nowait()
+    assert _backlog.nbytes == 0
+
+
+def test_reject_oversized_entry():
+    _backlog = LogsBacklog(max_bytes=1024)
+    with pytest.raises(Full):
+        # never fits, don't block forever
+        _backlog.put(_entry(1024))
+    assert _backlog.empty()
+
+
+def test_blocking_put():
+    _entry_size = get_entry_size(_entry(100))
+    _backlog = LogsBacklog(max_bytes=_entry_size)
+    _backlog.put_nowait(_entry(100))
+
+    with pytest.raises(Full):
+        _backlog.put(_entry(100), timeout=0.01)
+
+    _getter = threading.Timer(0.1, _backlog.get_nowait)
+    _getter.start()
+    _backlog.put(_entry(100), timeout=3)
+    _getter.join()
+    assert _backlog.nbytes == _entry_size
+
+
+def test_get_streams():
+    _backlog = LogsBacklog(max_bytes=1024**2)
+    for _idx in range(6):
+        _backlog.put_nowait(
+            (
+                LogGroupType.LOG,
+                f"ecu_{_idx % 2}",
+                LogRecord(timestamp=_idx, message=f"msg_{_idx}"),
+            )
+        )
+
+    # streams are taken in order, the last taken stream might be partially taken
+    _streams = _backlog.get_streams(4)
+    assert list(_streams) == [(LogGroupType.LOG, "ecu_0"), (LogGroupType.LOG, "ecu_1")]
+    assert [_msg.timestamp for _msg in _streams[(LogGroupType.LOG, "ecu_0")]] == [
+        0,
+        2,
+        4,
+    ]
+    assert [_msg.timestamp for _msg in _streams[(LogGroupType.LOG, "ecu_1")]] == [1]
+    assert _backlog.qsize() == 2
+    assert _backlog.nbytes == 2 * get_entry_size(_entry(len("msg_0")))
+
+    assert _backlog.get_nowait()[2].timestamp == 3
+    assert _backlog.get_streams(4) == {
+        (LogGroupType.LOG, "ecu_1"): [LogRecord(timestamp=5, message="msg_5")]
+    }
+    assert _backlog.empty()
+    assert _backlog.nbytes == 0
+    assert _backlog.get_streams(4) == {}
+
+
+def _get_due_streams(backlog: LogsBacklog, **kwargs):
+    _params = dict(
+        max_entries=1024,
+        max_latency=60,
+        flush_count=1024,
+        flush_bytes=1024**2,
+        timeout=5,
+    )
+    _params.update(kwargs)
+    return backlog.get_due_streams(**_params)  # type: ignore
+
+
+def test_get_due_streams_by_latency():
+    _backlog = LogsBacklog(max_bytes=1024**2)
+    assert _get_due_streams(_backlog, timeout=0.1) == {}
+
+    _backlog.put_nowait(_entry(16))
+    _start = time.monotonic()
+    _streams = _get_due_streams(_backlog, max_latency=0.2)
+    assert 0.2 <= time.monotonic() - _start < 5
+    assert _streams == {(LogGroupType.LOG, "main"): [_entry(16)[2]]}
+    assert _backlog.empty()
+
+
+@pytest.mark.parametrize(
+    "_full_by",
+    ({"flush_count": 16}, {"flush_bytes": 16 * 100}),
+)
+def test_get_due_streams_by_full_stream(_full_by: dict[str, int]):
+    _backlog = LogsBacklog(max_bytes=1024**2)
+    _idle_entry = (LogGroupType.LOG, "idle", LogRecord(timestamp=0, message="idle"))
+    _backlog.put_nowait(_idle_entry)
+
+    def _burst():
+        time.sleep(0.1)
+        for _ in range(16):
+            _backlog.put_nowait(_entry(100))
+
+    _producer = threading.Thread(target=_burst)
+    _producer.start()
+    _start = time.monotonic()
+    # the full stream is taken once it becomes full, the idle stream is left
+    _streams = _get_due_streams(_backlog, **_full_by)
+    assert time.monotonic() - _start < 5
+    _producer.join()
+    assert list(_streams) == [(LogGroupType.LOG, "main")]
+    assert len(_streams[(LogGroupType.LOG, "main")]) == 16
+    assert _backlog.get_nowait() == _idle_entry
+
+
+def test_get_due_streams_partially_taken():
+    _backlog = LogsBacklog(max_bytes=1024**2)
+    for _ in range(8):
+        _backlog.put_nowait(_entry(16))
+
+    assert (
+        len(
+            _get_due_streams(_backlog, max_entries=4, flush_count=8)[
+                (LogGroupType.LOG, "main")
+            ]
+        )
+        == 4
+    )
+    # the remaining entries of a partially taken stream are due immediately
+    _start = time.monotonic()
+    _streams = _get_due_streams(_backlog, flush_count=8)
+    assert time.monotonic() - _start < 1
+    assert len(_streams[(LogGroupType.LOG, "main")]) == 4
+    assert _backlog.empty()
+
+
+def _leveled_entry(ecu_id: str, idx: int) -> tuple[LogGroupType, str, LogRecord]:
+    return (LogGroupType.LOG, ecu_id, LogRecord(timestamp=idx, message=f"{idx}"))
+
+
+def test_priority_lanes_eviction():
+    _backlog = LogsBacklog(maxsize=3, max_bytes=1024**2)
+    _backlog.put_nowait(_leveled_entry("main", 0), level=LogLevel.DEBUG)
+    _backlog.put_nowait(_leveled_entry("main", 1), level=LogLevel.DEBUG)
+    _backlog.put_nowait(_leveled_entry("main", 2), level=LogLevel.WARN)
+
+    # no lower lane entries to evict for same level
+    with pytest.raises(Full):
+        _backlog.put_nowait(_leveled_entry("main", 3), level=LogLevel.DEBUG)
+    # logs without level are treated as INFO, evict the oldest DEBUG entry
+    _backlog.put_nowait(_leveled_entry("main", 4))
+    _backlog.put_nowait(_leveled_entry("main", 5), level=LogLevel.FATAL)
+    assert _backlog.evicted == 2
+    assert _backlog.qsize() == 3
+
+    # evicting all the lower lanes is still not enough, no eviction happens
+    with pytest.raises(Full):
+        _backlog.put_nowait(_leveled_entry("main", 6), level=LogLevel.INFO)
+    assert _backlog.evicted == 2
+
+    # higher lane first
+    assert [_backlog.get_nowait()[2].timestamp for _ in range(3)] == [5, 2, 4]
+
+
+def test_trace_in_lowest_lane():
+    assert get_lane(LogLevel.TRACE) < get_lane(LogLevel.DEBUG) < DEFAULT_LANE
+    assert get_lane(LogLevel.TRACE) == 0
+
+    _backlog = LogsBacklog(maxsize=2, max_bytes=1024**2)
+    _backlog.put_nowait(_leveled_entry("main", 0), level=LogLevel.TRACE)
+    _backlog.put_nowait(_leveled_entry("main", 1), level=LogLevel.DEBUG)
+    # DEBUG entries evict the TRACE entries first
+    _backlog.put_nowait(_leveled_entry("main", 2), level=LogLevel.DEBUG)
+    assert [_backlog.get_nowait()[2].timestamp for _ in range(2)] == [1, 2]
+
+
+def test_priority_lanes_bounded_by_bytes():
+    _entry_size = get_entry_size(_entry(100))
+    _backlog = LogsBacklog(max_bytes=2 * _entry_size)
+    _backlog.put_nowait(_entry(100), level=LogLevel.DEBUG)
+    _backlog.put_nowait(_entry(100), level=LogLevel.DEBUG)
+
+    # one larger entry evicts two smaller entries
+    _backlog.put_nowait(_entry(ENTRY_OVERHEAD + 200), level=LogLevel.ERROR)
+    assert _backlog.evicted == 2
+    assert _backlog.nbytes == 2 * _entry_size
+
+
+def test_put_many():
+    _backlog = LogsBacklog(maxsize=3, max_bytes=1024**2)
+    _levels = (LogLevel.DEBUG, LogLevel.DEBUG, LogLevel.INFO, LogLevel.DEBUG)
+    _items = [_leveled_entry("main", _idx) for _idx in range(5)]
+
+    _rejected: list[int] = []
+    # the 4th entry is rejected, the 5th entry(INFO) evicts the oldest DEBUG entry
+    assert (
+        _backlog.put_many(_items, levels=[*_levels, LogLevel.INFO], rejected=_rejected)
+        == 4
+    )
+    assert _rejected == [3]
+    assert _backlog.evicted == 1
+    assert _backlog.dropped["main"] == 2
+    assert [_backlog.get_nowait()[2].timestamp for _ in range(3)] == [2, 4, 1]
+
+    # without levels, entries are put into the INFO lane
+    assert _backlog.put_many(_items) == 3
+    assert _backlog.qsize() == 3
+
+
+def test_get_streams_priority_lanes():
+    _backlog = LogsBacklog(max_bytes=1024**2)
+    for _idx, _level in enumerate(
+        (LogLevel.DEBUG, LogLevel.ERROR, LogLevel.INFO, LogLevel.ERROR)
+    ):
+        _backlog.put_nowait(_leveled_entry("main", _idx), level=_level)
+    _backlog.put_nowait(_leveled_entry("sub", 4), level=LogLevel.DEBUG)
+
+    # ERROR entries are taken first, entries of a stream are kept in order
+    _streams = _backlog.get_streams(3)
+    assert _streams == {
+        (LogGroupType.LOG, "main"): [
+            LogRecord(timestamp=1, message="1"),
+            LogRecord(timestamp=2, message="2"),
+            LogRecord(timestamp=3, message="3"),
+        ]
+    }
+    _streams = _backlog.get_streams(3)
+    assert list(_streams) == [(LogGroupType.LOG, "main"), (LogGroupType.LOG, "sub")]
+    assert _backlog.empty()
+
+
+@pytest.mark.parametrize(
+    "drop_policy, expected_timestamps, dropped_range",
+    (
+        (DROP_NEWEST, [0, 1], (2, 5)),
+        (DROP_OLDEST, [4, 5], (0, 3)),
+        # only the 3rd incoming entry on full is admitted by evicting the oldest
+        (DROP_SAMPLING, [1, 4], (0, 5)),
+    ),
+)
+def test_drop_policy(
+    drop_policy: str,
+    expected_timestamps: list[int],
+    dropped_range: tuple[int, int],
+):
+    _backlog = LogsBacklog(
+        maxsize=2, max_bytes=1024**2, drop_policy=drop_policy, sampling_rate=3
+    )
+    for _idx in range(6):
+        with contextlib.suppress(Full):
+            _backlog.put_nowait(_leveled_entry("main", _idx))
+    assert _backlog.dropped == {"main": 4}
+
+    # the drops summary is inserted into the stream in timestamp order
+    _summary = get_drop_summary("main", 4, *dropped_range)
+    assert _summary.message == (
+        "4 messages dropped from ECU main between "
+        f"{_format_ts(dropped_range[0])} and {_format_ts(dropped_range[1])}"
+    )
+    assert _backlog.get_streams(2) == {
+        (LogGroupType.LOG, "main"): sorted(
+            [
+                *(
+                    LogRecord(timestamp=_ts, message=f"{_ts}")
+                    for _ts in expected_timestamps
+                ),
+                _summary,
+            ],
+            key=lambda _log_msg: _log_msg.timestamp,
+        )
+    }
+    # drops are reported only once
+    assert _backlog.get_streams(2) == {}
+
+
+def _format_ts(timestamp: int) -> str:
+    return f"1970-01-01T00:00:00.{timestamp:03d}+00:00"
+
+
+def test_drop_summary_for_evicted_stream():
+    _backlog = LogsBacklog(maxsize=1, max_bytes=1024**2)
+    _backlog.put_nowait(_leveled_entry("sub", 0), level=LogLevel.DEBUG)
+    _backlog.put_nowait(_leveled_entry("main", 1), level=LogLevel.ERROR)
+
+    _streams = _backlog.get_streams(1)
+    assert _streams[(LogGroupType.LOG, "main")] == [LogRecord(timestamp=1, message="1")]
+    assert _streams[(LogGroupType.LOG, "sub")] == [get_drop_summary("sub", 1, 0, 0)]
@@ -0,0 +1,137 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import pytest
+from pytest_mock import MockerFixture
+
+import otaclient_iot_logging_server.log_coalescer as log_coalescer_module
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+from otaclient_iot_logging_server._utils import format_timestamp
+from otaclient_iot_logging_server.configs import server_cfg
+from otaclient_iot_logging_server.log_coalescer import (
+    LogCoalescer,
+    create_log_coalescer,
+)
+
+MODULE = log_coalescer_module.__name__
+
+KEY = (LogGroupType.LOG, "main")
+WINDOW = 10
+
+
+@pytest.fixture
+def mocked_monotonic(mocker: MockerFixture):
+    _monotonic = mocker.patch(f"{MODULE}.time.monotonic", return_value=0.0)
+    return _monotonic
+
+
+def _summary(message: str, count: int, first: int, last: int) -> LogRecord:
+    return LogRecord(
+        timestamp=last,
+        message=(
+            f"{message}\n[repeated {count} times between "
+            f"{format_timestamp(first)} and {format_timestamp(last)}]"
+        ),
+    )
+
+
+def test_coalesce_consecutive_duplicates(mocked_monotonic):
+    _coalescer = LogCoalescer(WINDOW)
+
+    # the first log of a run is passed through
+    assert _coalescer.coalesce(KEY, LogRecord(timestamp=0, message="a")) == (
+        None,
+        False,
+    )
+    for _ts in range(1, 4):
+        assert _coalescer.coalesce(KEY, LogRecord(timestamp=_ts, message="a")) == (
+            None,
+            True,
+        )
+    # other streams are not affected
+    assert _coalescer.coalesce(
+        (LogGroupType.LOG, "sub"), LogRecord(timestamp=4, message="a")
+    ) == (None, False)
+
+    # a different log ends the run
+    assert _coalescer.coalesce(KEY, LogRecord(timestamp=5, message="b")) == (
+        (_summary("a", 3, 1, 3), 0),
+        False,
+    )
+    # no summary for a run without duplicates
+    assert _coalescer.coalesce(KEY, LogRecord(timestamp=6, message="a")) == (
+        None,
+        False,
+    )
+    assert _coalescer.coalesced == 3
+
+
+def test_window_expiry(mocked_monotonic):
+    _coalescer = LogCoalescer(WINDOW)
+    _coalescer.coalesce(KEY, LogRecord(timestamp=0, message="a"))
+    _coalescer.coalesce(KEY, LogRecord(timestamp=1, message="a"))
+
+    # the expired run ends, the duplicate starts a new run
+    mocked_monotonic.return_value = WINDOW
+    assert _coalescer.coalesce(KEY, LogRecord(timestamp=2, message="a")) == (
+        (_summary("a", 1, 1, 1), 0),
+        False,
+    )
+
+
+def test_summary_keeps_run_level(mocked_monotonic):
+    _coalescer = LogCoalescer(WINDOW)
+    for _ts in range(5):
+        _coalescer.coalesce(KEY, LogRecord(timestamp=_ts, message="a"), 5)
+
+    # the summary takes the level of its run, not of the log ending the run
+    assert _coalescer.coalesce(KEY, LogRecord(timestamp=5, message="b"), 2) == (
+        (_summary("a", 4, 1, 4), 5),
+        False,
+    )
+
+
+def test_flush_expired(mocked_monotonic):
+    _coalescer = LogCoalescer(WINDOW)
+    _coalescer.coalesce(KEY, LogRecord(timestamp=0, message="a"), 5)
+    _coalescer.coalesce(KEY, LogRecord(timestamp=1, message="a"), 5)
+    _coalescer.coalesce(KEY, LogRecord(timestamp=2, message="a"), 5)
+    mocked_monotonic.return_value = 1
+    _coalescer.coalesce(
+        (LogGroupType.LOG, "sub"), LogRecord(timestamp=3, message="a"), 5
+    )
+
+    assert _coalescer.flush_expired() == []
+    mocked_monotonic.return_value = WINDOW
+    assert _coalescer.flush_expired() == [(KEY, _summary("a", 2, 1, 2), 5)]
+    # the flushed run is removed, the run without duplicates emits nothing
+    mocked_monotonic.return_value = WINDOW + 1
+    assert _coalescer.flush_expired() == []
+    assert _coalescer.coalesce(KEY, LogRecord(timestamp=4, message="a")) == (
+        None,
+        False,
+    )
+
+
+@pytest.mark.parametrize("_window, _enabled", ((0, False), (1.5, True)))
+def test_create_log_coalescer(_window: float, _enabled: bool, mocker: MockerFixture):
+    mocker.patch(
+        f"{MODULE}.server_cfg",
+        server_cfg.model_copy(update={"COALESCE_WINDOW": _window}),
+    )
+    _coalescer = create_log_coalescer()
+    assert (_coalescer is not None) == _enabled
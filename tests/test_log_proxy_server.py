@@ -15,10 +15,15 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import gzip
+import json
 import logging
 import os
 import random
-from dataclasses import dataclass
+import stat
+from dataclasses import dataclass, replace
 from http import HTTPStatus
 from pathlib import Path
 from queue import Queue
@@ -30,18 +35,39 @@ import grpc
 import pytest
 import pytest_asyncio
 from aiohttp import web
+from aiohttp.compression_utils import HAS_ZSTD
+from aiohttp.test_utils import TestClient, TestServer
 from pytest_mock import MockerFixture
 
 import otaclient_iot_logging_server.log_proxy_server as log_server_module
-from otaclient_iot_logging_server._common import LogGroupType, LogsQueue
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord, LogsQueue
+from otaclient_iot_logging_server.backpressure import DrainRateMeter
+from otaclient_iot_logging_server.configs import ECURateLimit
 from otaclient_iot_logging_server.ecu_info import parse_ecu_info
-from otaclient_iot_logging_server.servicer import OTAClientIoTLoggingServerServicer
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
+from otaclient_iot_logging_server.log_coalescer import LogCoalescer
+from otaclient_iot_logging_server.rate_limiter import ECURateLimiter
+from otaclient_iot_logging_server.servicer import (
+    BACKLOG_FILL_RATIO_HEADER,
+    OTAClientIoTLoggingServerServicer,
+)
 from otaclient_iot_logging_server.v1 import _types
 from otaclient_iot_logging_server.v1 import otaclient_iot_logging_server_v1_pb2 as pb2
 from otaclient_iot_logging_server.v1 import (
     otaclient_iot_logging_server_v1_pb2_grpc as v1_grpc,
 )
-from otaclient_iot_logging_server.v1.api_stub import OTAClientIoTLoggingServiceV1
+from otaclient_iot_logging_server.v1.api_stub import (
+    OTAClientIoTLoggingServiceV1,
+    OTAClientIoTLoggingServiceV1FastPath,
+)
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +83,14 @@ class _ServerConfig:
     LISTEN_PORT: int = 8083
     # In github actions, the port 8084 is already used by mono process.
     LISTEN_PORT_GRPC: int = 8085
+    ENABLE_TCP_LISTENER: bool = True
+    LISTEN_UNIX_SOCKET: str = ""
+    LISTEN_UNIX_SOCKET_GRPC: str = ""
+    LISTEN_UNIX_SOCKET_MODE: int = 0o660
+    GRPC_FAST_PATH: bool = True
+    GRPC_COMPRESSION: str = "none"
+    HTTP_MAX_BODY_SIZE: int = 1024**2
+    USE_UVLOOP: bool = False
     ECU_INFO_YAML: Path = TEST_DIR / "ecu_info.yaml"
     # remember to disable config file monitor
     EXIT_ON_CONFIG_FILE_CHANGED: bool = False
@@ -102,6 +136,8 @@ class TestLogProxyServer:
         f"{_test_server_cfg.LISTEN_ADDRESS}:{_test_server_cfg.LISTEN_PORT_GRPC}"
     )
     TOTAL_MSG_NUM = 4096
+    STREAM_ACK_LOGS_NUM = 1000
+    BULK_MAX_BODY_SIZE = 1024**2
 
     @pytest.fixture(autouse=True)
     def mock_ecu_info(self, mocker: MockerFixture):
@@ -120,14 +156,21 @@ class TestLogProxyServer:
         self._queue = queue
 
         handler = OTAClientIoTLoggingServerServicer(
-            ecu_info=self._ecu_info, queue=queue
+            ecu_info=self._ecu_info,
+            queue=queue,
+            bulk_max_body_size=self.BULK_MAX_BODY_SIZE,
         )
         app = web.Application()
         # mute the aiohttp server logging
         aiohttp_server_logger = logging.getLogger("aiohttp")
         aiohttp_server_logger.setLevel("ERROR")
         # add handler to the server
-        app.add_routes([web.post(r"/{ecu_id}", handler.http_put_log)])
+        app.add_routes(
+            [
+                web.post(r"/{ecu_id}", handler.http_put_log),
+                web.post(r"/{ecu_id}/bulk", handler.http_put_logs_bulk),
+            ]
+        )
         # star the server
         runner = web.AppRunner(app)
         try:
@@ -152,8 +195,10 @@ class TestLogProxyServer:
         finally:
             await client_session.close()
 
-    @pytest_asyncio.fixture
-    async def launch_grpc_server(self, mocker: MockerFixture, mock_ecu_info):
+    @pytest_asyncio.fixture(
+        params=[OTAClientIoTLoggingServiceV1, OTAClientIoTLoggingServiceV1FastPath]
+    )
+    async def launch_grpc_server(self, request, mocker: MockerFixture, mock_ecu_info):
         mocker.patch(f"{MODULE}.server_cfg", _test_server_cfg)
 
         queue: LogsQueue = Queue()
@@ -162,11 +207,12 @@ class TestLogProxyServer:
         servicer = OTAClientIoTLoggingServerServicer(
             ecu_info=self._ecu_info,
             queue=queue,
+            stream_ack_logs_num=self.STREAM_ACK_LOGS_NUM,
         )
 
         server = grpc.aio.server()
         v1_grpc.add_OTAClientIoTLoggingServiceServicer_to_server(
-            servicer=OTAClientIoTLoggingServiceV1(servicer), server=server
+            servicer=request.param(servicer), server=server
         )
         server.add_insecure_port(self.SERVER_URL_GRPC)
         try:
@@ -200,7 +246,7 @@ class TestLogProxyServer:
             # always log type is LOG in HTTP
             assert _log_group_type == LogGroupType.LOG
             assert _ecu_id == item.ecu_id
-            assert _log_msg["message"] == item.message
+            assert _log_msg.message == item.message
         assert self._queue.empty()
 
     @pytest.mark.parametrize(
@@ -225,6 +271,169 @@ class TestLogProxyServer:
                 pass  # raise_for_status is set on session
         assert exc_info.value.status == HTTPStatus.BAD_REQUEST
 
+    async def test_http_server_bulk(
+        self,
+        launch_http_server,
+        http_client_sesion: aiohttp.ClientSession,
+    ):
+        # ------ execution ------ #
+        _msgs_by_ecu: dict[str, list[MessageEntry]] = {}
+        for item in self._msgs:
+            _msgs_by_ecu.setdefault(item.ecu_id, []).append(item)
+
+        for _ecu_id, _items in _msgs_by_ecu.items():
+            _body = "\n".join(
+                json.dumps(
+                    {
+                        "log_type": item.log_type.name,
+                        "timestamp": item.timestamp,
+                        "level": item.level.name,
+                        "message": item.message,
+                    }
+                )
+                for item in _items
+            )
+            _log_upload_endpoint_url = urljoin(self.SERVER_URL, f"{_ecu_id}/bulk")
+            async with http_client_sesion.post(
+                _log_upload_endpoint_url, data=_body
+            ) as _resp:
+                assert await _resp.json() == {"accepted": len(_items), "dropped": 0}
+
+        # ------ check result ------ #
+        for _ecu_id, _items in _msgs_by_ecu.items():
+            for item in _items:
+                _log_group_type, _ecu_id, _log_msg = self._queue.get_nowait()
+                assert _ecu_id == item.ecu_id
+                assert _log_group_type == (
+                    LogGroupType.METRICS
+                    if item.log_type == _types.LogType.METRICS
+                    else LogGroupType.LOG
+                )
+                assert _log_msg.timestamp == item.timestamp
+                assert _log_msg.message == item.message
+        assert self._queue.empty()
+
+    async def test_http_bulk_drop_malformed_records(
+        self,
+        launch_http_server,
+        http_client_sesion: aiohttp.ClientSession,
+    ):
+        _body = "\n".join(
+            [
+                json.dumps({"message": "valid_msg"}),
+                "not a json",
+                json.dumps({"message": "valid_msg", "log_type": "BAD_TYPE"}),
+                json.dumps({"message": ""}),
+                json.dumps({"message": "valid_msg", "log_type": 1, "level": 3}),
+            ]
+        )
+        _log_upload_endpoint_url = urljoin(self.SERVER_URL, "main/bulk")
+        async with http_client_sesion.post(
+            _log_upload_endpoint_url, data=_body
+        ) as _resp:
+            assert await _resp.json() == {"accepted": 2, "dropped": 3}
+
+        _log_group_type, _, _ = self._queue.get_nowait()
+        assert _log_group_type == LogGroupType.LOG
+        _log_group_type, _, _ = self._queue.get_nowait()
+        assert _log_group_type == LogGroupType.METRICS
+        assert self._queue.empty()
+
+    @pytest.mark.parametrize(
+        "_encoding",
+        [
+            "gzip",
+            pytest.param(
+                "zstd",
+                marks=pytest.mark.skipif(not HAS_ZSTD, reason="zstd not supported"),
+            ),
+        ],
+    )
+    async def test_http_bulk_compressed_body(
+        self,
+        _encoding: str,
+        launch_http_server,
+        http_client_sesion: aiohttp.ClientSession,
+    ):
+        _items = [item for item in self._msgs if item.ecu_id == "main"]
+        _body = "\n".join(json.dumps({"message": item.message}) for item in _items)
+        if _encoding == "gzip":
+            _compressed = gzip.compress(_body.encode())
+        else:
+            _compressed = zstd.compress(_body.encode())
+        assert len(_compressed) < len(_body)
+
+        _log_upload_endpoint_url = urljoin(self.SERVER_URL, "main/bulk")
+        async with http_client_sesion.post(
+            _log_upload_endpoint_url,
+            data=_compressed,
+            headers={"Content-Encoding": _encoding},
+        ) as _resp:
+            assert await _resp.json() == {"accepted": len(_items), "dropped": 0}
+
+        for item in _items:
+            _, _ecu_id, _log_msg = self._queue.get_nowait()
+            assert _log_msg.message == item.message
+        assert self._queue.empty()
+
+    @pytest.mark.parametrize(
+        "_url_path, _headers, _data, _expected_status",
+        [
+            # bad compressed body
+            (
+                "main",
+                {"Content-Encoding": "gzip"},
+                b"not a gzip body",
+                HTTPStatus.BAD_REQUEST,
+            ),
+            (
+                "main/bulk",
+                {"Content-Encoding": "gzip"},
+                b"not a gzip body",
+                HTTPStatus.BAD_REQUEST,
+            ),
+            # decoded body exceeds size limit
+            (
+                "main/bulk",
+                {"Content-Encoding": "gzip"},
+                gzip.compress(
+                    (json.dumps({"message": "a" * 1024}) + "\n").encode() * 2048
+                ),
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            ),
+        ],
+    )
+    async def test_http_reject_bad_body(
+        self,
+        _url_path: str,
+        _headers: dict[str, str],
+        _data: bytes,
+        _expected_status: HTTPStatus,
+        launch_http_server,
+    ):
+        async with aiohttp.ClientSession() as session:
+            _log_upload_endpoint_url = urljoin(self.SERVER_URL, _url_path)
+            with contextlib.suppress(aiohttp.ClientError):
+                async with session.post(
+                    _log_upload_endpoint_url, data=_data, headers=_headers
+                ) as _resp:
+                    assert _resp.status == _expected_status
+                    return
+        pytest.fail("failed to get the response")
+
+    async def test_http_bulk_reject_invalid_ecu_id(
+        self,
+        launch_http_server,
+        http_client_sesion: aiohttp.ClientSession,
+    ):
+        with pytest.raises(aiohttp.client_exceptions.ClientResponseError) as exc_info:
+            _log_upload_endpoint_url = urljoin(self.SERVER_URL, "bad_ecu_id/bulk")
+            async with http_client_sesion.post(
+                _log_upload_endpoint_url, data=json.dumps({"message": "valid_msg"})
+            ):
+                pass  # raise_for_status is set on session
+        assert exc_info.value.status == HTTPStatus.BAD_REQUEST
+
     @pytest.mark.parametrize(
         "_service",
         ["", "OTAClientIoTLoggingService"],
@@ -273,9 +482,25 @@ class TestLogProxyServer:
             assert _log_group_type == convert_from_log_type_to_log_group_type(
                 item.log_type
             )
-            assert _log_msg["message"] == item.message
+            assert _log_msg.message == item.message
         assert self._queue.empty()
 
+    async def test_grpc_server_put_logs_compressed(self, launch_grpc_server):
+        _req = pb2.PutLogsRequest(
+            logs=[
+                pb2.PutLogRequest(ecu_id=item.ecu_id, message=item.message)
+                for item in self._msgs
+            ]
+        )
+        async with grpc.aio.insecure_channel(
+            self.SERVER_URL_GRPC, compression=grpc.Compression.Gzip
+        ) as channel:
+            stub = v1_grpc.OTAClientIoTLoggingServiceStub(channel)
+            _response = await stub.PutLogs(_req)
+            assert _response.code == pb2.ErrorCode.NO_FAILURE
+            assert _response.accepted == self.TOTAL_MSG_NUM
+        assert self._queue.qsize() == self.TOTAL_MSG_NUM
+
     async def test_gprc_reject_invalid_ecu_id(
         self,
         launch_grpc_server,
@@ -298,3 +523,421 @@ class TestLogProxyServer:
             stub = v1_grpc.OTAClientIoTLoggingServiceStub(channel)
             _response = await stub.PutLog(_req)
             assert _response.code == pb2.ErrorCode.NO_MESSAGE
+
+    async def test_grpc_server_put_logs(self, launch_grpc_server):
+        # ------ execution ------ #
+        _batch_size = 512
+        logger.info(
+            f"sending {self.TOTAL_MSG_NUM} msgs in batches of {_batch_size} "
+            f"to {self.SERVER_URL_GRPC}..."
+        )
+        async with grpc.aio.insecure_channel(self.SERVER_URL_GRPC) as channel:
+            stub = v1_grpc.OTAClientIoTLoggingServiceStub(channel)
+            for _idx in range(0, self.TOTAL_MSG_NUM, _batch_size):
+                _req = pb2.PutLogsRequest(
+                    logs=[
+                        pb2.PutLogRequest(
+                            ecu_id=item.ecu_id,
+                            log_type=item.log_type,
+                            timestamp=item.timestamp,
+                            level=item.level,
+                            message=item.message,
+                        )
+                        for item in self._msgs[_idx : _idx + _batch_size]
+                    ]
+                )
+                _response = await stub.PutLogs(_req)
+                assert _response.code == pb2.ErrorCode.NO_FAILURE
+                assert _response.accepted == len(_req.logs)
+                assert list(_response.codes) == [pb2.ErrorCode.NO_FAILURE] * len(
+                    _req.logs
+                )
+
+        # ------ check result ------ #
+        for item in self._msgs:
+            _log_group_type, _ecu_id, _log_msg = self._queue.get_nowait()
+            assert _ecu_id == item.ecu_id
+            assert _log_group_type == (
+                LogGroupType.METRICS
+                if item.log_type == _types.LogType.METRICS
+                else LogGroupType.LOG
+            )
+            assert _log_msg.timestamp == item.timestamp
+            assert _log_msg.message == item.message
+        assert self._queue.empty()
+
+    async def test_grpc_put_logs_partial_failure(self, launch_grpc_server):
+        _req = pb2.PutLogsRequest(
+            logs=[
+                pb2.PutLogRequest(ecu_id="main", message="valid_msg"),
+                pb2.PutLogRequest(ecu_id="bad_ecu_id", message="valid_msg"),
+                pb2.PutLogRequest(ecu_id="sub1", message=""),
+                pb2.PutLogRequest(ecu_id="sub2", message="valid_msg"),
+            ]
+        )
+        async with grpc.aio.insecure_channel(self.SERVER_URL_GRPC) as channel:
+            stub = v1_grpc.OTAClientIoTLoggingServiceStub(channel)
+            _response = await stub.PutLogs(_req)
+
+        assert _response.code == pb2.ErrorCode.NOT_ALLOWED_ECU_ID
+        assert _response.accepted == 2
+        assert list(_response.codes) == [
+            pb2.ErrorCode.NO_FAILURE,
+            pb2.ErrorCode.NOT_ALLOWED_ECU_ID,
+            pb2.ErrorCode.NO_MESSAGE,
+            pb2.ErrorCode.NO_FAILURE,
+        ]
+        assert self._queue.qsize() == 2
+
+    async def test_grpc_put_logs_empty_batch(self, launch_grpc_server):
+        async with grpc.aio.insecure_channel(self.SERVER_URL_GRPC) as channel:
+            stub = v1_grpc.OTAClientIoTLoggingServiceStub(channel)
+            _response = await stub.PutLogs(pb2.PutLogsRequest())
+        assert _response.code == pb2.ErrorCode.NO_MESSAGE
+        assert _response.accepted == 0
+
+    async def test_grpc_server_stream_logs(self, launch_grpc_server):
+        # ------ execution ------ #
+        logger.info(f"streaming {self.TOTAL_MSG_NUM} msgs to {self.SERVER_URL_GRPC}...")
+
+        async def _request_iterator():
+            for item in self._msgs:
+                yield pb2.PutLogRequest(
+                    ecu_id=item.ecu_id,
+                    log_type=item.log_type,
+                    timestamp=item.timestamp,
+                    level=item.level,
+                    message=item.message,
+                )
+            # the following two entries will be dropped
+            yield pb2.PutLogRequest(ecu_id="bad_ecu_id", message="valid_msg")
+            yield pb2.PutLogRequest(ecu_id="main", message="")
+
+        async with grpc.aio.insecure_channel(self.SERVER_URL_GRPC) as channel:
+            stub = v1_grpc.OTAClientIoTLoggingServiceStub(channel)
+            _acks = [_ack async for _ack in stub.StreamLogs(_request_iterator())]
+
+        # ------ check result ------ #
+        # periodical acks + the final ack
+        assert len(_acks) == (self.TOTAL_MSG_NUM + 2) // self.STREAM_ACK_LOGS_NUM + 1
+        _accepted_list = [_ack.accepted for _ack in _acks]
+        assert _accepted_list == sorted(_accepted_list)
+
+        _final_ack = _acks[-1]
+        assert _final_ack.accepted == self.TOTAL_MSG_NUM
+        assert _final_ack.dropped == 2
+        assert _final_ack.code == pb2.ErrorCode.NO_MESSAGE
+
+        for item in self._msgs:
+            _log_group_type, _ecu_id, _log_msg = self._queue.get_nowait()
+            assert _ecu_id == item.ecu_id
+            assert _log_msg.message == item.message
+        assert self._queue.empty()
+
+
+class TestUnixSocketListener:
+    @pytest.fixture(autouse=True)
+    def setup_test(self, tmp_path: Path, mocker: MockerFixture):
+        self._http_socket = str(tmp_path / "run" / "http.sock")
+        self._grpc_socket = str(tmp_path / "run" / "grpc.sock")
+        mocker.patch(
+            f"{MODULE}.server_cfg",
+            replace(
+                _test_server_cfg,
+                ENABLE_TCP_LISTENER=False,
+                LISTEN_UNIX_SOCKET=self._http_socket,
+                LISTEN_UNIX_SOCKET_GRPC=self._grpc_socket,
+                LISTEN_UNIX_SOCKET_MODE=0o600,
+            ),
+        )
+        self._queue: LogsQueue = Queue()
+        self._handler = OTAClientIoTLoggingServerServicer(queue=self._queue)
+
+    async def test_http_server_on_unix_socket(self):
+        await log_server_module._start_http_server(self._handler)
+        assert stat.S_IMODE(os.stat(self._http_socket).st_mode) == 0o600
+
+        async with aiohttp.ClientSession(
+            connector=aiohttp.UnixConnector(path=self._http_socket),
+            raise_for_status=True,
+        ) as session:
+            async with session.post("http://localhost/main", data="valid_msg"):
+                pass
+
+        _log_group_type, _ecu_id, _log_msg = self._queue.get_nowait()
+        assert _ecu_id == "main"
+        assert _log_msg.message == "valid_msg"
+
+    async def test_grpc_server_on_unix_socket(self):
+        _server_task = asyncio.create_task(
+            log_server_module._start_grpc_server(self._handler)
+        )
+        try:
+            async with grpc.aio.insecure_channel(
+                f"unix:{self._grpc_socket}"
+            ) as channel:
+                stub = v1_grpc.OTAClientIoTLoggingServiceStub(channel)
+                _response = await stub.PutLog(
+                    pb2.PutLogRequest(ecu_id="main", message="valid_msg"),
+                    wait_for_ready=True,
+                )
+                assert _response.code == pb2.ErrorCode.NO_FAILURE
+            assert stat.S_IMODE(os.stat(self._grpc_socket).st_mode) == 0o600
+        finally:
+            _server_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await _server_task
+
+        _log_group_type, _ecu_id, _log_msg = self._queue.get_nowait()
+        assert _ecu_id == "main"
+        assert _log_msg.message == "valid_msg"
+
+
+def test_put_logs_reject_remaining_on_queue_full():
+    queue: LogsQueue = Queue(maxsize=2)
+    servicer = OTAClientIoTLoggingServerServicer(queue=queue)
+
+    _res = servicer._put_logs(
+        [
+            _types.PutLogRequest(ecu_id="main", message=f"msg_{_idx}")
+            for _idx in range(4)
+        ]
+    )
+    assert _res == [
+        _types.ErrorCode.NO_FAILURE,
+        _types.ErrorCode.NO_FAILURE,
+        _types.ErrorCode.SERVER_QUEUE_FULL,
+        _types.ErrorCode.SERVER_QUEUE_FULL,
+    ]
+    assert queue.qsize() == 2
+
+
+def test_put_logs_coalesce_duplicates():
+    queue: LogsQueue = Queue()
+    servicer = OTAClientIoTLoggingServerServicer(
+        queue=queue, coalescer=LogCoalescer(window=60)
+    )
+
+    _messages = ["retry"] * 100 + ["done"]
+    _res = servicer._put_logs(
+        [
+            _types.PutLogRequest(ecu_id="main", timestamp=_idx + 1, message=_msg)
+            for _idx, _msg in enumerate(_messages)
+        ]
+    )
+    assert _res == [_types.ErrorCode.NO_FAILURE] * len(_messages)
+
+    # the first log, the summary of the duplicates, then the next log
+    _records = [queue.get_nowait()[2] for _ in range(queue.qsize())]
+    assert len(_records) == 3
+    assert _records[0] == LogRecord(timestamp=1, message="retry")
+    assert _records[1].timestamp == 100
+    assert _records[1].message.startswith("retry\n[repeated 99 times between")
+    assert _records[2] == LogRecord(timestamp=101, message="done")
+
+
+def test_put_logs_coalesced_summary_lane():
+    queue = LogsBacklog(maxsize=3, max_bytes=1024**2)
+    servicer = OTAClientIoTLoggingServerServicer(
+        queue=queue, coalescer=LogCoalescer(window=60)
+    )
+
+    _requests = [
+        _types.PutLogRequest(
+            ecu_id="main",
+            timestamp=_idx + 1,
+            level=_types.LogLevel.ERROR,
+            message="disk failure",
+        )
+        for _idx in range(5)
+    ]
+    _requests += [
+        _types.PutLogRequest(
+            ecu_id="main", timestamp=6, level=_types.LogLevel.DEBUG, message="debug"
+        ),
+        _types.PutLogRequest(
+            ecu_id="main", timestamp=7, level=_types.LogLevel.INFO, message="info"
+        ),
+    ]
+    servicer._put_logs(_requests)
+
+    # the summary of the ERROR run is kept in the ERROR lane, so the INFO log
+    #   evicts the DEBUG log instead of the summary
+    assert queue.evicted == 1
+    _records = [queue.get_nowait()[2] for _ in range(queue.qsize())]
+    assert [_record.timestamp for _record in _records] == [1, 5, 7]
+    assert _records[1].message.startswith("disk failure\n[repeated 4 times")
+
+
+def test_put_logs_priority_lanes_on_queue_full():
+    queue = LogsBacklog(maxsize=2, max_bytes=1024**2)
+    servicer = OTAClientIoTLoggingServerServicer(queue=queue)
+
+    _levels = (
+        _types.LogLevel.DEBUG,
+        _types.LogLevel.INFO,
+        _types.LogLevel.DEBUG,
+        _types.LogLevel.ERROR,
+        _types.LogLevel.INFO,
+    )
+    _res = servicer._put_logs(
+        [
+            _types.PutLogRequest(ecu_id="main", level=_level, message=f"msg_{_idx}")
+            for _idx, _level in enumerate(_levels)
+        ]
+    )
+    # the ERROR entry evicts the DEBUG entry, the lower entries are rejected
+    assert _res == [
+        _types.ErrorCode.NO_FAILURE,
+        _types.ErrorCode.NO_FAILURE,
+        _types.ErrorCode.SERVER_QUEUE_FULL,
+        _types.ErrorCode.NO_FAILURE,
+        _types.ErrorCode.SERVER_QUEUE_FULL,
+    ]
+    assert queue.evicted == 1
+    assert [queue.get_nowait()[2].message for _ in range(2)] == ["msg_3", "msg_1"]
+
+
+@pytest.mark.parametrize("use_uvloop", (True, False))
+def test_new_event_loop(use_uvloop: bool, mocker: MockerFixture):
+    mocker.patch(
+        f"{MODULE}.server_cfg", replace(_test_server_cfg, USE_UVLOOP=use_uvloop)
+    )
+    uvloop = pytest.importorskip("uvloop")
+
+    loop = log_server_module._new_event_loop()
+    try:
+        assert isinstance(loop, uvloop.Loop) == use_uvloop
+    finally:
+        loop.close()
+
+
+def test_new_event_loop_fallback_without_uvloop(mocker: MockerFixture):
+    mocker.patch(f"{MODULE}.server_cfg", replace(_test_server_cfg, USE_UVLOOP=True))
+    # NOTE: None in sys.modules makes the import raise ImportError
+    mocker.patch.dict("sys.modules", {"uvloop": None})
+
+    loop = log_server_module._new_event_loop()
+    try:
+        assert isinstance(loop, asyncio.BaseEventLoop)
+    finally:
+        loop.close()
+
+
+class TestBackpressure:
+    MAX_BACKLOG = 4
+    DRAIN_RATE = 2  # logs per second
+
+    @pytest.fixture(autouse=True)
+    def setup_servicer(self):
+        self._queue: LogsQueue = Queue(maxsize=self.MAX_BACKLOG)
+        self._servicer = OTAClientIoTLoggingServerServicer(
+            queue=self._queue,
+            max_backlog=self.MAX_BACKLOG,
+            drain_rate_meter=DrainRateMeter(initial_rate=self.DRAIN_RATE),
+        )
+
+    @pytest.mark.parametrize(
+        "service_type",
+        (OTAClientIoTLoggingServiceV1, OTAClientIoTLoggingServiceV1FastPath),
+    )
+    async def test_grpc_put_log(self, service_type):
+        service = service_type(self._servicer)
+        request = pb2.PutLogRequest(ecu_id="main", message="valid_msg")
+
+        for _idx in range(self.MAX_BACKLOG):
+            _response = await service.PutLog(request, None)
+            assert _response.code == pb2.ErrorCode.NO_FAILURE
+            assert _response.retry_after_ms == 0
+            assert _response.backlog_fill_ratio == pytest.approx(
+                (_idx + 1) / self.MAX_BACKLOG
+            )
+
+        _response = await service.PutLog(request, None)
+        assert _response.code == pb2.ErrorCode.SERVER_QUEUE_FULL
+        assert _response.backlog_fill_ratio == pytest.approx(1)
+        # drain half of the backlog with drain rate 2 logs/s
+        assert _response.retry_after_ms == 1000
+
+    async def test_grpc_put_logs(self):
+        _response = self._servicer.grpc_put_logs(
+            _types.PutLogsRequest(
+                logs=[
+                    _types.PutLogRequest(ecu_id="main", message=f"msg_{_idx}")
+                    for _idx in range(self.MAX_BACKLOG + 1)
+                ]
+            )
+        )
+        assert _response.accepted == self.MAX_BACKLOG
+        assert _response.retry_after_ms == 1000
+        assert _response.backlog_fill_ratio == pytest.approx(1)
+
+    async def test_http_put_log(self):
+        app = web.Application()
+        app.add_routes([web.post(r"/{ecu_id}", self._servicer.http_put_log)])
+
+        async with TestClient(TestServer(app)) as client:
+            for _idx in range(self.MAX_BACKLOG):
+                _resp = await client.post("/main", data="valid_msg")
+                assert _resp.status == HTTPStatus.OK
+                assert "Retry-After" not in _resp.headers
+                assert float(_resp.headers[BACKLOG_FILL_RATIO_HEADER]) == (
+                    pytest.approx((_idx + 1) / self.MAX_BACKLOG)
+                )
+
+            _resp = await client.post("/main", data="valid_msg")
+            assert _resp.status == HTTPStatus.SERVICE_UNAVAILABLE
+            assert _resp.headers["Retry-After"] == "1"
+            assert float(_resp.headers[BACKLOG_FILL_RATIO_HEADER]) == 1
+
+
+class TestECURateLimit:
+    BURST = 4
+
+    @pytest.fixture(autouse=True)
+    def setup_servicer(self, mocker: MockerFixture):
+        # freeze the time to prevent refilling
+        mocker.patch(
+            "otaclient_iot_logging_server.rate_limiter.time.monotonic", return_value=0
+        )
+        self._queue: LogsQueue = Queue()
+        self._servicer = OTAClientIoTLoggingServerServicer(
+            ecu_info=parse_ecu_info(TEST_DIR / "ecu_info.yaml"),
+            queue=self._queue,
+            rate_limiter=ECURateLimiter(ECURateLimit(rate=1, burst=self.BURST)),
+        )
+
+    def test_grpc_put_logs(self):
+        _response = self._servicer.grpc_put_logs(
+            _types.PutLogsRequest(
+                logs=[
+                    _types.PutLogRequest(ecu_id=_ecu_id, message="valid_msg")
+                    for _ecu_id in ("main", "sub1")
+                    for _ in range(self.BURST + 1)
+                ]
+            )
+        )
+        # the noisy ECU doesn't affect the other ECUs
+        assert _response.accepted == self.BURST * 2
+        assert (
+            list(_response.codes)
+            == (
+                [_types.ErrorCode.NO_FAILURE] * self.BURST
+                + [_types.ErrorCode.ECU_RATE_LIMITED]
+            )
+            * 2
+        )
+        assert self._servicer._rate_limiter.rejected == {"main": 1, "sub1": 1}
+
+    async def test_http_put_log(self):
+        app = web.Application()
+        app.add_routes([web.post(r"/{ecu_id}", self._servicer.http_put_log)])
+
+        async with TestClient(TestServer(app)) as client:
+            for _ in range(self.BURST):
+                _resp = await client.post("/main", data="valid_msg")
+                assert _resp.status == HTTPStatus.OK
+
+            _resp = await client.post("/main", data="valid_msg")
+            assert _resp.status == HTTPStatus.TOO_MANY_REQUESTS
+        assert self._queue.qsize() == self.BURST
@@ -0,0 +1,255 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from pathlib import Path
+from queue import Empty, Full
+
+import pytest
+from pytest_mock import MockerFixture
+
+import otaclient_iot_logging_server.log_spool as log_spool_module
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+from otaclient_iot_logging_server._log_setting import _LogTeeHandler
+from otaclient_iot_logging_server.log_spool import SEGMENT_SUFFIX, LogsSpool
+
+
+def _entry(idx: int) -> tuple[LogGroupType, str, LogRecord]:
+    return (
+        LogGroupType.METRICS if idx % 2 else LogGroupType.LOG,
+        f"ecu_{idx % 3}",
+        LogRecord(timestamp=idx, message=f"msg_{idx}\nwith multiple lines"),
+    )
+
+
+def _drain(spool: LogsSpool) -> list[tuple[LogGroupType, str, LogRecord]]:
+    _res = []
+    while True:
+        try:
+            _res.append(spool.get_nowait())
+        except Empty:
+            return _res
+
+
+@pytest.fixture
+def spool_dir(tmp_path: Path) -> Path:
+    return tmp_path / "spool"
+
+
+def test_put_and_get(spool_dir: Path):
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2)
+    _entries = [_entry(_idx) for _idx in range(32)]
+    for _item in _entries:
+        _spool.put_nowait(_item)
+    assert _spool.qsize() == 32
+
+    assert _drain(_spool) == _entries
+    assert _spool.empty()
+
+
+def test_replay_uncommitted_entries(spool_dir: Path):
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2)
+    _entries = [_entry(_idx) for _idx in range(32)]
+    for _item in _entries:
+        _spool.put_nowait(_item)
+    for _ in range(10):
+        _spool.get_nowait()
+    _spool.commit(8)
+    _spool.close()
+
+    # entries after the checkpoint are replayed on restart
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2)
+    assert _spool.qsize() == 24
+    assert _drain(_spool) == _entries[8:]
+
+
+def test_commit_nothing_not_saving_checkpoint(spool_dir: Path, mocker: MockerFixture):
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2, fsync_interval=0.01)
+    _save_checkpoint = mocker.spy(_spool, "_save_checkpoint")
+    _spool.put_nowait(_entry(0))
+    _spool.get_nowait()
+
+    _spool.commit(0)
+    time.sleep(0.1)
+    _save_checkpoint.assert_not_called()
+    _spool.commit(1)
+    time.sleep(0.1)
+    _save_checkpoint.assert_called_once()
+
+
+def test_rollback(spool_dir: Path):
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2)
+    _entries = [_entry(_idx) for _idx in range(8)]
+    for _item in _entries:
+        _spool.put_nowait(_item)
+
+    for _ in range(2):
+        _spool.get_nowait()
+    _spool.commit(2)
+    for _ in range(4):
+        _spool.get_nowait()
+    _spool.rollback()
+
+    assert _spool.qsize() == 6
+    assert _drain(_spool) == _entries[2:]
+
+
+def test_segments_rotation_and_removal(spool_dir: Path):
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2, segment_size=256)
+    _entries = [_entry(_idx) for _idx in range(64)]
+    for _item in _entries:
+        _spool.put_nowait(_item)
+    assert len(list(spool_dir.glob(f"*{SEGMENT_SUFFIX}"))) > 4
+
+    assert _drain(_spool) == _entries
+    _spool.commit(64)
+    _spool.close()
+    # only the last segment remains
+    assert len(list(spool_dir.glob(f"*{SEGMENT_SUFFIX}"))) == 1
+
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2, segment_size=256)
+    assert _spool.empty()
+
+
+def test_disk_quota(spool_dir: Path):
+    _spool = LogsSpool(spool_dir, max_bytes=1024, segment_size=256)
+    with pytest.raises(Full):
+        for _idx in range(1024):
+            _spool.put_nowait(_entry(_idx))
+    assert _spool.fill_ratio() > 0.9
+
+    # quota is released after entries are committed
+    _drain(_spool)
+    _spool.commit(_idx)
+    _spool.close()
+    assert _spool.fill_ratio() < 0.5
+    _spool.put_nowait(_entry(0))
+
+
+def test_put_many(spool_dir: Path):
+    _spool = LogsSpool(spool_dir, max_bytes=1024, segment_size=256)
+    _entries = [_entry(_idx) for _idx in range(1024)]
+
+    # entries are appended in order until the disk quota is used up
+    _accepted = _spool.put_many(_entries)
+    assert 0 < _accepted < len(_entries)
+    assert _spool.qsize() == _accepted
+    assert _drain(_spool) == _entries[:_accepted]
+
+
+def test_put_back_over_quota(spool_dir: Path):
+    _spool = LogsSpool(spool_dir, max_bytes=1024, segment_size=256)
+    _entries = [_entry(_idx) for _idx in range(1024)]
+    _accepted = _spool.put_many(_entries)
+
+    # the read entries are put back even when the disk quota is used up
+    _read = _drain(_spool)
+    _spool.put_back(_read)
+    _spool.commit(_accepted)
+    assert _drain(_spool) == _entries[:_accepted]
+
+
+def test_drop_truncated_entry_on_replay(spool_dir: Path):
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2)
+    for _idx in range(4):
+        _spool.put_nowait(_entry(_idx))
+    _spool.close()
+
+    # simulate power loss during writing the last entry
+    (_segment,) = spool_dir.glob(f"*{SEGMENT_SUFFIX}")
+    _segment.write_bytes(_segment.read_bytes()[:-8])
+
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2)
+    assert _spool.qsize() == 3
+    _spool.put_nowait(_entry(4))
+    assert _drain(_spool) == [_entry(_idx) for _idx in (0, 1, 2, 4)]
+
+
+def test_commit_and_rollback_after_corrupted_entry(spool_dir: Path):
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2)
+    _entries = [_entry(_idx) for _idx in range(6)]
+    for _item in _entries:
+        _spool.put_nowait(_item)
+    _spool.close()
+    (_segment,) = spool_dir.glob(f"*{SEGMENT_SUFFIX}")
+    _lines = _segment.read_bytes().splitlines(keepends=True)
+    _segment.write_bytes(
+        b"".join([b"garbage\n", *_lines[:3], b"garbage\n", *_lines[3:]])
+    )
+
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2)
+    assert _drain(_spool) == _entries
+    _spool.commit(4)
+    # the corrupted lines are committed along with the read entries
+    _spool.rollback()
+    assert _spool.qsize() == 2
+    assert _drain(_spool) == _entries[4:]
+    _spool.commit(2)
+    _spool.rollback()
+    assert _drain(_spool) == []
+
+
+def test_log_corrupted_entry_into_spool(spool_dir: Path):
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2)
+    _spool.put_nowait(_entry(0))
+    _spool.close()
+    (_segment,) = spool_dir.glob(f"*{SEGMENT_SUFFIX}")
+    _segment.write_bytes(b"garbage\n" + _segment.read_bytes())
+
+    # server logs are uploaded via the same spool
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2)
+    _handler = _LogTeeHandler(_spool, "server", flush_size=1)
+    _logger = logging.getLogger(log_spool_module.__name__)
+    _logger.addHandler(_handler)
+    try:
+        _res = []
+        _reader = threading.Thread(target=lambda: _res.append(_spool.get_nowait()))
+        _reader.start()
+        _reader.join(timeout=3)
+        assert not _reader.is_alive()
+    finally:
+        _logger.removeHandler(_handler)
+        _handler.close()
+
+    assert _res == [_entry(0)]
+    (_, _suffix, _log_msg) = _spool.get_nowait()
+    assert _suffix == "server"
+    assert "drop corrupted entry" in _log_msg.message
+
+
+def test_fsync_not_blocking_put(spool_dir: Path, mocker: MockerFixture):
+    _fsync_started, _fsync_released = threading.Event(), threading.Event()
+
+    def _slow_fsync(_fd: int) -> None:
+        _fsync_started.set()
+        _fsync_released.wait(3)
+
+    mocker.patch(f"{log_spool_module.__name__}.os.fsync", _slow_fsync)
+    _spool = LogsSpool(spool_dir, max_bytes=1024**2, segment_size=256, fsync_batch=1)
+    _entries = [_entry(_idx) for _idx in range(64)]
+    _spool.put_nowait(_entries[0])
+    assert _fsync_started.wait(3)
+
+    # puts(including the segments rotation) don't wait for the ongoing fsync
+    _start = time.monotonic()
+    for _item in _entries[1:]:
+        _spool.put_nowait(_item)
+    assert time.monotonic() - _start < 1
+    _fsync_released.set()
+    assert _drain(_spool) == _entries
@@ -0,0 +1,91 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+import otaclient_iot_logging_server.rate_limiter as rate_limiter_module
+from otaclient_iot_logging_server.configs import ECURateLimit, server_cfg
+from otaclient_iot_logging_server.ecu_info import parse_ecu_info
+from otaclient_iot_logging_server.rate_limiter import (
+    ECURateLimiter,
+    TokenBucket,
+    create_ecu_rate_limiter,
+)
+
+MODULE = rate_limiter_module.__name__
+TEST_DIR = Path(__file__).parent / "data"
+
+
+@pytest.fixture
+def mocked_monotonic(mocker: MockerFixture):
+    _monotonic = mocker.patch(f"{MODULE}.time.monotonic", return_value=0.0)
+    return _monotonic
+
+
+def test_token_bucket(mocked_monotonic):
+    _bucket = TokenBucket(rate=10, burst=5)
+
+    # burst is allowed at start
+    assert all(_bucket.consume() for _ in range(5))
+    assert not _bucket.consume()
+
+    # refill 2 tokens in 0.2 seconds
+    mocked_monotonic.return_value = 0.2
+    assert _bucket.consume()
+    assert _bucket.consume()
+    assert not _bucket.consume()
+
+    # tokens never exceed burst
+    mocked_monotonic.return_value = 100
+    assert sum(_bucket.consume() for _ in range(10)) == 5
+
+
+def test_ecu_rate_limiter(mocked_monotonic):
+    _limiter = ECURateLimiter(
+        ECURateLimit(rate=1, burst=2),
+        overrides={
+            "sub1": ECURateLimit(rate=1, burst=4),
+            "sub2": ECURateLimit(rate=0, burst=1),
+        },
+        ecu_ids=("main", "sub1", "sub2"),
+    )
+
+    assert sum(_limiter.admit("main") for _ in range(10)) == 2
+    assert sum(_limiter.admit("sub1") for _ in range(10)) == 4
+    # no limit for sub2
+    assert sum(_limiter.admit("sub2") for _ in range(10)) == 10
+    # unknown ECU gets the default limit
+    assert sum(_limiter.admit("sub3") for _ in range(10)) == 2
+
+    assert _limiter.rejected == {"main": 8, "sub1": 6, "sub3": 8}
+
+
+@pytest.mark.parametrize(
+    "_cfg, _enabled",
+    (
+        ({}, False),
+        ({"ECU_RATE_LIMIT": 100}, True),
+        ({"ECU_RATE_LIMIT_OVERRIDES": {"sub1": ECURateLimit(rate=1, burst=1)}}, True),
+    ),
+)
+def test_create_ecu_rate_limiter(_cfg, _enabled: bool, mocker: MockerFixture):
+    mocker.patch(f"{MODULE}.server_cfg", server_cfg.model_copy(update=_cfg))
+    _cfg_limiter = create_ecu_rate_limiter(parse_ecu_info(TEST_DIR / "ecu_info.yaml"))
+    assert (_cfg_limiter is not None) == _enabled
@@ -0,0 +1,133 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import multiprocessing as mp
+from queue import Empty, Full
+
+import pytest
+
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+from otaclient_iot_logging_server.shm_ring_queue import ShmRingQueue
+
+
+def _entry(
+    idx: int, msg_len: int = 16, log_group_type: LogGroupType = LogGroupType.LOG
+):
+    return (
+        log_group_type,
+        f"ecu_{idx % 3}",
+        LogRecord(timestamp=idx, message=f"{idx:0{msg_len}d}"),
+    )
+
+
+def test_put_get_wraparound():
+    # NOTE: the capacity is not a multiple of the record size,
+    #       so that the records get split at the end of the ring buffer.
+    queue = ShmRingQueue(capacity=100)
+    _idx = 0
+    for _round in range(20):
+        _entries = [
+            _entry(_idx + _i, log_group_type=tuple(LogGroupType)[_i % 2])
+            for _i in range(2)
+        ]
+        _idx += 2
+        for _item in _entries:
+            queue.put_nowait(_item)
+        assert queue.qsize() == 2
+        assert [queue.get_nowait(), queue.get_nowait()] == _entries
+        assert queue.empty()
+
+    with pytest.raises(Empty):
+        queue.get_nowait()
+
+
+def test_put_full_by_bytes():
+    queue = ShmRingQueue(capacity=128)
+    _puts = 0
+    with pytest.raises(Full):
+        for _idx in range(128):
+            queue.put_nowait(_entry(_idx))
+            _puts += 1
+    assert _puts == queue.qsize() > 0
+    assert queue.fill_ratio() > 0.5
+
+    # space is released by get
+    _first = queue.get_nowait()
+    assert _first == _entry(0)
+    queue.put_nowait(_entry(_puts))
+
+
+def test_put_full_by_maxsize():
+    queue = ShmRingQueue(capacity=4096, maxsize=2)
+    queue.put_nowait(_entry(0))
+    queue.put_nowait(_entry(1))
+    assert queue.fill_ratio() == 1
+    with pytest.raises(Full):
+        queue.put_nowait(_entry(2))
+
+
+def test_put_many():
+    queue = ShmRingQueue(capacity=100)
+    _entries = [_entry(_idx) for _idx in range(8)]
+
+    # entries are put in order until the queue is full
+    _accepted = queue.put_many(_entries)
+    assert 0 < _accepted < len(_entries)
+    assert queue.qsize() == _accepted
+    assert queue.get_nowait() == _entries[0]
+
+    # the released space is reused with wraparound
+    assert queue.put_many(_entries[_accepted:]) == 1
+    assert [queue.get_nowait() for _ in range(queue.qsize())] == _entries[
+        1 : _accepted + 1
+    ]
+    assert queue.put_many([]) == 0
+
+
+def test_entry_larger_than_capacity():
+    queue = ShmRingQueue(capacity=64)
+    with pytest.raises(Full):
+        queue.put_nowait(_entry(0, msg_len=64))
+    assert queue.empty()
+
+
+def _producer(queue: ShmRingQueue, num: int) -> None:
+    for _idx in range(num):
+        while True:
+            try:
+                queue.put_nowait(_entry(_idx))
+                break
+            except Full:
+                pass
+
+
+def test_cross_process():
+    queue = ShmRingQueue(capacity=1024)
+    num = 1000
+    producer = mp.get_context("fork").Process(target=_producer, args=(queue, num))
+    producer.start()
+    try:
+        _received = []
+        while len(_received) < num:
+            try:
+                _received.append(queue.get_nowait())
+            except Empty:
+                assert producer.is_alive() or not queue.empty()
+        assert _received == [_entry(_idx) for _idx in range(num)]
+    finally:
+        producer.join(timeout=3)
+        producer.kill()
@@ -0,0 +1,35 @@
+"""Common helpers for the benchmark scripts."""
+
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+TEST_DATA_DPATH = Path(__file__).parents[2] / "tests" / "data"
+
+# NOTE: configs module loads the config files at import time, use the
+#       config files for testing if not specified.
+os.environ.setdefault("AWS_PROFILE_INFO", str(TEST_DATA_DPATH / "aws_profile_info.yaml"))
+os.environ.setdefault("GREENGRASS_V1_CONFIG", str(TEST_DATA_DPATH / "gg_v1_cfg.json"))
+os.environ.setdefault("GREENGRASS_V2_CONFIG", str(TEST_DATA_DPATH / "gg_v2_cfg.yaml"))
+os.environ.setdefault("ECU_INFO_YAML", str(TEST_DATA_DPATH / "ecu_info.yaml"))
+
+
+def measure(func: Callable[[], object], *, repeat: int = 3) -> tuple[float, float]:
+    """Run <func> for <repeat> times, return the best (wall time, cpu time)."""
+    _best_wall, _best_cpu = float("inf"), float("inf")
+    for _ in range(repeat):
+        _wall_start, _cpu_start = time.perf_counter(), time.process_time()
+        func()
+        _best_wall = min(_best_wall, time.perf_counter() - _wall_start)
+        _best_cpu = min(_best_cpu, time.process_time() - _cpu_start)
+    return _best_wall, _best_cpu
+
+
+def report(name: str, count: int, wall: float, cpu: float) -> None:
+    print(
+        f"{name:<40} {count / wall:>12,.0f} ops/s "
+        f"{cpu / count * 1e6:>10.2f} us(cpu)/op"
+    )
@@ -0,0 +1,126 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Upload latency and requests count of the fixed interval and the adaptive flush."""
+
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+
+import _bench_utils  # noqa: F401
+
+from otaclient_iot_logging_server import aws_iot_logger
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+from otaclient_iot_logging_server.greengrass_config import parse_config
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
+
+UPLOAD_INTERVAL = 1  # in seconds
+MAX_LATENCY = 0.2  # in seconds
+MAX_LOGS_PER_MERGE = 4096
+NETWORK_DELAY = 0.01  # in seconds
+ECUS_NUM = 4
+
+SPARSE_LOGS_NUM = 16
+SPARSE_LOGS_GAP = 0.37  # in seconds
+BURST_LOGS_NUM = 100_000
+BURST_RATE = 50_000  # logs/s
+
+
+class _FakeClient:
+    def __init__(self) -> None:
+        self.exceptions = None
+        self.requests = 0
+        self.latencies: list[float] = []
+
+    def put_log_events(self, **request) -> None:
+        time.sleep(NETWORK_DELAY)
+        _now = time.perf_counter()
+        self.requests += 1
+        self.latencies.extend(
+            _now - float(_log_msg["message"]) for _log_msg in request["logEvents"]
+        )
+
+
+class _FakeSession:
+    def __init__(self, client: _FakeClient) -> None:
+        self._client = client
+
+    def client(self, service_name: str, **kwargs) -> _FakeClient:
+        return self._client
+
+
+def _put(queue: LogsBacklog, idx: int) -> None:
+    queue.put_nowait(
+        (
+            LogGroupType.LOG,
+            f"ecu_{idx % ECUS_NUM}",
+            LogRecord(timestamp=idx, message=f"{time.perf_counter()}"),
+        )
+    )
+
+
+def _sparse(queue: LogsBacklog) -> int:
+    for _idx in range(SPARSE_LOGS_NUM):
+        _put(queue, _idx)
+        time.sleep(SPARSE_LOGS_GAP)
+    return SPARSE_LOGS_NUM
+
+
+def _burst(queue: LogsBacklog) -> int:
+    _batch = BURST_RATE // 100
+    for _idx in range(0, BURST_LOGS_NUM, _batch):
+        for _i in range(_batch):
+            _put(queue, _idx + _i)
+        time.sleep(0.01)
+    return BURST_LOGS_NUM
+
+
+def _bench(scenario: str, max_latency: float) -> None:
+    _client = _FakeClient()
+    aws_iot_logger.get_session = lambda _: _FakeSession(_client)  # type: ignore
+
+    queue = LogsBacklog(max_bytes=1024**3)
+    iot_logger = aws_iot_logger.AWSIoTLogger(
+        session_config=parse_config(),
+        queue=queue,
+        max_logs_per_merge=MAX_LOGS_PER_MERGE,
+        interval=UPLOAD_INTERVAL,
+        max_latency=max_latency,
+    )
+    threading.Thread(target=iot_logger.thread_main, daemon=True).start()
+
+    _logs_num = _sparse(queue) if scenario == "sparse" else _burst(queue)
+    while len(_client.latencies) < _logs_num:
+        time.sleep(0.01)
+
+    _latencies = sorted(_client.latencies)
+    _p50 = statistics.median(_latencies) * 1000
+    _p99 = _latencies[int(len(_latencies) * 0.99)] * 1000
+    _mode = f"adaptive({max_latency}s)" if max_latency else "fixed interval"
+    print(
+        f"{scenario:<8}{_mode:<18} p50 {_p50:>7.1f} ms  p99 {_p99:>7.1f} ms  "
+        f"{_client.requests:>6} requests  {_logs_num / _client.requests:>8.1f} logs/request"
+    )
+
+
+if __name__ == "__main__":
+    print(
+        f"upload interval {UPLOAD_INTERVAL}s, network delay {NETWORK_DELAY * 1000:.0f} ms, "
+        f"{ECUS_NUM} ECUs; sparse: {SPARSE_LOGS_NUM} logs every {SPARSE_LOGS_GAP}s; "
+        f"burst: {BURST_LOGS_NUM} logs at {BURST_RATE:,} logs/s"
+    )
+    for _scenario in ("sparse", "burst"):
+        for _max_latency in (0, MAX_LATENCY):
+            _bench(_scenario, _max_latency)
@@ -0,0 +1,54 @@
+"""Compare the per-call CPU cost of the PutLog handling paths.
+
+The PutLog handlers are called directly(without network), so the result
+reflects the cost of the request handling itself.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from queue import Queue
+
+import _bench_utils
+
+from otaclient_iot_logging_server.servicer import OTAClientIoTLoggingServerServicer
+from otaclient_iot_logging_server.v1 import otaclient_iot_logging_server_v1_pb2 as pb2
+from otaclient_iot_logging_server.v1.api_stub import (
+    OTAClientIoTLoggingServiceV1,
+    OTAClientIoTLoggingServiceV1FastPath,
+)
+
+CALLS_NUM = 100_000
+MSG_LEN = 64
+
+
+def _bench(service_type: type[OTAClientIoTLoggingServiceV1]) -> None:
+    queue = Queue()
+    service = service_type(OTAClientIoTLoggingServerServicer(queue=queue))
+    requests = [
+        pb2.PutLogRequest(
+            ecu_id="main",
+            log_type=pb2.LOG,
+            level=pb2.INFO,
+            message=os.urandom(MSG_LEN // 2).hex(),
+        )
+        for _ in range(1024)
+    ]
+
+    async def _run():
+        for _idx in range(CALLS_NUM):
+            await service.PutLog(requests[_idx % 1024], None)
+
+    def _main():
+        asyncio.run(_run())
+        queue.queue.clear()
+
+    _wall, _cpu = _bench_utils.measure(_main)
+    _bench_utils.report(service_type.__name__, CALLS_NUM, _wall, _cpu)
+
+
+if __name__ == "__main__":
+    print(f"PutLog x {CALLS_NUM}, message size {MSG_LEN} bytes")
+    _bench(OTAClientIoTLoggingServiceV1)
+    _bench(OTAClientIoTLoggingServiceV1FastPath)
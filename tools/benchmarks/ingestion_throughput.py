@@ -0,0 +1,164 @@
+"""Compare the HTTP and gRPC ingestion throughput with asyncio and uvloop.
+
+The server runs in a spawned process with the configured event loop, the
+clients always run on the default asyncio event loop in the benchmark process,
+sending many tiny single log requests over <CONCURRENCY> connections.
+
+The server side CPU time per request is also reported.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing.connection import Connection
+from queue import Queue
+
+import _bench_utils
+import aiohttp
+import grpc.aio
+
+from otaclient_iot_logging_server import log_proxy_server
+from otaclient_iot_logging_server.configs import server_cfg
+from otaclient_iot_logging_server.v1 import otaclient_iot_logging_server_v1_pb2 as pb2
+from otaclient_iot_logging_server.v1 import (
+    otaclient_iot_logging_server_v1_pb2_grpc as v1_grpc,
+)
+
+REQUESTS_NUM = 10_000
+CONCURRENCY = 32
+MSG = "x" * 64
+
+LISTEN_ADDRESS = "127.0.0.1"
+LISTEN_PORT = 18083
+LISTEN_PORT_GRPC = 18085
+
+
+def _server_main(use_uvloop: bool, conn: Connection) -> None:
+    log_proxy_server.server_cfg = server_cfg.model_copy(
+        update={
+            "USE_UVLOOP": use_uvloop,
+            "ENABLE_TCP_LISTENER": True,
+            "LISTEN_ADDRESS": LISTEN_ADDRESS,
+            "LISTEN_PORT": LISTEN_PORT,
+            "LISTEN_PORT_GRPC": LISTEN_PORT_GRPC,
+            "LISTEN_UNIX_SOCKET": "",
+            "LISTEN_UNIX_SOCKET_GRPC": "",
+        }
+    )
+
+    queue = Queue()
+
+    def _drain():
+        while True:
+            queue.get()
+
+    threading.Thread(target=_drain, daemon=True).start()
+
+    loop = log_proxy_server._new_event_loop()
+    asyncio.set_event_loop(loop)
+    server_task = loop.create_task(log_proxy_server._start_server(queue))
+
+    # each command from the benchmark process is answered with the cpu time
+    async def _serve_commands():
+        while await loop.run_in_executor(None, conn.recv):
+            conn.send(time.process_time())
+        conn.send(time.process_time())
+
+    conn.send(type(loop).__module__)
+    loop.run_until_complete(_serve_commands())
+    server_task.cancel()
+
+
+async def _http_client() -> None:
+    url = f"http://{LISTEN_ADDRESS}:{LISTEN_PORT}/main"
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=CONCURRENCY), raise_for_status=True
+    ) as session:
+
+        async def _worker(num: int):
+            for _ in range(num):
+                async with session.post(url, data=MSG):
+                    pass
+
+        await asyncio.gather(
+            *(_worker(REQUESTS_NUM // CONCURRENCY) for _ in range(CONCURRENCY))
+        )
+
+
+async def _grpc_client() -> None:
+    request = pb2.PutLogRequest(ecu_id="main", message=MSG)
+    channels = [
+        grpc.aio.insecure_channel(f"{LISTEN_ADDRESS}:{LISTEN_PORT_GRPC}")
+        for _ in range(CONCURRENCY)
+    ]
+
+    async def _worker(channel: grpc.aio.Channel, num: int):
+        stub = v1_grpc.OTAClientIoTLoggingServiceStub(channel)
+        for _ in range(num):
+            await stub.PutLog(request, wait_for_ready=True)
+
+    try:
+        await asyncio.gather(
+            *(_worker(_ch, REQUESTS_NUM // CONCURRENCY) for _ch in channels)
+        )
+    finally:
+        for _ch in channels:
+            await _ch.close()
+
+
+def _wait_for_server_up() -> None:
+    async def _probe():
+        async with aiohttp.ClientSession() as session:
+            for _ in range(100):
+                try:
+                    async with session.post(
+                        f"http://{LISTEN_ADDRESS}:{LISTEN_PORT}/main", data=MSG
+                    ):
+                        return
+                except aiohttp.ClientError:
+                    await asyncio.sleep(0.05)
+        raise RuntimeError("server failed to start")
+
+    asyncio.run(_probe())
+
+
+def _bench(use_uvloop: bool) -> None:
+    parent_conn, child_conn = mp.Pipe()
+    server = mp.get_context("spawn").Process(
+        target=_server_main, args=(use_uvloop, child_conn), daemon=True
+    )
+    server.start()
+    try:
+        loop_type = parent_conn.recv()
+        _wait_for_server_up()
+
+        for _name, _client in (("HTTP", _http_client), ("gRPC", _grpc_client)):
+            parent_conn.send(True)
+            _cpu_start = parent_conn.recv()
+            _wall_start = time.perf_counter()
+            asyncio.run(_client())
+            _wall = time.perf_counter() - _wall_start
+            parent_conn.send(True)
+            _cpu = parent_conn.recv() - _cpu_start
+
+            _count = REQUESTS_NUM // CONCURRENCY * CONCURRENCY
+            _bench_utils.report(f"{_name} ({loop_type})", _count, _wall, _cpu)
+        parent_conn.send(False)
+        parent_conn.recv()
+    finally:
+        server.kill()
+        server.join()
+
+
+if __name__ == "__main__":
+    print(f"{REQUESTS_NUM} requests, {CONCURRENCY} concurrent connections")
+    _bench(use_uvloop=False)
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        print("uvloop is not installed, skip")
+    else:
+        _bench(use_uvloop=True)
@@ -0,0 +1,83 @@
+"""Compare the memory cost per pending entry of the log entry shapes.
+
+- tuple + LogMessage: the (LogGroupType, ecu_id, LogMessage dict) entry,
+    with the ecu_id string decoded for each request,
+- tuple + LogRecord: the entry with slotted LogRecord and interned ecu_id,
+- LogsBacklog: the LogRecords kept in the per-stream lists of the backlog.
+
+The memory is measured with tracemalloc, excluding the message payloads.
+"""
+
+from __future__ import annotations
+
+import sys
+import tracemalloc
+from typing import Callable
+
+import _bench_utils  # noqa: F401
+
+from otaclient_iot_logging_server._common import LogGroupType, LogMessage, LogRecord
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
+
+ENTRIES_NUM = 100_000
+ECUS_NUM = 8
+MSG_LEN = 128
+
+
+def _ecu_id(idx: int) -> str:
+    # NOTE: simulate the ecu_id decoded from each request
+    return f"ecu_{idx % ECUS_NUM}".encode().decode()
+
+
+def _tuple_log_message(messages: list[str]) -> object:
+    return [
+        (LogGroupType.LOG, _ecu_id(_idx), LogMessage(timestamp=_idx, message=_msg))
+        for _idx, _msg in enumerate(messages)
+    ]
+
+
+def _tuple_log_record(messages: list[str]) -> object:
+    return [
+        (
+            LogGroupType.LOG,
+            sys.intern(_ecu_id(_idx)),
+            LogRecord(timestamp=_idx, message=_msg),
+        )
+        for _idx, _msg in enumerate(messages)
+    ]
+
+
+def _logs_backlog(messages: list[str]) -> object:
+    _backlog = LogsBacklog(max_bytes=1024**3)
+    for _idx, _msg in enumerate(messages):
+        _backlog.put_nowait(
+            (
+                LogGroupType.LOG,
+                sys.intern(_ecu_id(_idx)),
+                LogRecord(timestamp=_idx, message=_msg),
+            )
+        )
+    return _backlog
+
+
+SHAPES: dict[str, Callable[[list[str]], object]] = {
+    "tuple + LogMessage": _tuple_log_message,
+    "tuple + LogRecord": _tuple_log_record,
+    "LogsBacklog": _logs_backlog,
+}
+
+
+def _bench(name: str, factory: Callable[[list[str]], object]) -> None:
+    # NOTE: payloads are allocated before tracing, so they are excluded
+    messages = [f"{_idx:0{MSG_LEN}d}" for _idx in range(ENTRIES_NUM)]
+    tracemalloc.start()
+    _entries = factory(messages)  # noqa: F841
+    _size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<40} {_size / 1024**2:>8.1f} MiB {_size / ENTRIES_NUM:>8.0f} B/entry")
+
+
+if __name__ == "__main__":
+    print(f"{ENTRIES_NUM} entries from {ECUS_NUM} ECUs, excluding the payloads")
+    for _name, _factory in SHAPES.items():
+        _bench(_name, _factory)
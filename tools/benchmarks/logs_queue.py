@@ -0,0 +1,137 @@
+"""Compare the logs queue implementations.
+
+- in-process put then get throughput,
+- cross-process throughput, from a forked producer to the consumer,
+- resident memory with a full backlog, measured in a fresh forked process.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+from queue import Empty, Full, Queue
+from typing import Callable
+
+import _bench_utils
+
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+from otaclient_iot_logging_server._utils import put_many
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
+from otaclient_iot_logging_server.shm_ring_queue import ShmRingQueue
+
+ENTRIES_NUM = 200_000
+MSG_LEN = 128
+BACKLOG_BYTES = 128 * 1024**2
+BULK_SIZE = 512
+
+_mp_ctx = mp.get_context("fork")
+
+QUEUES: dict[str, Callable[[], object]] = {
+    "queue.Queue": lambda: Queue(),
+    "LogsBacklog": lambda: LogsBacklog(max_bytes=BACKLOG_BYTES),
+    "ShmRingQueue": lambda: ShmRingQueue(BACKLOG_BYTES),
+}
+IPC_QUEUES: dict[str, Callable[[], object]] = {
+    "multiprocessing.Queue": lambda: _mp_ctx.Queue(),
+    "ShmRingQueue": lambda: ShmRingQueue(BACKLOG_BYTES),
+}
+
+
+def _entry(idx: int) -> tuple[LogGroupType, str, LogRecord]:
+    return (
+        LogGroupType.LOG,
+        "main",
+        LogRecord(timestamp=idx, message=f"{idx:0{MSG_LEN}d}"),
+    )
+
+
+def _bench_in_process(name: str, factory: Callable[[], object]) -> None:
+    entries = [_entry(_idx) for _idx in range(ENTRIES_NUM)]
+
+    def _main():
+        queue = factory()
+        for _item in entries:
+            queue.put_nowait(_item)  # type: ignore
+        for _ in range(ENTRIES_NUM):
+            queue.get_nowait()  # type: ignore
+
+    _wall, _cpu = _bench_utils.measure(_main)
+    _bench_utils.report(name, ENTRIES_NUM, _wall, _cpu)
+
+
+def _bench_in_process_bulk(name: str, factory: Callable[[], object]) -> None:
+    entries = [_entry(_idx) for _idx in range(ENTRIES_NUM)]
+
+    def _main():
+        queue = factory()
+        for _start in range(0, ENTRIES_NUM, BULK_SIZE):
+            put_many(queue, entries[_start : _start + BULK_SIZE])
+        for _ in range(ENTRIES_NUM):
+            queue.get_nowait()  # type: ignore
+
+    _wall, _cpu = _bench_utils.measure(_main)
+    _bench_utils.report(f"{name}(put_many)", ENTRIES_NUM, _wall, _cpu)
+
+
+def _producer(queue) -> None:
+    for _idx in range(ENTRIES_NUM):
+        _item = _entry(_idx)
+        while True:
+            try:
+                queue.put_nowait(_item)
+                break
+            except Full:
+                pass
+
+
+def _bench_cross_process(name: str, factory: Callable[[], object]) -> None:
+    def _main():
+        queue = factory()
+        producer = _mp_ctx.Process(target=_producer, args=(queue,))
+        producer.start()
+        _received = 0
+        while _received < ENTRIES_NUM:
+            try:
+                queue.get_nowait()  # type: ignore
+                _received += 1
+            except Empty:
+                pass
+        producer.join()
+
+    _wall, _cpu = _bench_utils.measure(_main)
+    _bench_utils.report(f"{name}(cross-process)", ENTRIES_NUM, _wall, _cpu)
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _fill_backlog(factory: Callable[[], object], conn) -> None:
+    _rss_before = _rss_bytes()
+    queue = factory()
+    for _idx in range(ENTRIES_NUM):
+        queue.put_nowait(_entry(_idx))  # type: ignore
+    conn.send(_rss_bytes() - _rss_before)
+
+
+def _bench_memory(name: str, factory: Callable[[], object]) -> None:
+    _parent_conn, _child_conn = _mp_ctx.Pipe()
+    _proc = _mp_ctx.Process(target=_fill_backlog, args=(factory, _child_conn))
+    _proc.start()
+    _rss = _parent_conn.recv()
+    _proc.join()
+    print(f"{name:<40} {_rss / 1024**2:>12,.1f} MiB {_rss / ENTRIES_NUM:>10.0f} B/entry")
+
+
+if __name__ == "__main__":
+    print(f"{ENTRIES_NUM} entries, message size {MSG_LEN} bytes")
+    for _name, _factory in QUEUES.items():
+        _bench_in_process(_name, _factory)
+        _bench_in_process_bulk(_name, _factory)
+    for _name, _factory in IPC_QUEUES.items():
+        _bench_cross_process(_name, _factory)
+
+    print("\nresident memory with all the entries pending")
+    for _name, _factory in QUEUES.items():
+        _bench_memory(_name, _factory)
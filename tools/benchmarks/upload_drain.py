@@ -0,0 +1,150 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Sustained upload throughput of the uploader thread draining a backlog.
+
+The uploader talks to a local stand-in of the cloudwatch logs endpoint via
+a real botocore client, with the default MAX_LOGS_PER_MERGE and
+UPLOAD_INTERVAL configs, and different UPLOAD_CONCURRENCY.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing as mp
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue
+
+import _bench_utils
+from boto3 import Session
+
+from otaclient_iot_logging_server import aws_iot_logger
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+from otaclient_iot_logging_server.configs import server_cfg
+from otaclient_iot_logging_server.greengrass_config import parse_config
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
+
+LOGS_NUM = 50_000
+ECUS_NUM = 12
+MSG_PADDING = "x" * 128
+ENDPOINT_DELAY = 0.02  # in seconds
+
+_mp_ctx = mp.get_context("fork")
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Accept all the PutLogEvents requests, count the uploaded events."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive as the real endpoint
+    disable_nagle_algorithm = True
+    uploaded = None  # shared counter set by _serve
+
+    def do_POST(self) -> None:
+        _body = self.rfile.read(int(self.headers["Content-Length"]))
+        _events = json.loads(_body).get("logEvents", [])
+        time.sleep(ENDPOINT_DELAY)
+        with self.uploaded.get_lock():  # type: ignore
+            self.uploaded.value += len(_events)  # type: ignore
+
+        _resp = b'{"nextSequenceToken": "0"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-amz-json-1.1")
+        self.send_header("Content-Length", str(len(_resp)))
+        self.end_headers()
+        self.wfile.write(_resp)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class _StandInServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+def _serve(server: _StandInServer, uploaded) -> None:
+    _StandInHandler.uploaded = uploaded
+    server.serve_forever()
+
+
+def _bench(queue_type: str, upload_concurrency: int, _uploaded) -> None:
+    # NOTE: a round takes the entries of many streams from queue.Queue,
+    #       while LogsBacklog gives the whole pending list of a stream.
+    queue = Queue() if queue_type == "queue.Queue" else LogsBacklog(max_bytes=1024**3)
+    for _idx in range(LOGS_NUM):
+        queue.put_nowait(
+            (
+                LogGroupType.LOG,
+                f"ecu_{_idx % ECUS_NUM}",
+                LogRecord(timestamp=_idx, message=f"{_idx} {MSG_PADDING}"),
+            )
+        )
+    iot_logger = aws_iot_logger.AWSIoTLogger(
+        session_config=parse_config(),
+        queue=queue,
+        max_logs_per_merge=server_cfg.MAX_LOGS_PER_MERGE,
+        interval=server_cfg.UPLOAD_INTERVAL,
+        upload_concurrency=upload_concurrency,
+    )
+
+    _uploaded.value = 0
+    _wall_start, _cpu_start = time.perf_counter(), time.process_time()
+    threading.Thread(target=iot_logger.thread_main, daemon=True).start()
+    while _uploaded.value < LOGS_NUM:
+        time.sleep(0.01)
+    _wall, _cpu = time.perf_counter() - _wall_start, time.process_time() - _cpu_start
+    _bench_utils.report(
+        f"{queue_type}(UPLOAD_CONCURRENCY={upload_concurrency})",
+        LOGS_NUM,
+        _wall,
+        _cpu,
+    )
+
+
+def _main() -> None:
+    # NOTE: run the stand-in endpoint in a separate process, so that it
+    #       doesn't compete with the uploader for the GIL.
+    _server = _StandInServer(("127.0.0.1", 0), _StandInHandler)
+    _uploaded = _mp_ctx.Value("q", 0)
+    _server_proc = _mp_ctx.Process(target=_serve, args=(_server, _uploaded))
+    _server_proc.start()
+    _endpoint = f"http://127.0.0.1:{_server.server_address[1]}"
+
+    class _StandInSession(Session):
+        def client(self, service_name: str, **kwargs):  # type: ignore[override]
+            return super().client(service_name, endpoint_url=_endpoint, **kwargs)
+
+    _session = _StandInSession(
+        aws_access_key_id="stand-in",
+        aws_secret_access_key="stand-in",
+        region_name="ap-northeast-1",
+    )
+    aws_iot_logger.get_session = lambda _: _session  # type: ignore
+
+    _ceiling = server_cfg.MAX_LOGS_PER_MERGE / server_cfg.UPLOAD_INTERVAL
+    print(
+        f"{LOGS_NUM} pending logs from {ECUS_NUM} ECUs, "
+        f"MAX_LOGS_PER_MERGE={server_cfg.MAX_LOGS_PER_MERGE}, "
+        f"UPLOAD_INTERVAL={server_cfg.UPLOAD_INTERVAL}s, "
+        f"endpoint delay {ENDPOINT_DELAY * 1000:.0f} ms, "
+        f"fixed interval ceiling {_ceiling:,.0f} logs/s"
+    )
+    for _queue_type in ("queue.Queue", "LogsBacklog"):
+        for _concurrency in (1, server_cfg.UPLOAD_CONCURRENCY, ECUS_NUM):
+            _bench(_queue_type, _concurrency, _uploaded)
+    _server_proc.kill()
+
+
+if __name__ == "__main__":
+    _main()
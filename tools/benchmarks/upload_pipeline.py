@@ -0,0 +1,139 @@
+"""Compare the end-to-end latency and CPU cost of the upload pipelines.
+
+- thread + Queue: the uploader thread polls a plain queue.Queue,
+- thread + LogsBacklog: the uploader thread takes the per-stream lists,
+- async pipeline: the uploader runs in the event loop with the LogsBacklog,
+    only the upload calls run in a dedicated thread.
+
+Logs are put through the servicer on the event loop at a steady rate, the
+cloudwatch client is faked with JSON serializing the request and a fixed
+network delay. The latency is measured from putting a log into the queue
+to the finish of its upload call. Each pipeline runs in a spawned process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing as mp
+import statistics
+import threading
+import time
+from multiprocessing.connection import Connection
+from queue import Queue
+
+import _bench_utils  # noqa: F401
+
+from otaclient_iot_logging_server import aws_iot_logger
+from otaclient_iot_logging_server.greengrass_config import parse_config
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
+from otaclient_iot_logging_server.servicer import OTAClientIoTLoggingServerServicer
+
+LOGS_NUM = 50_000
+LOGS_PER_TICK = 50
+TICK = 0.005  # in seconds, 10k logs/s
+ECUS_NUM = 8
+MSG_PADDING = "x" * 64
+
+UPLOAD_INTERVAL = 0.05  # in seconds
+MAX_LOGS_PER_MERGE = 4096
+NETWORK_DELAY = 0.005  # in seconds
+
+PIPELINES = ("thread + Queue", "thread + LogsBacklog", "async pipeline")
+
+
+class _FakeClient:
+    def __init__(self, latencies: list[float]) -> None:
+        self._latencies = latencies
+        self.exceptions = None
+
+    def put_log_events(self, **request) -> None:
+        json.dumps(request)
+        time.sleep(NETWORK_DELAY)
+        _now = time.perf_counter()
+        self._latencies.extend(
+            _now - float(_log_msg["message"].split(" ", 1)[0])
+            for _log_msg in request["logEvents"]
+        )
+
+
+class _FakeSession:
+    def __init__(self, client: _FakeClient) -> None:
+        self._client = client
+
+    def client(self, service_name: str, **kwargs) -> _FakeClient:
+        return self._client
+
+
+def _pipeline_main(pipeline: str, conn: Connection) -> None:
+    latencies: list[float] = []
+    _client = _FakeClient(latencies)
+    aws_iot_logger.get_session = lambda _: _FakeSession(_client)  # type: ignore
+
+    if pipeline == "thread + Queue":
+        queue = Queue()
+    else:
+        queue = LogsBacklog(max_bytes=1024**3)
+    iot_logger = aws_iot_logger.AWSIoTLogger(
+        session_config=parse_config(),
+        queue=queue,
+        max_logs_per_merge=MAX_LOGS_PER_MERGE,
+        interval=UPLOAD_INTERVAL,  # type: ignore
+    )
+    servicer = OTAClientIoTLoggingServerServicer(queue=queue)
+
+    async def _ingest():
+        _next_tick = time.perf_counter()
+        for _idx in range(0, LOGS_NUM, LOGS_PER_TICK):
+            _now = time.perf_counter()
+            for _ecu_idx in range(LOGS_PER_TICK):
+                servicer._put_log(
+                    ecu_id=f"ecu_{_ecu_idx % ECUS_NUM}",
+                    message=f"{_now} {MSG_PADDING}",
+                )
+            _next_tick += TICK
+            await asyncio.sleep(max(0, _next_tick - time.perf_counter()))
+        while len(latencies) < LOGS_NUM:
+            await asyncio.sleep(UPLOAD_INTERVAL)
+
+    async def _main():
+        if pipeline == "async pipeline":
+            _uploader = asyncio.create_task(iot_logger.async_main())
+        else:
+            threading.Thread(target=iot_logger.thread_main, daemon=True).start()
+        await _ingest()
+        if pipeline == "async pipeline":
+            _uploader.cancel()
+
+    _wall_start, _cpu_start = time.perf_counter(), time.process_time()
+    asyncio.run(_main())
+    _wall, _cpu = time.perf_counter() - _wall_start, time.process_time() - _cpu_start
+    conn.send((_wall, _cpu, latencies))
+
+
+def _bench(pipeline: str) -> None:
+    parent_conn, child_conn = mp.Pipe()
+    _proc = mp.get_context("spawn").Process(
+        target=_pipeline_main, args=(pipeline, child_conn)
+    )
+    _proc.start()
+    _wall, _cpu, _latencies = parent_conn.recv()
+    _proc.join()
+
+    _latencies.sort()
+    _p50 = statistics.median(_latencies) * 1000
+    _p99 = _latencies[int(len(_latencies) * 0.99)] * 1000
+    print(
+        f"{pipeline:<24} p50 {_p50:>7.1f} ms  p99 {_p99:>7.1f} ms  "
+        f"{_cpu / LOGS_NUM * 1e6:>6.2f} us(cpu)/log  {_cpu / _wall * 100:>5.1f}% cpu"
+    )
+
+
+if __name__ == "__main__":
+    print(
+        f"{LOGS_NUM} logs at {LOGS_PER_TICK / TICK:,.0f} logs/s from {ECUS_NUM} ECUs, "
+        f"upload interval {UPLOAD_INTERVAL * 1000:.0f} ms, "
+        f"network delay {NETWORK_DELAY * 1000:.0f} ms"
+    )
+    for _pipeline in PIPELINES:
+        _bench(_pipeline)
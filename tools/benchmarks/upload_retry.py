@@ -0,0 +1,127 @@
+# Copyright 2022 TIER IV, INC. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Upload latency of the healthy streams while one stream keeps failing.
+
+The log stream of the failing ECU doesn't exist, and creating it fails with
+connection errors, i.e., the endpoint of the failing stream is unreachable.
+"""
+
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+
+import _bench_utils  # noqa: F401
+from botocore.exceptions import EndpointConnectionError
+
+from otaclient_iot_logging_server import aws_iot_logger
+from otaclient_iot_logging_server._common import LogGroupType, LogRecord
+from otaclient_iot_logging_server.greengrass_config import parse_config
+from otaclient_iot_logging_server.log_backlog import LogsBacklog
+
+UPLOAD_INTERVAL = 1  # in seconds
+NETWORK_DELAY = 0.01  # in seconds
+ECUS_NUM = 4
+FAILING_ECU = "ecu_0"
+
+LOGS_RATE = 1_000  # logs/s
+DURATION = 10  # in seconds
+DRAIN_TIMEOUT = 5  # in seconds
+
+
+class _FakeClient:
+    class ResourceNotFoundException(Exception):
+        pass
+
+    class ResourceAlreadyExistsException(Exception):
+        pass
+
+    def __init__(self) -> None:
+        self.exceptions = self
+        self.latencies: list[float] = []
+
+    def put_log_events(self, **request) -> None:
+        time.sleep(NETWORK_DELAY)
+        if request["logStreamName"].endswith(FAILING_ECU):
+            raise self.ResourceNotFoundException
+        _now = time.perf_counter()
+        self.latencies.extend(
+            _now - float(_log_msg["message"]) for _log_msg in request["logEvents"]
+        )
+
+    def create_log_stream(self, **request) -> None:
+        time.sleep(NETWORK_DELAY)
+        raise EndpointConnectionError(endpoint_url="https://logs.fake")
+
+
+class _FakeSession:
+    def __init__(self, client: _FakeClient) -> None:
+        self._client = client
+
+    def client(self, service_name: str, **kwargs) -> _FakeClient:
+        return self._client
+
+
+def _bench() -> None:
+    _client = _FakeClient()
+    aws_iot_logger.get_session = lambda _: _FakeSession(_client)  # type: ignore
+
+    queue = LogsBacklog(max_bytes=1024**3)
+    iot_logger = aws_iot_logger.AWSIoTLogger(
+        session_config=parse_config(),
+        queue=queue,
+        max_logs_per_merge=LOGS_RATE * UPLOAD_INTERVAL,
+        interval=UPLOAD_INTERVAL,
+    )
+    threading.Thread(target=iot_logger.thread_main, daemon=True).start()
+
+    _batch = LOGS_RATE // 100
+    _healthy_logs_num = 0
+    for _idx in range(0, LOGS_RATE * DURATION, _batch):
+        for _i in range(_idx, _idx + _batch):
+            _ecu_id = f"ecu_{_i % ECUS_NUM}"
+            _healthy_logs_num += _ecu_id != FAILING_ECU
+            queue.put_nowait(
+                (
+                    LogGroupType.LOG,
+                    _ecu_id,
+                    LogRecord(timestamp=_i, message=f"{time.perf_counter()}"),
+                )
+            )
+        time.sleep(0.01)
+
+    _deadline = time.perf_counter() + DRAIN_TIMEOUT
+    while len(_client.latencies) < _healthy_logs_num:
+        if time.perf_counter() > _deadline:
+            break
+        time.sleep(0.01)
+
+    _latencies = sorted(_client.latencies)
+    _uploaded = len(_latencies)
+    _p50 = statistics.median(_latencies) * 1000 if _latencies else float("nan")
+    _p99 = _latencies[int(_uploaded * 0.99)] * 1000 if _latencies else float("nan")
+    print(
+        f"healthy streams: {_uploaded}/{_healthy_logs_num} uploaded, "
+        f"p50 {_p50:.1f} ms, p99 {_p99:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    print(
+        f"upload interval {UPLOAD_INTERVAL}s, network delay {NETWORK_DELAY * 1000:.0f} ms, "
+        f"{ECUS_NUM} ECUs with {FAILING_ECU} failing, "
+        f"{LOGS_RATE:,} logs/s for {DURATION}s"
+    )
+    _bench()